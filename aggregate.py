@@ -0,0 +1,344 @@
+'''
+Aggregation of transformed rows into grouped output
+'''
+import hashlib
+import math
+import utils
+
+DEFAULT_PRECISION = 2
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+# distinct values are counted exactly until this many are seen
+HLL_SPARSE_LIMIT = HLL_REGISTERS // 4
+
+def add_partial(partials, value):
+    '''
+    Add float value to list of non overlapping partial sums (Shewchuk)
+    The partials represent the exact sum so math.fsum(partials) does not
+    depend on the order values were added or partials were merged in
+    '''
+    i = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[i] = low
+            i = i + 1
+        value = high
+    partials[i:] = [value]
+
+class AggregateFunction():
+    '''
+    Aggregate function keeping mergeable partial state
+    init/update/merge may return new state or update state in place
+    '''
+    def init(self, value):
+        '''
+        Partial state of single value
+        '''
+        raise NotImplementedError
+
+    def update(self, state, value):
+        '''
+        Fold value into partial state
+        '''
+        return self.merge(state, self.init(value))
+
+    def merge(self, state, other):
+        '''
+        Combine two partial states
+        '''
+        raise NotImplementedError
+
+    def finalise(self, state, precision):
+        '''
+        Output value of partial state
+        '''
+        raise NotImplementedError
+
+class Sum(AggregateFunction):
+    '''
+    Exact sum, state is [integer total, float partials]
+    '''
+    def init(self, value):
+        if isinstance(value, int):
+            return [value, []]
+        return [0, [value]]
+
+    def update(self, state, value):
+        if isinstance(value, int):
+            state[0] = state[0] + value
+        else:
+            add_partial(state[1], value)
+        return state
+
+    def merge(self, state, other):
+        state[0] = state[0] + other[0]
+        for partial in other[1]:
+            add_partial(state[1], partial)
+        return state
+
+    def finalise(self, state, precision):
+        if len(state[1]) == 0:
+            return state[0]
+        return round(math.fsum(state[1] + [state[0]]), precision)
+
+class Avg(Sum):
+    '''
+    Mean, state is [integer total, float partials, count]
+    '''
+    def init(self, value):
+        return Sum.init(self, value) + [1]
+
+    def update(self, state, value):
+        Sum.update(self, state, value)
+        state[2] = state[2] + 1
+        return state
+
+    def merge(self, state, other):
+        Sum.merge(self, state, other)
+        state[2] = state[2] + other[2]
+        return state
+
+    def finalise(self, state, precision):
+        return round(math.fsum(state[1] + [state[0]]) / state[2], precision)
+
+class Min(AggregateFunction):
+    '''
+    Running minimum
+    '''
+    def init(self, value):
+        return value
+
+    def update(self, state, value):
+        return min(state, value)
+
+    def merge(self, state, other):
+        return min(state, other)
+
+    def finalise(self, state, precision):
+        if isinstance(state, float):
+            return round(state, precision)
+        return state
+
+class Max(Min):
+    '''
+    Running maximum
+    '''
+    def update(self, state, value):
+        return max(state, value)
+
+    def merge(self, state, other):
+        return max(state, other)
+
+class Count(AggregateFunction):
+    '''
+    Number of rows
+    '''
+    def init(self, value):
+        return 1
+
+    def update(self, state, value):
+        return state + 1
+
+    def merge(self, state, other):
+        return state + other
+
+    def finalise(self, state, precision):
+        return state
+
+class CountDistinct(AggregateFunction):
+    '''
+    Approximate number of distinct values (HyperLogLog)
+    State is the set of value hashes while small, HyperLogLog registers afterwards
+    Merging states gives the same result as aggregating all values in one go
+    '''
+    @staticmethod
+    def value_hash(value):
+        '''
+        64 bit hash of value, stable across processes and runs
+        '''
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    @staticmethod
+    def add_hash(registers, value_hash):
+        '''
+        Update HyperLogLog registers with value hash
+        '''
+        index = value_hash & (HLL_REGISTERS - 1)
+        rank = 64 - HLL_PRECISION - (value_hash >> HLL_PRECISION).bit_length() + 1
+        if rank > registers[index]:
+            registers[index] = rank
+
+    def to_registers(self, hashes):
+        '''
+        Convert set of value hashes into HyperLogLog registers
+        '''
+        registers = bytearray(HLL_REGISTERS)
+        for value_hash in hashes:
+            self.add_hash(registers, value_hash)
+        return registers
+
+    def init(self, value):
+        return {self.value_hash(value)}
+
+    def update(self, state, value):
+        if isinstance(state, set):
+            state.add(self.value_hash(value))
+            if len(state) > HLL_SPARSE_LIMIT:
+                return self.to_registers(state)
+            return state
+        self.add_hash(state, self.value_hash(value))
+        return state
+
+    def merge(self, state, other):
+        if isinstance(state, set) and isinstance(other, set):
+            state = state | other
+            if len(state) > HLL_SPARSE_LIMIT:
+                return self.to_registers(state)
+            return state
+        if isinstance(state, set):
+            state, other = other, state
+        state = bytearray(state)
+        if isinstance(other, set):
+            for value_hash in other:
+                self.add_hash(state, value_hash)
+        else:
+            for index, rank in enumerate(other):
+                if rank > state[index]:
+                    state[index] = rank
+        return state
+
+    def finalise(self, state, precision):
+        if isinstance(state, set):
+            return len(state)
+        alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+        estimate = alpha * HLL_REGISTERS * HLL_REGISTERS / math.fsum(2.0 ** -r for r in state)
+        zeros = state.count(0)
+        if estimate <= 2.5 * HLL_REGISTERS and zeros > 0:
+            estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+        return int(round(estimate))
+
+AGGREGATE_FUNCTIONS = {
+    'sum': Sum(),
+    'avg': Avg(),
+    'min': Min(),
+    'max': Max(),
+    'count': Count(),
+    'count_distinct': CountDistinct(),
+    }
+
+def register_aggregate(name, function):
+    '''
+    Make aggregate function available to leaf_fields in transform config
+    Sample call: register_aggregate( 'median', Median() )
+    '''
+    AGGREGATE_FUNCTIONS[name] = function
+
+class Aggregator():
+    '''
+    Hash indexed aggregation engine
+    Accumulators are keyed on tuple of (group fields + non calculated leaf fields)
+    so that every row is looked up and updated in constant time
+    '''
+    def __init__(self, group_fields, leaf_fields):
+        '''
+        inputs:
+        group_fields - list of source fields output is grouped by
+        leaf_fields - dict of source field: [output field, aggregate function, precision]
+                      aggregate function '' marks a non calculated leaf field
+                      precision is optional, decimals float results are rounded to
+        '''
+        self.group_fields = list(group_fields)
+        non_calc_fields = [k for k,v in leaf_fields.items() if v[1] == '']
+        self.key_fields = self.group_fields + non_calc_fields
+        self.calc_fields = []
+        for k,v in leaf_fields.items():
+            if v[1] == '':
+                continue
+            if v[1] not in AGGREGATE_FUNCTIONS:
+                raise ValueError(f'Unknown aggregate function \'{v[1]}\' for {k}')
+            precision = v[2] if len(v) > 2 else DEFAULT_PRECISION
+            self.calc_fields.append((k, AGGREGATE_FUNCTIONS[v[1]], precision))
+        # output leaf layout in configured order
+        # (output field, True, position in key) or (output field, False, position in accumulators)
+        self.leaf_layout = []
+        calc_fields = [k for k,_,_ in self.calc_fields]
+        for k,v in leaf_fields.items():
+            if v[1] == '':
+                self.leaf_layout.append((v[0], True, self.key_fields.index(k)))
+            else:
+                self.leaf_layout.append((v[0], False, calc_fields.index(k)))
+        self.accumulators = {}
+
+    def add(self, row_data):
+        '''
+        Fold single transformed row into its accumulators
+        '''
+        key = tuple(row_data[field] for field in self.key_fields)
+        curr = self.accumulators.get(key)
+        if curr is None:
+            self.accumulators[key] = [func.init(row_data[field])
+                                      for field, func, _ in self.calc_fields]
+            return
+        i = 0
+        for field, func, _ in self.calc_fields:
+            curr[i] = func.update(curr[i], row_data[field])
+            i = i + 1
+
+    def add_values(self, key, values):
+        '''
+        Fold key and calculated field values of single row into its accumulators
+        key - values of key_fields
+        values - values of calc_fields
+        '''
+        curr = self.accumulators.get(key)
+        if curr is None:
+            self.accumulators[key] = [func.init(value)
+                                      for value, (_, func, _) in zip(values, self.calc_fields)]
+            return
+        i = 0
+        for _, func, _ in self.calc_fields:
+            curr[i] = func.update(curr[i], values[i])
+            i = i + 1
+
+    def merge(self, other):
+        '''
+        Combine partial accumulators of other aggregator into this one
+        Keys first seen in other are added after the existing ones
+        '''
+        for key, states in other.accumulators.items():
+            curr = self.accumulators.get(key)
+            if curr is None:
+                self.accumulators[key] = states
+                continue
+            i = 0
+            for _, func, _ in self.calc_fields:
+                curr[i] = func.merge(curr[i], states[i])
+                i = i + 1
+
+    def result(self, decoders=None):
+        '''
+        Generate nested output from accumulators
+        Groups and leaves keep the order in which they were first seen
+        decoders - optional list per key field, values list to decode integer codes with
+                   or None for keys stored as is
+        '''
+        group_len = len(self.group_fields)
+        groups = {}
+        for key, curr in self.accumulators.items():
+            if decoders is not None:
+                key = tuple(key[i] if decoder is None else decoder[key[i]]
+                            for i, decoder in enumerate(decoders))
+            values = [func.finalise(curr[i], precision)
+                      for i, (_, func, precision) in enumerate(self.calc_fields)]
+            leaf_data = {name: key[pos] if is_key else values[pos]
+                         for name, is_key, pos in self.leaf_layout}
+            groups.setdefault(key[:group_len], []).append(leaf_data)
+        result = {}
+        for key, data in groups.items():
+            utils.merge_dicts(target=result, source=utils.get_data_by_group(list(key), data))
+        return result
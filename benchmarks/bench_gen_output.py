@@ -0,0 +1,137 @@
+'''
+Benchmark gen_output aggregation against the previous list based implementation
+Sample call: python benchmarks/bench_gen_output.py --rows 1000 100000 1000000
+The legacy implementation is quadratic in leaves per group, on sales-summary
+it needs in the order of 15 minutes at 100k rows and is skipped above --legacy-max-rows
+'''
+import argparse
+import os
+import sys
+import time
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# pylint: disable=wrong-import-position
+from gen_sales import SOURCE_FIELDS, iter_sales_rows
+import utils
+from aggregate import Aggregator
+from pipeline import Transform
+
+TRANSFORMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'transforms')
+
+def load_config(transform_name):
+    '''
+    Read transform config
+    '''
+    with open(os.path.join(TRANSFORMS_DIR, transform_name + '.yaml'), 'r',
+              encoding='utf-8') as file:
+        return yaml.safe_load(file)
+
+def transformed_rows(config, count):
+    '''
+    Generated sales rows, see gen_sales, typed and expanded as Transform does
+    '''
+    checks = config['checks']
+    field_expansion = config['output'].get('field_expansion', {})
+    rows = []
+    for values in iter_sales_rows(count):
+        row_data = dict(zip(SOURCE_FIELDS, values))
+        for field in checks['float_field']:
+            row_data[field] = float(row_data[field])
+        for field in checks['number_field']:
+            row_data[field] = int(row_data[field])
+        Transform.expand_row(row_data, field_expansion)
+        rows.append(row_data)
+    return rows
+
+# pylint: disable=too-many-locals
+def legacy_gen_output(config, rows):
+    '''
+    Previous gen_output implementation
+    Linear scan of the group's leaves for every row
+    '''
+    intermediate_data = {}
+    result = {}
+    group_fields = config['output']['group_fields']
+    leaf_fields = config['output']['leaf_fields']
+    for row_data in rows:
+        group_key = tuple(row_data[field] for field in group_fields)
+        leaf_data = {v[0]: row_data[k] for k,v in leaf_fields.items()}
+        if group_key not in intermediate_data:
+            intermediate_data[group_key] = [leaf_data]
+            continue
+        curr_data = intermediate_data[group_key].copy()
+        new_data_non_calc = {v[0]: row_data[k] for k,v in leaf_fields.items() if v[1]==''}
+        found_match = 0
+        for i, curr in enumerate(curr_data):
+            curr_data_non_calc = {v[0]: curr[v[0]] for v in leaf_fields.values() if v[1]==''}
+            if curr_data_non_calc == new_data_non_calc:
+                found_match = 1
+                for leaf_field in leaf_fields.values():
+                    if leaf_field[1] == 'sum':
+                        curr[leaf_field[0]] += leaf_data[leaf_field[0]]
+                        curr[leaf_field[0]] = round(curr[leaf_field[0]],2)
+                    elif leaf_field[1] == 'avg':
+                        curr[leaf_field[0]] += leaf_data[leaf_field[0]]
+                        curr[leaf_field[0]] /= 2
+                        curr[leaf_field[0]] = round(curr[leaf_field[0]],2)
+            curr_data[i] = curr
+        if found_match == 1:
+            intermediate_data[group_key] = curr_data
+        else:
+            intermediate_data[group_key].append(leaf_data)
+    for key, data in intermediate_data.items():
+        utils.merge_dicts(target=result, source=utils.get_data_by_group(list(key), data))
+    return result
+
+def hashed_gen_output(config, rows):
+    '''
+    Current gen_output implementation
+    '''
+    aggregator = Aggregator(config['output']['group_fields'], config['output']['leaf_fields'])
+    for row_data in rows:
+        aggregator.add(row_data)
+    return aggregator.result()
+
+def timed(func, config, rows):
+    '''
+    Run func against a fresh copy of rows, returns (seconds, result)
+    Rows are copied up front as the legacy implementation updates leaf values in place
+    '''
+    rows = [dict(row) for row in rows]
+    start = time.perf_counter()
+    result = func(config, rows)
+    return time.perf_counter() - start, result
+
+def main():
+    '''
+    Run benchmark for each transform and row count
+    '''
+    argsp = argparse.ArgumentParser()
+    argsp.add_argument('-r', '--rows', type=int, nargs='+', default=[1000, 100000, 1000000])
+    argsp.add_argument('-n', '--name', type=str, nargs='+',
+                       default=['sales-aggregate', 'sales-summary'], help='Transformation name')
+    argsp.add_argument('--legacy-max-rows', type=int, default=100000,
+                       help='Skip the legacy implementation above this many rows')
+    args = argsp.parse_args()
+
+    print(f"{'transform':<18}{'rows':>10}{'legacy(s)':>12}{'hashed(s)':>12}{'speedup':>10}"
+          "  identical")
+    for transform_name in args.name:
+        config = load_config(transform_name)
+        for count in args.rows:
+            rows = transformed_rows(config, count)
+            hashed_secs, hashed_result = timed(hashed_gen_output, config, rows)
+            if count <= args.legacy_max_rows:
+                legacy_secs, legacy_result = timed(legacy_gen_output, config, rows)
+                legacy_col = f'{legacy_secs:.3f}'
+                speedup = f'{legacy_secs / hashed_secs:.1f}x'
+                identical = str(legacy_result == hashed_result)
+            else:
+                legacy_col, speedup, identical = 'skipped', '-', '-'
+            print(f'{transform_name:<18}{count:>10}{legacy_col:>12}{hashed_secs:>12.3f}'
+                  f'{speedup:>10}  {identical}')
+            del rows
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+'''
+Benchmark peak memory of extract and transform against the previous deepcopy based Transform
+Sample call: python benchmarks/bench_memory.py --rows 1000000
+Peak memory is traced with tracemalloc, which also slows down the run considerably
+'''
+import argparse
+import copy
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# pylint: disable=wrong-import-position
+from bench_gen_output import TRANSFORMS_DIR
+from gen_sales import write_sales_csv
+from pipeline import Pipeline, Extract, Transform
+
+def legacy_transform(pipeline, extract):
+    '''
+    Previous Transform: a full deepcopy of source data with per row
+    col_count, is_valid and err_msg, rejected rows moved out afterwards
+    '''
+    transform = Transform(pipeline, extract)
+    transformed_data = copy.deepcopy(extract.source_data)
+    for row in transformed_data.keys():
+        transformed_data[row]['col_count'] = len(extract.source_data[row])
+        transformed_data[row]['is_valid'] = True
+        transformed_data[row]['err_msg'] = []
+    validator = transform.get_validator()
+    for row, row_data in extract.source_data.items():
+        err_msg = validator.validate(row, tuple(row_data.values()), transformed_data[row])
+        if len(err_msg) > 0:
+            transformed_data[row]['is_valid'] = False
+            transformed_data[row]['err_msg'].extend(err_msg)
+    for row in [k for (k,v) in transformed_data.items() if v['is_valid'] is False]:
+        transform.rejected_data[row] = extract.source_data[row]
+        del transformed_data[row]
+    transform.transformed_data = transformed_data
+    return transform
+
+def current_transform(pipeline, extract):
+    '''
+    Current Transform, copy-on-write row views over source data
+    '''
+    transform = Transform(pipeline, extract)
+    transform.run_preprocess()
+    for row in transform.row_errors:
+        del transform.transformed_data[row]
+    return transform
+
+def traced(func, pipeline):
+    '''
+    Extract source file and run func on it
+    Returns (seconds, peak bytes, peak bytes on top of extracted data, output data)
+    '''
+    tracemalloc.start()
+    start = time.perf_counter()
+    extract = Extract(pipeline)
+    extract.extract()
+    extracted, peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    transform = func(pipeline, extract)
+    secs = time.perf_counter() - start
+    _, transform_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return secs, max(peak, transform_peak), transform_peak - extracted, transform.gen_output()
+
+def main():
+    '''
+    Run benchmark for each transform
+    '''
+    argsp = argparse.ArgumentParser()
+    argsp.add_argument('-r', '--rows', type=int, default=1000000)
+    argsp.add_argument('-n', '--name', type=str, nargs='+',
+                       default=['sales-aggregate', 'sales-summary'], help='Transformation name')
+    args = argsp.parse_args()
+    logging.disable(logging.WARNING)
+
+    print('Peak memory in MB of extract and transform, and of transform on top of extracted data')
+    print(f"{'transform':<18}{'rows':>10}{'legacy':>10}{'current':>10}{'legacy tf':>12}"
+          f"{'current tf':>12}{'reduction':>11}{'legacy(s)':>11}{'current(s)':>12}  identical")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for transform_name in args.name:
+            pipeline = Pipeline(transform_name)
+            pipeline.transform_config_file = os.path.join(TRANSFORMS_DIR, transform_name + '.yaml')
+            pipeline.get_config()
+            pipeline.configure_preprocess_checks()
+            pipeline.source_file = os.path.join(tmp_dir, 'sales.csv')
+            write_sales_csv(pipeline.source_file, args.rows, fields=pipeline.source_fields)
+            legacy_secs, legacy_peak, legacy_tf, legacy_result = traced(legacy_transform,
+                                                                        pipeline)
+            current_secs, current_peak, current_tf, current_result = traced(current_transform,
+                                                                            pipeline)
+            print(f'{transform_name:<18}{args.rows:>10}{legacy_peak / 2**20:>10.1f}'
+                  f'{current_peak / 2**20:>10.1f}{legacy_tf / 2**20:>12.1f}'
+                  f'{current_tf / 2**20:>12.1f}{1 - current_tf / legacy_tf:>11.0%}'
+                  f'{legacy_secs:>11.2f}{current_secs:>12.2f}  {legacy_result == current_result}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+'''
+Benchmark pipeline stages on generated sales data
+Sample call: python benchmarks/bench_pipeline.py --rows 10000 1000000 --output results.json
+Results are written as json, compare runs of two commits with benchmarks/compare.py
+Stages needing the whole source in memory are skipped above --in-memory-max-rows,
+sales-summary keeps a leaf per order and needs several GB of memory at 10M rows
+'''
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# pylint: disable=wrong-import-position
+from bench_gen_output import TRANSFORMS_DIR
+from gen_sales import write_sales_csv
+from pipeline import Pipeline, Extract, Transform, RowValidator, close_db_connections
+import sinks
+
+RESULTS_VERSION = 1
+
+def best_of(repeat, func, *args):
+    '''
+    Run func repeat times, returns (fastest seconds, result of the last run)
+    '''
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+    return best, result
+
+def consume(rows):
+    '''
+    Exhaust iterable of rows, returns number of rows
+    '''
+    count = 0
+    for count, _ in enumerate(rows, start=1):
+        pass
+    return count
+
+def setup_pipeline(transform_name, source_file):
+    '''
+    Pipeline of transform config reading source_file
+    '''
+    pipeline = Pipeline(transform_name)
+    pipeline.transform_config_file = os.path.join(TRANSFORMS_DIR, transform_name + '.yaml')
+    pipeline.get_config()
+    pipeline.configure_preprocess_checks()
+    pipeline.source_file = source_file
+    return pipeline
+
+def extract_data(pipeline):
+    '''
+    Extract whole source file
+    '''
+    extract = Extract(pipeline)
+    extract.extract()
+    return extract
+
+def transform_data(pipeline, extract):
+    '''
+    Validate and expand extracted source data, rejected rows are not written to db
+    '''
+    transform = Transform(pipeline, extract)
+    transform.write_rejected_rows_to_db = lambda: None
+    transform.transform()
+    return transform
+
+def stream_output(pipeline):
+    '''
+    Stream source file through validation and aggregation
+    '''
+    extract = Extract(pipeline)
+    transform = Transform(pipeline, extract)
+    return transform.gen_output(transform.transform_stream(extract.iter_rows(), partial=True))
+
+def validate_rows(validator, rows):
+    '''
+    Validate rows of value tuples, returns number of invalid rows
+    '''
+    invalid = 0
+    for row, values in enumerate(rows):
+        if len(validator.validate(row, values, {})) > 0:
+            invalid = invalid + 1
+    return invalid
+
+# pylint: disable=too-many-locals
+def run_benchmarks(pipeline, rows, args, output_dir):
+    '''
+    Benchmark stages of pipeline over its source file of rows rows
+    Returns list of (benchmark, rows processed, seconds)
+    '''
+    results = []
+    def record(benchmark, count, func, *func_args):
+        secs, result = best_of(args.repeat, func, *func_args)
+        results.append((benchmark, count, secs))
+        print(f'{pipeline.transform_name:<18}{rows:>10}  {benchmark:<28}{secs:>10.3f}'
+              f'{count / secs if secs > 0 else 0:>14.0f}', flush=True)
+        return result
+
+    record('iter_rows', rows, lambda: consume(Extract(pipeline).iter_rows()))
+    record('iter_rows_mmap', rows,
+           lambda: consume(Extract(pipeline).iter_rows(fields=pipeline.required_fields())))
+    data = record('stream', rows, stream_output, pipeline)
+
+    validator_rows = min(rows, args.validator_rows)
+    records = Extract(pipeline).iter_records()
+    values = [tuple(row) for _, row in zip(range(validator_rows), records)]
+    records.close()
+    for task in pipeline.preprocess_checks:
+        validator = RowValidator(pipeline.source_fields, pipeline.config.get('checks', {}), [task])
+        record(f'validate_{task}', validator_rows, validate_rows, validator, values)
+    del values
+
+    if rows <= args.in_memory_max_rows:
+        extract = record('extract', rows, extract_data, pipeline)
+        transform = record('transform', rows, transform_data, pipeline, extract)
+        data = record('gen_output', len(transform.transformed_data), transform.gen_output)
+        del extract, transform
+
+    output_file = os.path.join(output_dir, pipeline.transform_name + '.json')
+    record('write_json', rows, sinks.write_json, output_file, data)
+    if args.db:
+        host, _, port = args.db.partition(':')
+        transform = Transform(pipeline, Extract(pipeline))
+        transform.config = dict(pipeline.config,
+                                output=dict(pipeline.config['output'],
+                                            db={'host': host, 'port': int(port or 27017),
+                                                'name': args.db_name, 'write_mode': 'bulk',
+                                                'collection': pipeline.transform_name.replace(
+                                                    '-', '_')}))
+        record('write_to_db', rows, transform.write_to_db, data)
+        close_db_connections()
+    return results
+
+def git_commit():
+    '''
+    Commit of the working tree benchmarks run on, None outside of a git checkout
+    '''
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+                              ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    '''
+    Run benchmarks for each row count and transform
+    '''
+    argsp = argparse.ArgumentParser()
+    argsp.add_argument('-r', '--rows', type=int, nargs='+', default=[10000, 1000000, 10000000])
+    argsp.add_argument('-n', '--name', type=str, nargs='+',
+                       default=['sales-aggregate', 'sales-summary'], help='Transformation name')
+    argsp.add_argument('-o', '--output', type=str, help='Json file results are written to')
+    argsp.add_argument('--repeat', type=int, default=1, help='Runs per benchmark, fastest counts')
+    argsp.add_argument('--invalid-rate', type=float, default=0.01)
+    argsp.add_argument('--countries', type=int, default=25, help='Countries per region')
+    argsp.add_argument('--item-types', type=int, default=12)
+    argsp.add_argument('--seed', type=int, default=0)
+    argsp.add_argument('--in-memory-max-rows', type=int, default=1000000,
+                       help='Skip extract, transform and gen_output above this many rows')
+    argsp.add_argument('--validator-rows', type=int, default=1000000,
+                       help='Rows each validator is benchmarked on at most')
+    argsp.add_argument('--db', type=str, help='host:port of MongoDB to benchmark write_to_db on')
+    argsp.add_argument('--db-name', type=str, default='etl_benchmark')
+    args = argsp.parse_args()
+    logging.disable(logging.WARNING)
+
+    report = {
+        'version': RESULTS_VERSION,
+        'commit': git_commit(),
+        'started': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {'invalid_rate': args.invalid_rate, 'countries': args.countries,
+                    'item_types': args.item_types, 'seed': args.seed, 'repeat': args.repeat},
+        'results': [],
+        }
+    print(f"{'transform':<18}{'rows':>10}  {'benchmark':<28}{'seconds':>10}{'rows/s':>14}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_file = os.path.join(tmp_dir, 'sales.csv')
+        for rows in args.rows:
+            write_sales_csv(source_file, rows, seed=args.seed, countries=args.countries,
+                            item_types=args.item_types, invalid_rate=args.invalid_rate)
+            for transform_name in args.name:
+                pipeline = setup_pipeline(transform_name, source_file)
+                for benchmark, count, secs in run_benchmarks(pipeline, rows, args, tmp_dir):
+                    report['results'].append({
+                        'benchmark': benchmark, 'transform': transform_name, 'rows': rows,
+                        'rows_processed': count, 'seconds': round(secs, 6),
+                        'rows_per_second': round(count / secs, 1) if secs > 0 else None})
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_f:
+            json.dump(report, output_f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+'''
+Compare two benchmark result files written by bench_pipeline.py
+Sample call: python benchmarks/compare.py before.json after.json --threshold 0.1
+Exits with 1 when a benchmark got slower by more than threshold, so it can gate a build
+'''
+import argparse
+import json
+import sys
+
+def load_results(path):
+    '''
+    Results of benchmark file keyed by (transform, rows, benchmark)
+    '''
+    with open(path, 'r', encoding='utf-8') as results_f:
+        report = json.load(results_f)
+    return report.get('commit'), {(result['transform'], result['rows'], result['benchmark']):
+                                  result['seconds'] for result in report['results']}
+
+def main():
+    '''
+    Print change of each benchmark in both files
+    '''
+    argsp = argparse.ArgumentParser()
+    argsp.add_argument('before', type=str)
+    argsp.add_argument('after', type=str)
+    argsp.add_argument('-t', '--threshold', type=float, default=None,
+                       help='Fail on benchmarks slower by more than this share, e.g. 0.1')
+    args = argsp.parse_args()
+    before_commit, before = load_results(args.before)
+    after_commit, after = load_results(args.after)
+    print(f'before: {before_commit}  after: {after_commit}')
+    print(f"{'transform':<18}{'rows':>10}  {'benchmark':<28}{'before(s)':>11}{'after(s)':>11}"
+          f"{'change':>9}")
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        transform_name, rows, benchmark = key
+        change = after[key] / before[key] - 1 if before[key] > 0 else 0.0
+        flag = ''
+        if args.threshold is not None and change > args.threshold:
+            regressions = regressions + 1
+            flag = '  REGRESSION'
+        print(f'{transform_name:<18}{rows:>10}  {benchmark:<28}{before[key]:>11.3f}'
+              f'{after[key]:>11.3f}{change:>+9.1%}{flag}')
+    for key in sorted(before.keys() ^ after.keys()):
+        side = 'before' if key in before else 'after'
+        print(f'{key[0]:<18}{key[1]:>10}  {key[2]:<28} only in {side}')
+    if regressions > 0:
+        print(f'{regressions} benchmark(s) slower by more than {args.threshold:.0%}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
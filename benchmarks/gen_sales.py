@@ -0,0 +1,109 @@
+'''
+Deterministic generator of sales source files matching source.fields of the transforms
+Sample call: python benchmarks/gen_sales.py sales.csv --rows 1000000 --invalid-rate 0.01
+The same arguments always generate the same file
+'''
+import argparse
+import csv
+import random
+
+SOURCE_FIELDS = ['Region', 'Country', 'Item Type', 'Sales Channel', 'Order Priority',
+                 'Order Date', 'Order ID', 'Ship Date', 'Units Sold', 'Unit Price', 'Unit Cost',
+                 'Total Revenue', 'Total Cost', 'Total Profit']
+REGIONS = ['Asia', 'Australia and Oceania', 'Central America and the Caribbean', 'Europe',
+           'Middle East and North Africa', 'North America', 'Sub-Saharan Africa']
+ITEM_TYPES = ['Baby Food', 'Beverages', 'Cereal', 'Clothes', 'Cosmetics', 'Fruits',
+              'Household', 'Meat', 'Office Supplies', 'Personal Care', 'Snacks', 'Vegetables']
+PRIORITIES = ['H', 'M', 'L', 'C']
+# (field, invalid value) written into invalid rows, None drops the last field of the row
+DEFECTS = [
+    ('Region', 'Atlantis'),
+    ('Sales Channel', 'Mail'),
+    ('Order Priority', 'X'),
+    ('Order Date', '13/45/2015'),
+    ('Ship Date', ''),
+    ('Units Sold', '12.5'),
+    ('Unit Price', 'n/a'),
+    ('Total Profit', ''),
+    (None, None),
+    ]
+
+def item_type(index):
+    '''
+    Item type name of index, names beyond ITEM_TYPES get a numeric suffix
+    '''
+    if index < len(ITEM_TYPES):
+        return ITEM_TYPES[index]
+    return f'{ITEM_TYPES[index % len(ITEM_TYPES)]} {index // len(ITEM_TYPES)}'
+
+def random_date(rand):
+    '''
+    Random date in %m/%d/%Y format
+    '''
+    return f'{rand.randint(1, 12)}/{rand.randint(1, 28)}/{rand.randint(2010, 2017)}'
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+def iter_sales_rows(rows, seed=0, regions=len(REGIONS), countries=25, item_types=12,
+                    invalid_rate=0.0):
+    '''
+    Generate source rows as lists of strings in SOURCE_FIELDS order
+    rows - number of data rows
+    regions - number of regions (group cardinality), at most len(REGIONS)
+    countries - countries per region
+    item_types - number of item types (leaf cardinality together with countries)
+    invalid_rate - share of rows with one defect from DEFECTS
+    '''
+    rand = random.Random(seed)
+    region_names = REGIONS[:regions]
+    for i in range(rows):
+        region = rand.choice(region_names)
+        units = rand.randint(1, 10000)
+        price = round(rand.uniform(5, 700), 2)
+        cost = round(price * rand.uniform(0.4, 0.9), 2)
+        row = [region, f'{region} {rand.randrange(countries)}',
+               item_type(rand.randrange(item_types)), rand.choice(['Online', 'Offline']),
+               rand.choice(PRIORITIES), random_date(rand), str(100000000 + i), random_date(rand),
+               str(units), f'{price:.2f}', f'{cost:.2f}', f'{units * price:.2f}',
+               f'{units * cost:.2f}', f'{units * (price - cost):.2f}']
+        if invalid_rate > 0 and rand.random() < invalid_rate:
+            field, value = rand.choice(DEFECTS)
+            if field is None:
+                row.pop()
+            else:
+                row[SOURCE_FIELDS.index(field)] = value
+        yield row
+
+def write_sales_csv(path, rows, fields=None, **options):
+    '''
+    Write csv source file with header of fields (default SOURCE_FIELDS) and generated rows
+    options - see iter_sales_rows
+    '''
+    fields = SOURCE_FIELDS if fields is None else fields
+    positions = [SOURCE_FIELDS.index(field) for field in fields]
+    with open(path, 'w', newline='', encoding='utf-8') as source_f:
+        writer = csv.writer(source_f)
+        writer.writerow(fields)
+        for row in iter_sales_rows(rows, **options):
+            writer.writerow([row[i] for i in positions if i < len(row)])
+
+def main():
+    '''
+    Generate source file from command line arguments
+    '''
+    argsp = argparse.ArgumentParser()
+    argsp.add_argument('file', type=str, help='Source file to write')
+    argsp.add_argument('-r', '--rows', type=int, default=1000000)
+    argsp.add_argument('--seed', type=int, default=0)
+    argsp.add_argument('--regions', type=int, default=len(REGIONS),
+                       help=f'Number of regions, at most {len(REGIONS)}')
+    argsp.add_argument('--countries', type=int, default=25, help='Countries per region')
+    argsp.add_argument('--item-types', type=int, default=12)
+    argsp.add_argument('--invalid-rate', type=float, default=0.0,
+                       help='Share of rows with an invalid or missing value')
+    args = argsp.parse_args()
+    write_sales_csv(args.file, args.rows, seed=args.seed, regions=args.regions,
+                    countries=args.countries, item_types=args.item_types,
+                    invalid_rate=args.invalid_rate)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+'''
+Content addressed cache of transformation output
+Entries are keyed on the source file and the parsed transform config
+'''
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sinks
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.pickle'
+DEFAULT_MAX_SIZE_MB = 256
+HASH_BLOCK_SIZE = 1 << 20
+
+class ResultCache():
+    '''
+    Output data of transformations stored as one file per key in cache directory
+    Least recently used entries are evicted once the directory exceeds its maximum size
+    '''
+    def __init__(self, cache_dir, max_size_mb=DEFAULT_MAX_SIZE_MB, content_hash=False):
+        '''
+        inputs:
+        cache_dir - directory entries are stored in, created if missing
+        max_size_mb - maximum total size of entries
+        content_hash - key on a hash of source file content,
+                       otherwise on its size and modification time only
+        '''
+        self.cache_dir = cache_dir
+        self.max_size = int(max_size_mb * (1 << 20))
+        self.content_hash = content_hash
+
+    @classmethod
+    def from_config(cls, cache_config):
+        '''
+        Cache from cache section of application config
+        '''
+        return cls(cache_config.get('dir', 'cache'),
+                   cache_config.get('max_size_mb', DEFAULT_MAX_SIZE_MB),
+                   cache_config.get('content_hash', False))
+
+    def key(self, pipeline):
+        '''
+        Cache key of pipeline output, None if the source file cannot be read
+        '''
+        try:
+            stat = os.stat(pipeline.source_file)
+        except OSError:
+            return None
+        source = {
+            'file': os.path.abspath(pipeline.source_file),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            }
+        if self.content_hash:
+            digest = hashlib.blake2b()
+            with open(pipeline.source_file, 'rb') as source_f:
+                for block in iter(lambda: source_f.read(HASH_BLOCK_SIZE), b''):
+                    digest.update(block)
+            source['content'] = digest.hexdigest()
+            # content decides, a touched but unchanged file is still a hit
+            del source['mtime']
+        key = {'version': CACHE_VERSION, 'source': source, 'config': pipeline.config}
+        return hashlib.sha256(json.dumps(key, sort_keys=True, default=str)
+                              .encode('utf-8')).hexdigest()
+
+    def entry_file(self, key):
+        '''
+        File of cache entry
+        '''
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        '''
+        Cached output data of key, None on a miss
+        '''
+        if key is None:
+            return None
+        try:
+            with open(self.entry_file(key), 'rb') as entry_f:
+                data = pickle.load(entry_f)
+        except FileNotFoundError:
+            logging.info('Cache miss - %s', key)
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            logging.warning('Cannot read cache entry - %s', key)
+            return None
+        # modification time of entries tracks their last use
+        with contextlib.suppress(OSError):
+            os.utime(self.entry_file(key))
+        logging.info('Cache hit - %s', key)
+        return data
+
+    def put(self, key, data):
+        '''
+        Store output data of key and evict least recently used entries
+        '''
+        if key is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with sinks.atomic_open(self.entry_file(key), 'wb') as entry_f:
+                pickle.dump(data, entry_f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as err:
+            logging.warning('Cannot write cache entry - %s: %s', key, err)
+            return
+        logging.info('Cache entry written - %s', key)
+        self.evict()
+
+    def evict(self):
+        '''
+        Remove least recently used entries until cache fits its maximum size
+        '''
+        entries = []
+        with os.scandir(self.cache_dir) as dir_entries:
+            for entry in dir_entries:
+                if entry.is_file() and entry.name.endswith(CACHE_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            total_size = total_size - size
+            logging.info('Cache entry evicted - %s', os.path.basename(path))
@@ -0,0 +1,162 @@
+'''
+Dependency free columnar file format
+Layout:
+    MAGIC, format version
+    column chunks of each row group
+    footer - json of columns and (type, offset, length, codec) of each column chunk per row group
+    footer length (uint32 little endian), MAGIC
+Column chunk types:
+    q - int64, d - float64 (little endian arrays)
+    s - strings, j - json encoded values, both as uint32 offsets followed by utf-8 data
+'''
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+MAGIC = b'ETLC'
+VERSION = 1
+CODECS = ['zlib', 'none']
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+TRAILER = struct.Struct('<I4s')
+
+def to_little_endian(values):
+    '''
+    Array as little endian bytes
+    '''
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def from_little_endian(typecode, data):
+    '''
+    Array from little endian bytes
+    '''
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def encode_strings(values):
+    '''
+    Encode strings as uint32 offsets followed by utf-8 data
+    '''
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = array('I', [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return to_little_endian(offsets) + b''.join(encoded)
+
+def decode_strings(data, rows):
+    '''
+    Decode strings encoded by encode_strings
+    '''
+    offsets = from_little_endian('I', data[:4 * (rows + 1)])
+    data = data[4 * (rows + 1):]
+    return [data[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+def encode_column(values):
+    '''
+    Returns (type, data) of column chunk, type is picked from the values
+    '''
+    if all(isinstance(value, int) and not isinstance(value, bool)
+           and INT64_MIN <= value <= INT64_MAX for value in values):
+        return 'q', to_little_endian(array('q', values))
+    if all(isinstance(value, float) for value in values):
+        return 'd', to_little_endian(array('d', values))
+    if all(isinstance(value, str) for value in values):
+        return 's', encode_strings(values)
+    return 'j', encode_strings([json.dumps(value) for value in values])
+
+def decode_column(column_type, data, rows):
+    '''
+    Decode column chunk encoded by encode_column
+    '''
+    if column_type in ('q', 'd'):
+        return list(from_little_endian(column_type, data))
+    if column_type == 's':
+        return decode_strings(data, rows)
+    if column_type == 'j':
+        return [json.loads(value) for value in decode_strings(data, rows)]
+    raise ValueError(f'Unknown column type \'{column_type}\'')
+
+class ColumnarWriter():
+    '''
+    Writes records to binary file object in row groups
+    '''
+    def __init__(self, file, columns, codec=CODECS[0]):
+        '''
+        inputs:
+        file - binary file object
+        columns - list of column names, records missing a column get None
+        codec - column chunk compression, zlib or none
+        '''
+        if codec not in CODECS:
+            raise ValueError(f'Codec \'{codec}\' not supported')
+        self.file = file
+        self.columns = list(columns)
+        self.codec = codec
+        self.row_groups = []
+        self.offset = self.file.write(MAGIC + bytes([VERSION]))
+
+    def write_row_group(self, records):
+        '''
+        Write records as one row group
+        '''
+        chunks = []
+        for column in self.columns:
+            column_type, data = encode_column([record.get(column) for record in records])
+            if self.codec == 'zlib':
+                data = zlib.compress(data)
+            chunks.append([column_type, self.offset, len(data), self.codec])
+            self.offset = self.offset + self.file.write(data)
+        self.row_groups.append({'rows': len(records), 'chunks': chunks})
+
+    def close(self):
+        '''
+        Write footer
+        '''
+        footer = json.dumps({'version': VERSION, 'columns': self.columns,
+                             'row_groups': self.row_groups}).encode('utf-8')
+        self.file.write(footer + TRAILER.pack(len(footer), MAGIC))
+
+def read_footer(file):
+    '''
+    Read footer of columnar file
+    '''
+    if file.seek(0, 2) < len(MAGIC) + 1 + TRAILER.size:
+        raise ValueError('Not a columnar output file')
+    file.seek(-TRAILER.size, 2)
+    footer_length, magic = TRAILER.unpack(file.read(TRAILER.size))
+    file.seek(0)
+    if magic != MAGIC or file.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Not a columnar output file')
+    file.seek(-TRAILER.size - footer_length, 2)
+    return json.loads(file.read(footer_length).decode('utf-8'))
+
+def read_columnar(path, columns=None):
+    '''
+    Read records of columnar file one row group at a time
+    columns - optional list of columns to read, other column chunks are skipped
+    Yields records of form {column1: value1, column2: value2, ...so on}
+    '''
+    with open(path, 'rb') as file:
+        footer = read_footer(file)
+        if columns is None:
+            columns = footer['columns']
+        positions = [footer['columns'].index(column) for column in columns]
+        for row_group in footer['row_groups']:
+            values = []
+            for position in positions:
+                column_type, offset, length, codec = row_group['chunks'][position]
+                file.seek(offset)
+                data = file.read(length)
+                if codec == 'zlib':
+                    data = zlib.decompress(data)
+                values.append(decode_column(column_type, data, row_group['rows']))
+            for row in zip(*values):
+                yield dict(zip(columns, row))
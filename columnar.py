@@ -0,0 +1,251 @@
+'''
+Columnar in-memory representation of source data
+'''
+import logging
+from array import array
+from itertools import chain, compress, repeat
+from validator import ERR_INCOMPLETE_DATA_ROW, INVALID_MSG, MSG_INVALID_ROW, to_int, \
+    IncompleteRow, col_count
+
+# typed arrays used for converted columns
+ARRAY_TYPECODES = {float: 'd', to_int: 'q'}
+# validity bits of each byte value, least significant bit first
+BYTE_BITS = [tuple(bool(byte >> bit & 1) for bit in range(8)) for byte in range(256)]
+
+class DictColumn():
+    '''
+    Dictionary encoded column
+    Each distinct value is stored once and rows hold its integer code
+    '''
+    def __init__(self):
+        self.codes = array('I')
+        self.values = []
+        self.index = {}
+
+    def append(self, value):
+        '''
+        Add value of next row
+        '''
+        code = self.index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.index[value] = code
+            self.values.append(value)
+        self.codes.append(code)
+
+    def recode(self, values):
+        '''
+        Replace dictionary values, codes of values which became equal are merged
+        '''
+        self.values = []
+        self.index = {}
+        remap = []
+        for value in values:
+            if value not in self.index:
+                self.index[value] = len(self.values)
+                self.values.append(value)
+            remap.append(self.index[value])
+        if len(self.values) != len(remap):
+            self.codes = array('I', map(remap.__getitem__, self.codes))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def __iter__(self):
+        return map(self.values.__getitem__, self.codes)
+
+class ColumnStore():
+    '''
+    Source data held as one column per field
+    Converted numeric columns are typed arrays, categorical columns are dictionary encoded
+    Row validity is kept in a bitmap, error messages only for invalid rows
+    '''
+    def __init__(self, source_fields, categorical_fields=()):
+        self.source_fields = list(source_fields)
+        self.columns = {field: DictColumn() if field in categorical_fields else []
+                        for field in self.source_fields}
+        self.row_count = 0
+        self.validity = bytearray()
+        self.err_msg = {}
+        # IncompleteRow of rows with more or fewer values than source fields
+        self.incomplete = {}
+        # converted columns waiting for commit()
+        self.converted = {}
+
+    def append(self, row):
+        '''
+        Add row of values in source field order, or IncompleteRow
+        '''
+        index = self.row_count
+        if index % 8 == 0:
+            self.validity.append(0xFF)
+        self.row_count = self.row_count + 1
+        if not isinstance(row, IncompleteRow) and len(row) != len(self.source_fields):
+            row = IncompleteRow(self.source_fields, row)
+        if isinstance(row, IncompleteRow):
+            logging.debug('Record #%s has incomplete data.', index + 1)
+            self.incomplete[index] = row
+            self.invalidate(index, ERR_INCOMPLETE_DATA_ROW)
+            row = [''] * len(self.source_fields)
+        for field, value in zip(self.source_fields, row):
+            self.columns[field].append(value)
+
+    def invalidate(self, index, err):
+        '''
+        Mark row invalid with error message
+        '''
+        self.validity[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+        self.err_msg.setdefault(index, []).append(err)
+
+    def is_valid(self, index):
+        '''
+        Check validity bit of row
+        '''
+        return bool(self.validity[index >> 3] >> (index & 7) & 1)
+
+    def valid_flags(self):
+        '''
+        Iterate validity of rows as booleans
+        '''
+        return chain.from_iterable(map(BYTE_BITS.__getitem__, self.validity))
+
+    def validate(self, validator):
+        '''
+        Run compiled checks of RowValidator column by column
+        Checks of dictionary encoded columns run once per distinct value
+        Converted columns are kept aside until commit()
+        '''
+        for _, field, check, converter in validator.checks:
+            if converter is None:
+                invalid = self.check_column(self.columns[field], check)
+            else:
+                invalid = self.convert_column(field, converter)
+            for index, value in invalid:
+                if index in self.incomplete:
+                    continue
+                self.invalidate(index, [INVALID_MSG.format(field,value)])
+                logging.debug(MSG_INVALID_ROW, index + 1, field, value)
+
+    @staticmethod
+    def check_column(column, check):
+        '''
+        Returns (row index, value) of values failing check
+        '''
+        if isinstance(column, DictColumn):
+            invalid_codes = {code for code, value in enumerate(column.values) if not check(value)}
+            if len(invalid_codes) == 0:
+                return []
+            return [(index, column.values[code]) for index, code in enumerate(column.codes)
+                    if code in invalid_codes]
+        if all(map(check, column)):
+            return []
+        return [(index, value) for index, value in enumerate(column) if not check(value)]
+
+    def convert_column(self, field, converter):
+        '''
+        Convert whole column at once, per value only if some values fail to convert
+        Returns (row index, value) of values failing conversion
+        '''
+        column = self.columns[field]
+        if isinstance(column, DictColumn):
+            values, invalid_codes = self.convert_values(column.values, converter)
+            converted = DictColumn()
+            converted.codes = column.codes
+            converted.recode(values)
+            self.converted[field] = converted
+            invalid_codes = set(code for code, _ in invalid_codes)
+            return [(index, column.values[code]) for index, code in enumerate(column.codes)
+                    if code in invalid_codes]
+        self.converted[field], invalid = self.convert_values(column, converter)
+        return invalid
+
+    @staticmethod
+    def convert_values(values, converter):
+        '''
+        Returns (converted values, [(position, value)] of values failing conversion)
+        Invalid values are replaced by 0
+        '''
+        typecode = ARRAY_TYPECODES.get(converter)
+        try:
+            if converter is to_int and all(map(str.isdigit, values)):
+                return array(typecode, map(int, values)), []
+            if typecode is not None:
+                return array(typecode, map(converter, values)), []
+            return list(map(converter, values)), []
+        except (ValueError, OverflowError):
+            pass
+        converted = []
+        invalid = []
+        for position, value in enumerate(values):
+            try:
+                converted.append(converter(value))
+            except ValueError:
+                converted.append(0)
+                invalid.append((position, value))
+        if typecode is not None:
+            try:
+                return array(typecode, converted), invalid
+            except OverflowError:
+                pass
+        return converted, invalid
+
+    def commit(self):
+        '''
+        Replace source columns with their converted columns
+        '''
+        self.columns.update(self.converted)
+        self.converted = {}
+
+    def row(self, index):
+        '''
+        Values of single row as {field1: value1, field2: value2, ...so on}
+        '''
+        if index in self.incomplete:
+            return dict(self.incomplete[index])
+        return {field: self.columns[field][index] for field in self.source_fields}
+
+    def invalid_rows(self):
+        '''
+        Yields (row index, row) of invalid rows, row includes col_count and err_msg
+        '''
+        for index in sorted(self.err_msg):
+            row_data = self.row(index)
+            row_data['col_count'] = col_count(self.incomplete.get(index, row_data))
+            row_data['err_msg'] = self.err_msg[index]
+            yield index, row_data
+
+    def expand(self, field_expansion):
+        '''
+        Replace data with expanded data, once per distinct value for dictionary encoded columns
+        '''
+        for field, field_exp in field_expansion.items():
+            column = self.columns[field]
+            if isinstance(column, DictColumn):
+                column.recode([field_exp.get(value, value) for value in column.values])
+            else:
+                self.columns[field] = [field_exp.get(value, value) for value in column]
+
+    def aggregate(self, aggregator):
+        '''
+        Fold valid rows into aggregator, grouping on dictionary codes
+        Returns decoders to pass to aggregator.result()
+        '''
+        key_columns = []
+        decoders = []
+        for field in aggregator.key_fields:
+            column = self.columns[field]
+            if isinstance(column, DictColumn):
+                key_columns.append(column.codes)
+                decoders.append(column.values)
+            else:
+                key_columns.append(column)
+                decoders.append(None)
+        calc_columns = [self.columns[field] for field,_,_ in aggregator.calc_fields]
+        keys = zip(*key_columns) if key_columns else repeat((), self.row_count)
+        values = zip(*calc_columns) if calc_columns else repeat((), self.row_count)
+        for key, row_values in compress(zip(keys, values), self.valid_flags()):
+            aggregator.add_values(key, row_values)
+        return decoders
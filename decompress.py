@@ -0,0 +1,87 @@
+'''
+Transparent decompression of compressed source files
+Compression is taken from the file extension, otherwise from the magic bytes at the start
+of the file. Files are decompressed in a reader thread ahead of parsing, see readahead
+zstd compressed files need zstandard installed
+'''
+import bz2
+import gzip
+import io
+import logging
+import lzma
+import sys
+import readahead
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# compression: (magic bytes, file extensions)
+COMPRESSIONS = {
+    'gzip': ((b'\x1f\x8b',), ('.gz', '.gzip')),
+    'bz2': (tuple(b'BZh' + bytes([level]) for level in b'123456789'), ('.bz2',)),
+    'xz': ((b'\xfd7zXZ\x00',), ('.xz',)),
+    'zstd': ((b'\x28\xb5\x2f\xfd',), ('.zst', '.zstd')),
+    }
+MAGIC_SIZE = 6
+
+def compression(path):
+    '''
+    Compression of file at path, see COMPRESSIONS, None for an uncompressed file
+    '''
+    for name, (_, extensions) in COMPRESSIONS.items():
+        if path.lower().endswith(extensions):
+            return name
+    with open(path, 'rb') as file:
+        start = file.read(MAGIC_SIZE)
+    for name, (magics, _) in COMPRESSIONS.items():
+        if any(start[:len(magic)] == magic for magic in magics):
+            return name
+    return None
+
+def open_zstd(path):
+    '''
+    Binary file decompressing zstd compressed file at path
+    '''
+    if zstandard is None:
+        logging.error('Source file \'%s\' is zstd compressed, reading it needs zstandard installed',
+                      path)
+        sys.exit(1)
+    source_f = open(path, 'rb') # pylint: disable=consider-using-with
+    return zstandard.ZstdDecompressor().stream_reader(source_f, closefd=True)
+
+OPENERS = {
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+    'zstd': open_zstd,
+    }
+
+def open_source(path, start=0, read_ahead=0):
+    '''
+    Open source file for binary reading from offset start of its uncompressed data
+    read_ahead - blocks to read ahead in a reader thread, see readahead
+    Compressed files are always decompressed in a reader thread
+    '''
+    kind = compression(path)
+    if kind is None:
+        source_f = open(path, 'rb') # pylint: disable=consider-using-with
+        source_f.seek(start)
+        if read_ahead <= 0:
+            return source_f
+        return readahead.open_read_ahead(source_f, read_ahead, closefd=True)
+    logging.info('Decompressing %s source file - \'%s\'', kind, path)
+    source_f = OPENERS[kind](path)
+    if start > 0:
+        # decompresses and discards the data before start
+        source_f.seek(start)
+    return readahead.open_read_ahead(source_f, max(read_ahead, readahead.QUEUE_BLOCKS),
+                                     closefd=True)
+
+def open_text(path):
+    '''
+    Open source file for reading decoded text, see open_source
+    '''
+    if compression(path) is None:
+        return open(path, 'r', encoding='utf-8') # pylint: disable=consider-using-with
+    return io.TextIOWrapper(open_source(path), encoding='utf-8')
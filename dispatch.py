@@ -0,0 +1,125 @@
+'''
+Concurrent dispatch of transformation output to its sinks
+Each sink writes in a thread of its own with its own timeout, a slow or failing sink
+neither holds up nor stops the others
+Sinks and timeouts are taken from output.sinks and output.sink_timeouts of transform config
+'''
+import logging
+import sys
+import threading
+import time
+import metrics
+
+def write_db(transform, data):
+    '''
+    db sink, output data and rejected rows not quarantined, see Transform.reject
+    '''
+    transform.write_to_db(data)
+    if len(transform.rejected_data) > 0:
+        transform.write_rejected_rows_to_db()
+
+SINK_WRITERS = {
+    'file': lambda transform, data: transform.write_output(data),
+    'db': write_db,
+    }
+DEFAULT_SINKS = ['file', 'db']
+SINK_STATUSES = ['ok', 'failed', 'timeout']
+# writer threads of sinks that timed out, they may still be writing
+TIMED_OUT = []
+
+def register_sink_writer(name, writer):
+    '''
+    Make sink available to output.sinks in transform config
+    writer is called as writer(transform, output data) in a writer thread
+    Sample call: register_sink_writer( 'kafka', kafka_writer )
+    '''
+    SINK_WRITERS[name] = writer
+
+class SinkThread(threading.Thread):
+    '''
+    Writer thread of one sink
+    Daemon thread, a sink that timed out does not keep the process alive
+    '''
+    def __init__(self, name, transform, data):
+        threading.Thread.__init__(self, name='sink-' + name, daemon=True)
+        self.sink = name
+        self.transform = transform
+        self.data = data
+        self.status = None
+        self.started = None
+        self.latency = None
+
+    def run(self):
+        self.started = time.perf_counter()
+        try:
+            SINK_WRITERS[self.sink](self.transform, self.data)
+        except SystemExit:
+            # writers log the reason before exiting
+            self.status = 'failed'
+        except Exception: # pylint: disable=broad-exception-caught
+            logging.exception('Error writing sink %s of %s', self.sink,
+                              self.transform.transform_name)
+            self.status = 'failed'
+        else:
+            self.status = 'ok'
+        finally:
+            self.latency = time.perf_counter() - self.started
+
+def running_sinks():
+    '''
+    Writer threads of sinks that timed out and are still writing
+    '''
+    TIMED_OUT[:] = [thread for thread in TIMED_OUT if thread.is_alive()]
+    return list(TIMED_OUT)
+
+def configured_sinks(transform):
+    '''
+    Sinks listed in output.sinks of transform config (default file and db)
+    '''
+    names = transform.config['output'].get('sinks', DEFAULT_SINKS)
+    for name in names:
+        if name not in SINK_WRITERS:
+            logging.error('Output sink \'%s\' not supported', name)
+            sys.exit(1)
+    return names
+
+def sink_timeout(transform, name):
+    '''
+    Seconds sink may take to write, output.sink_timeouts.<sink> of transform config
+    None (default) waits until the sink completes
+    '''
+    return transform.config['output'].get('sink_timeouts', {}).get(name)
+
+def dispatch(transform, data):
+    '''
+    Write data to all sinks of transform concurrently, wait for each up to its timeout
+    Outcome and latency of each sink are recorded in the run metrics
+    Returns {sink: status}, see SINK_STATUSES
+    '''
+    threads = [SinkThread(name, transform, data) for name in configured_sinks(transform)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    statuses = {}
+    latencies = {}
+    for thread in threads:
+        timeout = sink_timeout(transform, thread.sink)
+        thread.join(None if timeout is None else max(0.0, started + timeout - time.perf_counter()))
+        if thread.is_alive():
+            logging.error('Sink %s of %s timed out after %ss', thread.sink,
+                          transform.transform_name, timeout)
+            if thread.sink == 'db' and transform.get_db_load_mode() == 'replace':
+                logging.warning('Collection of %s may be left empty or partly loaded, '
+                                'use load_mode swap with a db timeout', transform.transform_name)
+            TIMED_OUT.append(thread)
+            statuses[thread.sink] = 'timeout'
+            latencies[thread.sink] = time.perf_counter() - started
+        else:
+            statuses[thread.sink] = thread.status
+            latencies[thread.sink] = thread.latency
+        metrics.sink(transform.transform_name, thread.sink, statuses[thread.sink],
+                     latencies[thread.sink])
+    logging.info('Sinks of %s: %s', transform.transform_name,
+                 ', '.join(f'{sink} {status} {latencies[sink]:.3f}s'
+                           for sink, status in statuses.items()))
+    return statuses
@@ -2,46 +2,208 @@
 simple program to perform ETL process based on config
 '''
 import argparse
+import functools
 import logging as log
+import os
 import sys
 import yaml
-from pipeline import Pipeline, Extract, Transform
+from pipeline import Pipeline, Extract, Transform, close_db_connections
+import parallel
+import fanout
+import cache
+import incremental as incremental_run
+import metrics
+import profiler
+import pipelined as pipelined_run
+import dispatch
+import logqueue
 
 def setup_logging(app_config):
     '''
-    Setup logging
+    Setup logging, records are written in a listener thread, see logqueue
     '''
-    log_filename=app_config['logging']['log_file']
-    log_level=app_config['logging']['log_level']
-    log_format='%(asctime)s.%(msecs)03d %(module)-10s(%(funcName)-20s) %(levelname)-8s %(message)s'
-    date_format='%Y-%m-%d %H:%M:%S'
-    log.basicConfig(filename=log_filename,level=log_level,format=log_format,datefmt=date_format)
+    logqueue.setup(app_config['logging'])
 
-def main(transform_name):
+def setup_worker_logging(app_config):
     '''
-    Main program to run required ETL pipeline
+    Setup logging of worker processes, records are written by the worker itself
+    Counts of records dropped by rate limit are returned to the parent with each chunk
     '''
-    log.info('----- Program started -----')
-    log.info('Transformation name --> %s', transform_name)
-    pipeline = Pipeline(transform_name)
-    pipeline.get_config()
-    pipeline.configure_preprocess_checks()
+    logqueue.setup(app_config['logging'], background=False)
+
+def requested_modes(stream=False, workers=1, columnar=False, incremental=False, pipelined=False):
+    '''
+    Processing modes requested, in the order run_transform picks the one to run
+    '''
+    modes = {'incremental': incremental, 'workers': workers > 1, 'pipelined': pipelined,
+             'columnar': columnar, 'stream': stream}
+    return [mode for mode, requested in modes.items() if requested]
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def run_transform(pipeline, stream=False, workers=1, app_config=None, columnar=False,
+                  incremental=False, pipelined=False):
+    '''
+    Run extract and transform stages of pipeline, see main for arguments
+    Only one processing mode is run, see requested_modes for the order they are picked in
+    Returns (transform, output data)
+    '''
+    modes = requested_modes(stream, workers, columnar, incremental, pipelined)
+    if len(modes) > 1:
+        log.warning('Modes %s requested, only %s is used', ', '.join(modes), modes[0])
     extract = Extract(pipeline)
+    if incremental:
+        return incremental_run.run(pipeline)
+    if workers > 1:
+        return parallel.run(pipeline, workers,
+                            initializer=setup_worker_logging if app_config else None,
+                            initargs=(app_config,))
+    if pipelined:
+        return pipelined_run.run(pipeline)
+    if columnar:
+        store = extract.extract_columns(pipeline.categorical_fields())
+        transform = Transform(pipeline,extract)
+        transform.transform_columns(store)
+        return transform, transform.gen_output_columns(store)
+    if stream:
+        transform = Transform(pipeline,extract)
+        position = transform.source_position()
+        rows = extract.iter_rows(fields=pipeline.decoded_fields(), position=position)
+        return transform, transform.gen_output(transform.transform_stream(rows,
+                                                                          position=position))
     extract.extract()
     transform = Transform(pipeline,extract)
     transform.transform()
-    data = transform.gen_output()
-    transform.write_json(data)
-    transform.write_to_db(data)
+    return transform, transform.gen_output()
+
+def setup_pipeline(transform_name):
+    '''
+    Pipeline of transformation with its config loaded
+    '''
+    log.info('Transformation name --> %s', transform_name)
+    pipeline = Pipeline(transform_name)
+    pipeline.get_config()
+    pipeline.configure_preprocess_checks()
+    return pipeline
+
+# pylint: disable=too-many-locals
+def main(transform_name, stream=False, workers=1, app_config=None, columnar=False,
+         incremental=False, use_cache=True, profile=False, pipelined=False):
+    '''
+    Main program to run required ETL pipeline
+    transform_name - transformation name or list of names, transformations reading
+                     the same source with the same checks share one extract and validation pass
+    stream - process source rows one at a time instead of loading whole file
+    columnar - load whole file into typed, dictionary encoded columns
+    workers - number of processes to validate and aggregate source file chunks in
+    app_config - application config, used to setup logging of worker processes,
+                 the result cache (cache section) and metrics output (metrics section)
+    incremental - only process rows appended to source file since the last run
+    use_cache - reuse output of an earlier run over the same source file and transform config
+    pipelined - stream source rows while the source file is read ahead in a reader thread
+    profile - run under cProfile and a stack sampler, profile files are written next to the log
+    stream, columnar, workers, incremental and pipelined apply to a single transformation
+    Output sinks are written concurrently, see dispatch, the program exits with status 1 once
+    all transformations completed when any sink failed or timed out
+    '''
+    log.info('----- Program started -----')
+    metrics.reset()
+    transform_names = [transform_name] if isinstance(transform_name, str) else transform_name
+    pipelines = [setup_pipeline(name) for name in transform_names]
+    run = functools.partial(run_pipelines, pipelines, stream=stream, workers=workers,
+                            app_config=app_config, columnar=columnar, incremental=incremental,
+                            use_cache=use_cache, pipelined=pipelined)
+    if profile:
+        log_dir = os.path.dirname(app_config['logging']['log_file']) if app_config else ''
+        size = profiler.input_size(pipeline.source_file for pipeline in pipelines)
+        failed = profiler.profile(profiler.output_prefix(log_dir, transform_names, size), run)
+    else:
+        failed = run()
+    metrics.write(app_config.get('metrics') if app_config else None)
+    if len(failed) > 0:
+        log.error('Sinks not written: %s', ', '.join(failed))
+        log.info( "----- Program failed -----\n\n" )
+        sys.exit(1)
     log.info( "----- Program complete -----\n\n" )
 
-if __name__ == "__main__":
-    # Parse input arguments
+def run_pipelines(pipelines, stream=False, workers=1, app_config=None, columnar=False,
+                  incremental=False, use_cache=True, pipelined=False):
+    '''
+    Run pipelines and write their output, see main for arguments
+    Returns list of transformation/sink not written
+    '''
+    result_cache = None
+    cache_keys = {}
+    results = {}
+    if use_cache and app_config and 'cache' in app_config:
+        result_cache = cache.ResultCache.from_config(app_config['cache'])
+        for pipeline in pipelines:
+            cache_keys[pipeline.transform_name] = result_cache.key(pipeline)
+            data = result_cache.get(cache_keys[pipeline.transform_name])
+            if data is not None:
+                results[pipeline.transform_name] = (Transform(pipeline,Extract(pipeline)), data)
+    pending = [pipeline for pipeline in pipelines if pipeline.transform_name not in results]
+    if len(pending) == 1:
+        results[pending[0].transform_name] = run_transform(pending[0], stream=stream,
+                                                           workers=workers,
+                                                           app_config=app_config,
+                                                           columnar=columnar,
+                                                           incremental=incremental,
+                                                           pipelined=pipelined)
+    elif len(pending) > 1:
+        modes = requested_modes(stream, workers, columnar, incremental, pipelined)
+        if len(modes) > 0:
+            log.warning('Modes %s apply to a single transformation, not used by shared scans of %s',
+                        ', '.join(modes),
+                        ', '.join(pipeline.transform_name for pipeline in pending))
+        results.update(fanout.run(pending))
+    failed = []
+    for pipeline in pipelines:
+        transform, data = results[pipeline.transform_name]
+        if result_cache is not None and pipeline in pending:
+            result_cache.put(cache_keys[pipeline.transform_name], data)
+        statuses = dispatch.dispatch(transform, data)
+        failed.extend(f'{pipeline.transform_name}/{sink}' for sink, status in statuses.items()
+                      if status != 'ok')
+    running = dispatch.running_sinks()
+    if len(running) > 0:
+        # closing the clients would fail the writes under the sinks still running
+        log.warning('Sink(s) still writing after timeout, db connections left open: %s',
+                    ', '.join(f'{thread.transform.transform_name}/{thread.sink}'
+                              for thread in running))
+    else:
+        close_db_connections()
+    return failed
+
+def parse_args(argv=None):
+    '''
+    Parse command line arguments, processing modes are mutually exclusive
+    '''
     argsp = argparse.ArgumentParser()
-    argsp.add_argument( '-n', '--name',type=str, required=True, help='Transformation name')
+    argsp.add_argument( '-n', '--name',type=str, nargs='+', required=True,
+                        help='Transformation name(s)')
     argsp.add_argument( '-c', '--config', type=str, required=True, help='Application config file')
-    args = argsp.parse_args()
-    TRANSFORM_NAME = str(vars(args)['name'])
+    modes = argsp.add_mutually_exclusive_group()
+    modes.add_argument( '-s', '--stream', action='store_true',
+                        help='Stream source rows instead of loading whole file')
+    modes.add_argument( '--columnar', action='store_true',
+                        help='Hold source data in typed, dictionary encoded columns')
+    modes.add_argument( '-w', '--workers', type=int, default=1,
+                        help='Number of worker processes to validate and aggregate with')
+    argsp.add_argument( '--no-cache', action='store_true',
+                        help='Do not read or write the result cache')
+    modes.add_argument( '-i', '--incremental', action='store_true',
+                        help='Only process rows appended to source file since the last run')
+    modes.add_argument( '-p', '--pipelined', action='store_true',
+                        help='Read source file ahead in a reader thread while rows are processed')
+    argsp.add_argument( '--profile', action='store_true',
+                        help='Write cProfile statistics and sampled stacks of the run '
+                             'next to the log')
+    return argsp.parse_args(argv)
+
+if __name__ == "__main__":
+    # Parse input arguments
+    args = parse_args()
+    TRANSFORM_NAME = [str(name) for name in vars(args)['name']]
     APP_CFG_FILE = str(vars(args)['config'])
     APP_CONFIG = {}
     try:
@@ -53,4 +215,6 @@ if __name__ == "__main__":
     else:
         # setup logging and kickoff transformation process
         setup_logging(APP_CONFIG)
-        main(TRANSFORM_NAME)
+        main(TRANSFORM_NAME, stream=args.stream, workers=args.workers, app_config=APP_CONFIG,
+             columnar=args.columnar, incremental=args.incremental, use_cache=not args.no_cache,
+             profile=args.profile, pipelined=args.pipelined)
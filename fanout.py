@@ -0,0 +1,148 @@
+'''
+Multiple transformations over one shared source scan
+'''
+import json
+import logging
+import os
+import metrics
+from pipeline import Extract, Transform
+
+def scan_key(pipeline):
+    '''
+    Pipelines with equal scan keys read the same source with the same checks
+    and can share extraction and validation
+    '''
+    return (os.path.abspath(pipeline.source_file), pipeline.source_file_format.lower(),
+            tuple(pipeline.source_fields), tuple(pipeline.preprocess_checks),
+            json.dumps(pipeline.config.get('checks', {}), sort_keys=True, default=str))
+
+def group_pipelines(pipelines):
+    '''
+    Group pipelines by scan key, groups keep the order pipelines were passed in
+    '''
+    groups = {}
+    for pipeline in pipelines:
+        groups.setdefault(scan_key(pipeline), []).append(pipeline)
+    return list(groups.values())
+
+def scan_fields(pipelines):
+    '''
+    Fields extracted and validated by a shared scan, projected fields of any of pipelines
+    in source field order
+    '''
+    projected = [pipeline.projected_fields() for pipeline in pipelines]
+    return [field for field in pipelines[0].source_fields
+            if any(field in fields for fields in projected)]
+
+class ScanExtract(Extract):
+    '''
+    Extract of a shared scan, rows hold the given fields, see scan_fields
+    '''
+    def __init__(self, pipeline, fields):
+        Extract.__init__(self, pipeline)
+        self.fields = fields
+
+    def projected_fields(self):
+        return self.fields
+
+class ScanTransform(Transform):
+    '''
+    Validation of a shared scan over the given fields, see scan_fields
+    '''
+    def __init__(self, pipeline, extract, fields):
+        # set before Transform.__init__, which lays out rows by projected fields
+        self.fields = fields
+        Transform.__init__(self, pipeline, extract)
+
+    def projected_fields(self):
+        return self.fields
+
+def pipeline_reject(row_data, err_msg, failed_fields, fields, position):
+    '''
+    Rejected row of a shared scan as a single run of a pipeline with the given projected
+    fields rejects it, None if the row is valid for the pipeline
+    failed_fields - fields of err_msg, None for incomplete rows, see RowValidator
+    Incomplete rows already hold col_count and err_msg, see Transform.rejected_row
+    '''
+    if failed_fields is None:
+        return dict(row_data)
+    own = [msg for msg, field in zip(err_msg, failed_fields) if field in fields]
+    if len(own) == 0:
+        return None
+    rejected = {field: value for field, value in row_data.items() if field in fields}
+    return Transform.rejected_row(rejected, own, position)
+
+# pylint: disable=too-many-locals
+def run_group(pipelines):
+    '''
+    Extract and validate source once, then expand and aggregate every row
+    for each pipeline with its own field expansion and output fields
+    Rows are extracted and validated with the projected fields of all pipelines, a row
+    is rejected for a pipeline if it is incomplete or invalid in one of the projected
+    fields of that pipeline, so each pipeline gets the output of a single run
+    Returns list of (transform, output data) in order of pipelines
+    '''
+    fields = scan_fields(pipelines)
+    extract = ScanExtract(pipelines[0], fields)
+    transforms = [Transform(pipeline, extract) for pipeline in pipelines]
+    aggregators = [transform.aggregate([]) for transform in transforms]
+    expansions = [transform.config['output'].get('field_expansion', {})
+                  for transform in transforms]
+    projected = [set(pipeline.projected_fields()) for pipeline in pipelines]
+    logging.info('Shared source scan of %s for %s', pipelines[0].source_file,
+                 ', '.join(pipeline.transform_name for pipeline in pipelines))
+    scan = ScanTransform(pipelines[0], extract, fields)
+    validator = scan.get_validator()
+    fields = [pipeline.decoded_fields() for pipeline in pipelines]
+    if None in fields:
+        fields = None
+    else:
+        fields = [field for field in pipelines[0].source_fields
+                  if any(field in decoded for decoded in fields)]
+    scanned = 0
+    valid = 0
+    processed = [0] * len(pipelines)
+    # lines and offsets of rejected rows are tracked if any transformation quarantines them
+    positions = [transform.source_position() for transform in transforms]
+    position = next((position for position in positions if position is not None), None)
+    names = ','.join(pipeline.transform_name for pipeline in pipelines)
+    with metrics.stage('shared_scan', names):
+        for row, row_data in extract.iter_rows(fields=fields, position=position):
+            scanned = scanned + 1
+            transformed_row, err_msg = scan.check_row(row, row_data, validator)
+            if len(err_msg) == 0:
+                valid = valid + 1
+            elif validator.failed_fields is None:
+                scan.rejected_row(row_data, err_msg, position)
+            for i, (transform, aggregator, field_expansion) in enumerate(
+                    zip(transforms, aggregators, expansions)):
+                if len(err_msg) > 0:
+                    rejected = pipeline_reject(row_data, err_msg, validator.failed_fields,
+                                               projected[i], position)
+                    if rejected is not None:
+                        transform.reject(row, rejected)
+                        continue
+                processed[i] = processed[i] + 1
+                if len(field_expansion) == 0:
+                    aggregator.add(transformed_row)
+                    continue
+                expanded_row = dict(transformed_row)
+                Transform.expand_row(expanded_row, field_expansion)
+                aggregator.add(expanded_row)
+        metrics.count(rows_in=scanned, rows_out=valid)
+    for transform, count in zip(transforms, processed):
+        transform.finish_stream(count)
+    return [(transform, aggregator.result())
+            for transform, aggregator in zip(transforms, aggregators)]
+
+def run(pipelines):
+    '''
+    Run pipelines, sharing one extract and validation pass between
+    pipelines with the same source and checks
+    Returns dict of transform name: (transform, output data)
+    '''
+    results = {}
+    for group in group_pipelines(pipelines):
+        for pipeline, result in zip(group, run_group(group)):
+            results[pipeline.transform_name] = result
+    return results
@@ -0,0 +1,174 @@
+'''
+Incremental runs over an append only source file
+Partial aggregate state is checkpointed with the source file offset it covers,
+later runs only process rows appended since
+'''
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+import decompress
+import metrics
+from pipeline import Extract, Transform
+import sinks
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SUFFIX = '.checkpoint'
+# bytes at the start and before the end of processed data compared to detect rewritten files
+FINGERPRINT_BYTES = 1 << 16
+# bytes read at a time searching the end of source file for its last line break
+TAIL_BLOCK_SIZE = 1 << 16
+
+def get_checkpoint_file(pipeline):
+    '''
+    Checkpoint file from output.checkpoint of config, defaults to output file + .checkpoint
+    '''
+    return pipeline.config['output'].get('checkpoint', pipeline.output_file + CHECKPOINT_SUFFIX)
+
+def config_hash(config):
+    '''
+    Hash of the parts of transform config that aggregate state depends on
+    '''
+    state_config = {
+        'source': config.get('source', {}),
+        'checks': config.get('checks', {}),
+        'group_fields': config['output'].get('group_fields', []),
+        'leaf_fields': config['output'].get('leaf_fields', {}),
+        'field_expansion': config['output'].get('field_expansion', {}),
+        }
+    return hashlib.sha256(json.dumps(state_config, sort_keys=True).encode('utf-8')).hexdigest()
+
+def fingerprint(source_file, end):
+    '''
+    Hash of first and last FINGERPRINT_BYTES of source file until end offset
+    Unchanged as long as data is only appended after end
+    '''
+    digest = hashlib.blake2b(str(end).encode('utf-8'))
+    with open(source_file, 'rb') as source_f:
+        digest.update(source_f.read(min(end, FINGERPRINT_BYTES)))
+        source_f.seek(max(end - FINGERPRINT_BYTES, 0))
+        digest.update(source_f.read(min(end, FINGERPRINT_BYTES)))
+    return digest.hexdigest()
+
+def complete_end(source_file):
+    '''
+    Offset after the last line break of source file, 0 if there is none
+    A partial last line, e.g. of a row still being appended, is left for the next run
+    '''
+    with open(source_file, 'rb') as source_f:
+        end = source_f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(end - TAIL_BLOCK_SIZE, 0)
+            source_f.seek(start)
+            newline = source_f.read(end - start).rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+            end = start
+    return 0
+
+def load_checkpoint(checkpoint_file, pipeline):
+    '''
+    Read checkpoint, returns None if there is none or it does not apply
+    to the current source file and config
+    '''
+    try:
+        with open(checkpoint_file, 'rb') as checkpoint_f:
+            checkpoint = pickle.load(checkpoint_f)
+    except FileNotFoundError:
+        logging.info('No checkpoint found - \'%s\'', checkpoint_file)
+        return None
+    except (pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        logging.warning('Cannot read checkpoint - \'%s\'', checkpoint_file)
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        reason = 'checkpoint version changed'
+    elif checkpoint['config_hash'] != config_hash(pipeline.config):
+        reason = 'transform config changed'
+    elif checkpoint['source_file'] != os.path.abspath(pipeline.source_file):
+        reason = 'source file changed'
+    elif os.path.getsize(pipeline.source_file) < checkpoint['offset']:
+        reason = 'source file truncated'
+    elif fingerprint(pipeline.source_file, checkpoint['offset']) != checkpoint['fingerprint']:
+        reason = 'source file rewritten'
+    else:
+        return checkpoint
+    logging.warning('Checkpoint not used, %s. Running full rebuild.', reason)
+    return None
+
+def save_checkpoint(checkpoint_file, pipeline, offset, rows, aggregator):
+    '''
+    Write checkpoint of aggregate state covering source file until offset
+    rows - number of data rows until offset
+    '''
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'config_hash': config_hash(pipeline.config),
+        'source_file': os.path.abspath(pipeline.source_file),
+        'offset': offset,
+        'fingerprint': fingerprint(pipeline.source_file, offset),
+        'rows': rows,
+        'accumulators': aggregator.accumulators,
+        }
+    try:
+        with sinks.atomic_open(checkpoint_file, 'wb') as checkpoint_f:
+            pickle.dump(checkpoint, checkpoint_f, protocol=pickle.HIGHEST_PROTOCOL)
+    except FileNotFoundError:
+        logging.error('Error writing checkpoint - \'%s\'. Validate path.', checkpoint_file)
+    else:
+        logging.info('Checkpoint written - \'%s\', offset %s', checkpoint_file, offset)
+
+# pylint: disable=too-many-locals
+def run(pipeline, checkpoint_file=None):
+    '''
+    Aggregate rows appended to source file since the last checkpoint into its state
+    Falls back to processing the whole file when the checkpoint does not apply or the file
+    is compressed
+    Rejected rows of this run only are written to db
+    Returns (transform, output data)
+    '''
+    if checkpoint_file is None:
+        checkpoint_file = get_checkpoint_file(pipeline)
+    extract = Extract(pipeline)
+    transform = Transform(pipeline, extract)
+    aggregator = transform.aggregate([])
+    start = 0
+    rows_before = 0
+    try:
+        compressed = decompress.compression(pipeline.source_file) is not None
+        end = None if compressed else complete_end(pipeline.source_file)
+    except FileNotFoundError:
+        logging.error('Source file not found')
+        sys.exit(1)
+    if end is not None and end < os.path.getsize(pipeline.source_file):
+        logging.info('Partial last line of source file left for the next run, data ends at %s',
+                     end)
+    if compressed:
+        # appending to a compressed file rewrites its end, offsets cannot be checkpointed
+        logging.warning('Compressed source file is processed in full, no checkpoint is used')
+        checkpoint = None
+    else:
+        checkpoint = load_checkpoint(checkpoint_file, pipeline)
+    if checkpoint is not None:
+        aggregator.accumulators = checkpoint['accumulators']
+        start = checkpoint['offset']
+        rows_before = checkpoint['rows']
+        logging.info('Resuming from checkpoint at offset %s, %s rows', start, rows_before)
+    position = transform.source_position()
+    processed = 0
+    with metrics.stage('process_appended', pipeline.transform_name):
+        rows = extract.iter_rows(start, end, pipeline.decoded_fields(), position=position)
+        for row_data in transform.transform_stream(rows, partial=True, position=position):
+            aggregator.add(row_data)
+            processed = processed + 1
+        metrics.count(rows_in=processed + len(transform.rejected_data), rows_out=processed)
+    rejected_data = transform.rejected_data
+    transform.rejected_data = {}
+    for row, row_data in rejected_data.items():
+        transform.reject(str(int(row) + rows_before), row_data)
+    transform.finish_stream(processed)
+    if not compressed:
+        save_checkpoint(checkpoint_file, pipeline, end,
+                        rows_before + processed + len(rejected_data), aggregator)
+    return transform, aggregator.result()
@@ -0,0 +1,141 @@
+'''
+Logging setup from logging section of application config
+Records are queued and formatted and written to the log file in a listener thread
+Records of one message type beyond rate_limit per rate_interval seconds are dropped and
+counted, the counts are logged when logging stops
+'''
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+
+LOG_FORMAT = '%(asctime)s.%(msecs)03d %(module)-10s(%(funcName)-20s) %(levelname)-8s %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+RATE_INTERVAL = 60
+# listener thread and rate limit filter of the current setup
+LISTENER = None
+RATE_LIMIT = None
+
+class RateLimitFilter(logging.Filter):
+    '''
+    Pass at most limit records of a message type (level and format string) per interval seconds
+    Dropped records are counted per message type
+    '''
+    def __init__(self, limit, interval=RATE_INTERVAL):
+        logging.Filter.__init__(self)
+        self.limit = limit
+        self.interval = interval
+        # message type: [start of current interval, records passed in it]
+        self.windows = {}
+        self.dropped = {}
+        # records may come from several threads, e.g. sink writers
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.levelno, record.msg if isinstance(record.msg, str) else str(record.msg))
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or record.created - window[0] >= self.interval:
+                self.windows[key] = [record.created, 1]
+                return True
+            if window[1] < self.limit:
+                window[1] = window[1] + 1
+                return True
+            self.dropped[key] = self.dropped.get(key, 0) + 1
+            return False
+
+    def summary(self):
+        '''
+        Records dropped since the last call as list of (level, format string, count),
+        most dropped first
+        '''
+        with self.lock:
+            counts, self.dropped = self.dropped, {}
+        return sorted(((level, msg, count) for (level, msg), count in counts.items()),
+                      key=lambda record: -record[2])
+
+    def add(self, summary):
+        '''
+        Count records dropped elsewhere, summary as returned by summary()
+        '''
+        with self.lock:
+            for level, msg, count in summary:
+                self.dropped[(level, msg)] = self.dropped.get((level, msg), 0) + count
+
+class ThreadQueueHandler(logging.handlers.QueueHandler):
+    '''
+    Queue handler for a listener thread of the same process
+    Records are queued as they are, message arguments are formatted by the listener
+    '''
+    def prepare(self, record):
+        return record
+
+def setup(logging_config, background=True):
+    '''
+    Replace handlers of root logger as set up in logging section of application config
+        log_file, log_level - log file and level of root logger
+        background - write log file in a listener thread (default true)
+        rate_limit - records of one message type passed per rate_interval seconds
+                     (default none, all records are passed)
+        rate_interval - seconds, default RATE_INTERVAL
+    background - false writes records in the calling thread, e.g. in worker processes
+    '''
+    global LISTENER, RATE_LIMIT # pylint: disable=global-statement
+    stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    file_handler = logging.FileHandler(logging_config['log_file'])
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+    handler = file_handler
+    if logging_config.get('background', True) and background:
+        LISTENER = logging.handlers.QueueListener(queue.SimpleQueue(), file_handler)
+        LISTENER.start()
+        handler = ThreadQueueHandler(LISTENER.queue)
+    RATE_LIMIT = None
+    if logging_config.get('rate_limit') is not None:
+        RATE_LIMIT = RateLimitFilter(logging_config['rate_limit'],
+                                     logging_config.get('rate_interval', RATE_INTERVAL))
+        handler.addFilter(RATE_LIMIT)
+    root.addHandler(handler)
+    root.setLevel(logging_config['log_level'])
+
+def dropped():
+    '''
+    Records dropped by the rate limit since the last call, see RateLimitFilter.summary
+    Worker processes pass them to the parent, their atexit hooks do not run
+    '''
+    return [] if RATE_LIMIT is None else RATE_LIMIT.summary()
+
+def add_dropped(summary):
+    '''
+    Add records dropped in worker processes, see dropped, counts are logged by stop
+    '''
+    if RATE_LIMIT is None:
+        for level, msg, count in summary:
+            logging.log(level, '%s record(s) dropped by rate limit: %s', count, msg)
+        return
+    RATE_LIMIT.add(summary)
+
+def stop():
+    '''
+    Log counts of dropped records, write queued records and stop the listener thread
+    '''
+    global LISTENER # pylint: disable=global-statement
+    if RATE_LIMIT is not None:
+        for level, msg, count in RATE_LIMIT.summary():
+            logging.log(level, '%s record(s) dropped by rate limit: %s', count, msg)
+    if LISTENER is not None:
+        LISTENER.stop()
+        # records logged from here on are written in the calling thread
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, ThreadQueueHandler):
+                LISTENER.handlers[0].filters = handler.filters
+                root.removeHandler(handler)
+                root.addHandler(LISTENER.handlers[0])
+        LISTENER = None
+
+atexit.register(stop)
@@ -0,0 +1,302 @@
+'''
+Per stage instrumentation of pipeline runs
+Each stage records wall and cpu time, rows in and out, bytes read and peak RSS
+Stages of a run are emitted as one json metrics record, optionally as Prometheus textfile
+'''
+import contextlib
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+import sinks
+try:
+    import resource
+except ImportError:
+    resource = None
+
+METRIC_PREFIX = 'etl'
+# name, help text and stage attribute of Prometheus gauges per stage
+STAGE_GAUGES = [
+    ('stage_wall_seconds', 'Wall time of pipeline stage', 'wall_seconds'),
+    ('stage_cpu_seconds', 'CPU time of pipeline stage', 'cpu_seconds'),
+    ('stage_rows_in', 'Rows read by pipeline stage', 'rows_in'),
+    ('stage_rows_out', 'Rows produced by pipeline stage', 'rows_out'),
+    ('stage_bytes_read', 'Bytes of source read by pipeline stage', 'bytes_read'),
+    ('stage_peak_rss_bytes', 'Peak resident set size at the end of pipeline stage',
+     'peak_rss_bytes'),
+    ]
+
+def peak_rss():
+    '''
+    Peak resident set size of this process in bytes, None where not available
+    '''
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+class Stage():
+    '''
+    Measurements of one stage of a transformation
+    '''
+    # pylint: disable=too-many-instance-attributes,too-few-public-methods
+    def __init__(self, name, transform=None):
+        self.name = name
+        self.transform = transform
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = None
+        self.peak_rss_bytes = None
+
+    def as_dict(self):
+        '''
+        Stage as json serialisable dict
+        '''
+        return {'stage': self.name, 'transform': self.transform,
+                'wall_seconds': round(self.wall_seconds, 6),
+                'cpu_seconds': round(self.cpu_seconds, 6), 'rows_in': self.rows_in,
+                'rows_out': self.rows_out, 'bytes_read': self.bytes_read,
+                'peak_rss_bytes': self.peak_rss_bytes}
+
+class RunMetrics():
+    '''
+    Stages recorded during one run, in the order they completed
+    '''
+    def __init__(self):
+        self.started = datetime.now(timezone.utc)
+        self.wall_start = time.perf_counter()
+        self.stages = []
+        # outcome of each sink write, see dispatch
+        self.sinks = []
+        # rejected rows per transformation and reason, see quarantine
+        self.rejected = {}
+        # stages in progress per thread, counts go to the innermost one
+        self.local = threading.local()
+
+    def active(self):
+        '''
+        Stages in progress in the calling thread, innermost last
+        '''
+        if not hasattr(self.local, 'stages'):
+            self.local.stages = []
+        return self.local.stages
+
+    @contextlib.contextmanager
+    def stage(self, name, transform=None):
+        '''
+        Record wall and cpu time of the enclosed block as stage name of transform
+        Stages of the main thread take process cpu time, including threads helping them, e.g.
+        the read-ahead thread; stages of other threads, e.g. sink threads running concurrently,
+        take cpu time of their own thread only
+        '''
+        record = Stage(name, transform)
+        active = self.active()
+        active.append(record)
+        cpu_time = time.process_time if threading.current_thread() is threading.main_thread() \
+            else time.thread_time
+        wall_start = time.perf_counter()
+        cpu_start = cpu_time()
+        try:
+            yield record
+        finally:
+            record.wall_seconds = time.perf_counter() - wall_start
+            record.cpu_seconds = cpu_time() - cpu_start
+            record.peak_rss_bytes = peak_rss()
+            active.pop()
+            self.stages.append(record)
+            logging.info('Stage %s of %s: %.3fs wall, %.3fs cpu, rows in %s, rows out %s',
+                         name, transform, record.wall_seconds, record.cpu_seconds,
+                         record.rows_in, record.rows_out)
+
+    def count(self, rows_in=None, rows_out=None, bytes_read=None):
+        '''
+        Add rows and bytes to the innermost stage in progress, ignored outside of stages
+        '''
+        active = self.active()
+        if len(active) == 0:
+            return
+        record = active[-1]
+        if rows_in is not None:
+            record.rows_in = (record.rows_in or 0) + rows_in
+        if rows_out is not None:
+            record.rows_out = (record.rows_out or 0) + rows_out
+        if bytes_read is not None:
+            record.bytes_read = (record.bytes_read or 0) + bytes_read
+
+    def sink(self, transform, name, status, latency):
+        '''
+        Record outcome (ok, failed or timeout) and latency in seconds of writing sink name
+        '''
+        self.sinks.append({'sink': name, 'transform': transform, 'status': status,
+                           'latency_seconds': round(latency, 6)})
+
+    def rejects(self, transform, counts):
+        '''
+        Record rejected rows of transform per reason
+        '''
+        rejected = self.rejected.setdefault(transform, {})
+        for reason, rows in counts.items():
+            rejected[reason] = rejected.get(reason, 0) + rows
+
+    def record(self):
+        '''
+        Metrics record of the run
+        '''
+        return {'started': self.started.isoformat(),
+                'duration_seconds': round(time.perf_counter() - self.wall_start, 6),
+                'peak_rss_bytes': peak_rss(),
+                'stages': [recorded.as_dict() for recorded in self.stages],
+                'sinks': list(self.sinks),
+                'rejected_rows': {transform: dict(counts)
+                                  for transform, counts in self.rejected.items()}}
+
+    def prometheus(self):
+        '''
+        Run metrics in Prometheus text exposition format
+        Stages recorded more than once for a transformation are summed, peak RSS is the maximum
+        '''
+        totals = {}
+        for recorded in self.stages:
+            total = totals.setdefault((recorded.transform, recorded.name),
+                                      Stage(recorded.name, recorded.transform))
+            total.wall_seconds = total.wall_seconds + recorded.wall_seconds
+            total.cpu_seconds = total.cpu_seconds + recorded.cpu_seconds
+            for attr in ('rows_in', 'rows_out', 'bytes_read'):
+                if getattr(recorded, attr) is not None:
+                    setattr(total, attr, (getattr(total, attr) or 0) + getattr(recorded, attr))
+            if recorded.peak_rss_bytes is not None:
+                total.peak_rss_bytes = max(total.peak_rss_bytes or 0, recorded.peak_rss_bytes)
+        record = self.record()
+        lines = []
+        for name, help_text, value in [
+                ('run_timestamp_seconds', 'Start time of the run', self.started.timestamp()),
+                ('run_duration_seconds', 'Wall time of the run', record['duration_seconds']),
+                ('run_peak_rss_bytes', 'Peak resident set size of the run',
+                 record['peak_rss_bytes'])]:
+            if value is not None:
+                lines.extend([f'# HELP {METRIC_PREFIX}_{name} {help_text}',
+                              f'# TYPE {METRIC_PREFIX}_{name} gauge',
+                              f'{METRIC_PREFIX}_{name} {value}'])
+        for name, help_text, attr in STAGE_GAUGES:
+            samples = [(labels(total), getattr(total, attr)) for total in totals.values()
+                       if getattr(total, attr) is not None]
+            if len(samples) == 0:
+                continue
+            lines.extend([f'# HELP {METRIC_PREFIX}_{name} {help_text}',
+                          f'# TYPE {METRIC_PREFIX}_{name} gauge'])
+            lines.extend(f'{METRIC_PREFIX}_{name}{{{sample_labels}}} {value}'
+                         for sample_labels, value in samples)
+        if len(self.sinks) > 0:
+            lines.extend([f'# HELP {METRIC_PREFIX}_sink_latency_seconds Wall time of sink write',
+                          f'# TYPE {METRIC_PREFIX}_sink_latency_seconds gauge'])
+            lines.extend(f'{METRIC_PREFIX}_sink_latency_seconds{{{sink_labels(written)}}} '
+                         f'{written["latency_seconds"]}' for written in self.sinks)
+        if any(len(counts) > 0 for counts in self.rejected.values()):
+            lines.extend([f'# HELP {METRIC_PREFIX}_rejected_rows Rows rejected per reason',
+                          f'# TYPE {METRIC_PREFIX}_rejected_rows gauge'])
+            lines.extend(f'{METRIC_PREFIX}_rejected_rows{{transform="{escape(transform)}",'
+                         f'reason="{escape(reason)}"}} {rows}'
+                         for transform, counts in self.rejected.items()
+                         for reason, rows in counts.items())
+        return '\n'.join(lines) + '\n'
+
+    def write(self, metrics_config):
+        '''
+        Emit metrics record as set up in metrics section of application config
+            file - json lines file the record of each run is appended to
+            prometheus_file - Prometheus textfile, replaced on each run
+        '''
+        if not metrics_config:
+            return
+        try:
+            if 'file' in metrics_config:
+                with open(metrics_config['file'], 'a', encoding='utf-8') as metrics_f:
+                    metrics_f.write(json.dumps(self.record()) + '\n')
+            if 'prometheus_file' in metrics_config:
+                # textfile collectors may read at any time, never expose a partial file
+                with sinks.atomic_open(metrics_config['prometheus_file'], 'w',
+                                       encoding='utf-8') as prom_f:
+                    prom_f.write(self.prometheus())
+        except OSError as err:
+            logging.error('Error writing metrics - %s', err)
+        else:
+            logging.info('Metrics written')
+
+def escape(value):
+    '''
+    Value escaped for a Prometheus label
+    '''
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def labels(recorded):
+    '''
+    Prometheus label set of recorded stage
+    '''
+    return f'transform="{escape(recorded.transform)}",stage="{escape(recorded.name)}"'
+
+def sink_labels(written):
+    '''
+    Prometheus label set of recorded sink write
+    '''
+    return (f'transform="{escape(written["transform"])}",sink="{escape(written["sink"])}",'
+            f'status="{written["status"]}"')
+
+# metrics of the current run
+RUN = RunMetrics()
+
+def reset():
+    '''
+    Start metrics of a new run
+    '''
+    global RUN # pylint: disable=global-statement
+    RUN = RunMetrics()
+    return RUN
+
+def stage(name, transform=None):
+    '''
+    Record enclosed block as stage of the current run, see RunMetrics.stage
+    '''
+    return RUN.stage(name, transform)
+
+def count(rows_in=None, rows_out=None, bytes_read=None):
+    '''
+    Add rows and bytes to the innermost stage in progress, see RunMetrics.count
+    '''
+    RUN.count(rows_in, rows_out, bytes_read)
+
+def sink(transform, name, status, latency):
+    '''
+    Record outcome and latency of a sink write, see RunMetrics.sink
+    '''
+    RUN.sink(transform, name, status, latency)
+
+def rejects(transform, counts):
+    '''
+    Record rejected rows per reason, see RunMetrics.rejects
+    '''
+    RUN.rejects(transform, counts)
+
+def write(metrics_config):
+    '''
+    Emit metrics record of the current run, see RunMetrics.write
+    '''
+    RUN.write(metrics_config)
+
+def timed(name):
+    '''
+    Decorator recording each call of a pipeline method as stage name of its transformation
+    Sample usage: @timed('extract')
+    '''
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with stage(name, self.transform_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
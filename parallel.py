@@ -0,0 +1,100 @@
+'''
+Multi-process chunked validation and aggregation
+'''
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import decompress
+import logqueue
+import metrics
+from pipeline import Extract, Transform
+
+def split_source(source_file, chunks):
+    '''
+    Split data rows of source file into byte ranges aligned to line boundaries
+    Returns list of (start, end) offsets, header row is not part of any range
+    Compressed source files cannot be split without decompressing them, they are read as one
+    range (0, None) including the header row
+    '''
+    try:
+        if decompress.compression(source_file) is not None:
+            logging.info('Compressed source file is processed as one chunk')
+            return [(0, None)]
+        size = os.path.getsize(source_file)
+        with open(source_file, 'rb') as source_f:
+            source_f.readline() # Skip header row
+            data_start = source_f.tell()
+            boundaries = [data_start]
+            for i in range(1, chunks):
+                source_f.seek(max(data_start + (size - data_start) * i // chunks - 1, data_start))
+                source_f.readline()
+                boundary = source_f.tell()
+                if boundaries[-1] < boundary < size:
+                    boundaries.append(boundary)
+    except FileNotFoundError:
+        logging.error('Source file not found')
+        sys.exit(1)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def process_chunk(pipeline, start, end):
+    '''
+    Validate and partially aggregate one byte range of source file
+    Returns (aggregator, rejected rows, number of valid rows, number of lines read,
+    number of bytes read, log records dropped by rate limit, see logqueue.dropped)
+    Row and line numbers of rejected rows are relative to the start of the range,
+    lines are only counted when rejected rows are quarantined
+    '''
+    extract = Extract(pipeline)
+    transform = Transform(pipeline, extract)
+    aggregator = transform.aggregate([])
+    processed = 0
+    position = transform.source_position(line=1)
+    # metrics of worker processes are not written, bytes read are returned to the parent
+    with metrics.stage('process_chunk', pipeline.transform_name) as chunk_stage:
+        rows = extract.iter_rows(start, end, pipeline.decoded_fields(), position=position)
+        for row_data in transform.transform_stream(rows, partial=True, position=position):
+            aggregator.add(row_data)
+            processed = processed + 1
+    lines = 0 if position is None else position.end_line - 1
+    return (aggregator, transform.rejected_data, processed, lines, chunk_stage.bytes_read or 0,
+            logqueue.dropped())
+
+# pylint: disable=too-many-locals
+def run(pipeline, workers, initializer=None, initargs=()):
+    '''
+    Validate and aggregate source file in worker processes
+    Partial results are merged in source order so output matches the single process run
+    initializer, initargs - called in each worker process, e.g. to setup logging
+    Returns (transform, output data)
+    '''
+    extract = Extract(pipeline)
+    transform = Transform(pipeline, extract)
+    aggregator = transform.aggregate([])
+    ranges = split_source(pipeline.source_file, workers)
+    logging.info('Processing %s chunk(s) with %s worker(s)', len(ranges), workers)
+    processed = 0
+    rows_before = 0
+    # header row, unless part of the first range
+    lines_before = 0 if ranges[0][0] == 0 else 1
+    with metrics.stage('process_chunks', pipeline.transform_name), \
+        ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                            initargs=initargs) as executor:
+        results = executor.map(process_chunk, [pipeline] * len(ranges),
+                               [start for start,_ in ranges], [end for _,end in ranges])
+        for chunk_aggregator, rejected_data, chunk_processed, lines, bytes_read, dropped \
+                in results:
+            aggregator.merge(chunk_aggregator)
+            logqueue.add_dropped(dropped)
+            for row, row_data in rejected_data.items():
+                if 'line' in row_data:
+                    row_data['line'] = row_data['line'] + lines_before
+                transform.reject(str(int(row) + rows_before), row_data)
+            rows_before = rows_before + chunk_processed + len(rejected_data)
+            lines_before = lines_before + lines
+            processed = processed + chunk_processed
+            metrics.count(rows_in=chunk_processed + len(rejected_data), rows_out=chunk_processed,
+                          bytes_read=bytes_read)
+    transform.finish_stream(processed)
+    return transform, aggregator.result()
@@ -3,24 +3,50 @@ Pipeline invocation
 '''
 import sys
 import csv
-import json
 import logging
-import copy
-from pymongo import MongoClient
+import mmap
+import os
+from itertools import islice
+from pymongo import MongoClient, ASCENDING
 from pymongo import errors
 import yaml
 from yaml.scanner import ScannerError
+from aggregate import Aggregator
+from columnar import ColumnStore
+from rowview import RowView
+import decompress
+import metrics
+import quarantine
+import sinks
 import utils
+# pylint: disable=unused-import
+from validator import RowValidator, ERR_INCOMPLETE_DATA_ROW, INVALID_MSG, MSG_INVALID_ROW, \
+    IncompleteRow, col_count
 
-ERR_INCOMPLETE_DATA_ROW = "Some fields missing data"
-INVALID_MSG="Invalid ({}):{}"
-MSG_INVALID_ROW = 'Row %s --> Invalid %s : %s'
 PREPROCESS_CHECKS = [
     'data',
     'date_field',
     'float_field',
     'number_field'
     ]
+DB_WRITE_MODES = ['document', 'bulk']
+DB_LOAD_MODES = ['replace', 'swap']
+DB_STAGING_SUFFIX = '_staging'
+DB_BATCH_SIZE = 1000
+DB_POOL_SIZE = 100
+# MongoClient per (host, port), shared by all db writes of a run
+DB_CLIENTS = {}
+SOURCE_READERS = ['csv', 'mmap']
+# bytes of memory mapped source file split into lines at a time
+MAPPED_BLOCK_SIZE = 1 << 20
+
+def close_db_connections():
+    '''
+    Close shared db connections
+    '''
+    for client in DB_CLIENTS.values():
+        client.close()
+    DB_CLIENTS.clear()
 
 class Pipeline():
     '''
@@ -40,6 +66,7 @@ class Pipeline():
         self.output_fields = []
         self.preprocess_checks = []
 
+    @metrics.timed('get_config')
     def get_config(self):
         '''
         read initial required setup from config file
@@ -104,6 +131,62 @@ class Pipeline():
             if required_task:
                 self.preprocess_checks.append(task)
 
+    def categorical_fields(self):
+        '''
+        Fields to dictionary encode in columnar mode
+        source.categorical, fields with data or date checks and group fields
+        '''
+        checks = self.config.get('checks') or {}
+        fields = list(self.config['source'].get('categorical', []))
+        fields.extend((checks.get('data') or {}).keys())
+        fields.extend(checks.get('date_field') or [])
+        fields.extend(self.config['output'].get('group_fields', []))
+        return [field for i, field in enumerate(fields) if field not in fields[:i]]
+
+    def strict_checks(self):
+        '''
+        checks.strict of config, validate all source fields of every row
+        '''
+        return bool((self.config.get('checks') or {}).get('strict', False))
+
+    def required_fields(self):
+        '''
+        Source fields the transformation reads or checks values of, in source field order
+        group fields, leaf fields, expanded fields and fields with data, date, float
+        and number checks
+        '''
+        checks = self.config.get('checks') or {}
+        output = self.config['output']
+        fields = set((checks.get('data') or {}).keys())
+        for task in ('date_field', 'float_field', 'number_field'):
+            fields.update(checks.get(task) or [])
+        fields.update(output.get('group_fields', []))
+        fields.update(output.get('leaf_fields', {}).keys())
+        fields.update(output.get('field_expansion', {}).keys())
+        return [field for field in self.source_fields if field in fields]
+
+    def decoded_fields(self):
+        '''
+        Fields to decode when streaming source rows, from source.reader of config
+        csv (default) - None, all fields are decoded
+        mmap - required_fields(), read through memory mapped reader
+        '''
+        reader = self.config['source'].get('reader', SOURCE_READERS[0])
+        if reader not in SOURCE_READERS:
+            logging.error('Source reader \'%s\' not supported', reader)
+            sys.exit(1)
+        return self.required_fields() if reader == 'mmap' else None
+
+    def projected_fields(self):
+        '''
+        Fields of extracted rows, in source field order
+        required_fields() unless checks are strict, other fields are neither extracted
+        nor checked for blank values; all source fields when checks are strict
+        '''
+        if self.strict_checks():
+            return list(self.source_fields)
+        return self.required_fields()
+
 class Extract(Pipeline):
     '''
     Methods required to extract data from given source file
@@ -112,16 +195,21 @@ class Extract(Pipeline):
         Pipeline.__init__(self, pipeline.transform_name)
         self.source_fields = pipeline.source_fields
         self.source_file = pipeline.source_file
+        self.config = pipeline.config
         self.source_data = {}
 
+    @metrics.timed('extract')
     def extract(self):
         '''
         Extract data from source file
         '''
         if self.source_file_format.lower() == 'csv':
             try:
-                with open( self.source_file, 'r', encoding='utf-8' ) as source_f:
+                compressed = decompress.compression(self.source_file) is not None
+                with decompress.open_text(self.source_file) as source_f:
                     data_rows = list(csv.reader(source_f))
+                    metrics.count(bytes_read=source_f.buffer.tell() if compressed
+                                  else os.fstat(source_f.fileno()).st_size)
             except FileNotFoundError:
                 logging.error('Source file not found')
                 sys.exit(1)
@@ -132,17 +220,199 @@ class Extract(Pipeline):
             # create source data as nested dictionary
             # Main key is row number
             # Each row value will be dict of form {field1: value1, field2: value2, ...so on}
-            rownum = 1
-            for row in data_rows:
-                self.source_data[str(rownum)] = dict(zip(self.source_fields,row))
-                rownum = rownum + 1
+            # of projected fields
+            fields = self.projected_fields()
+            for rownum, row in self.project(enumerate(data_rows, start=1)):
+                self.source_data[str(rownum)] = row if isinstance(row, IncompleteRow) \
+                    else dict(zip(fields,row))
             logging.info('%s records extracted', len(self.source_data))
+            metrics.count(rows_out=len(self.source_data))
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def iter_rows(self, start=0, end=None, fields=None, read_ahead=0, position=None):
+        '''
+        Stream data rows from source file one at a time
+        Yields (row number, row) where row is of form {field1: value1, field2: value2, ...so on}
+        of projected fields, see Pipeline.projected_fields
+        Row numbers match the keys extract() uses in source_data
+        start, end - optional byte range of source file to read, start must be at a line boundary
+                     header row is skipped only when reading from the start of the file
+                     row numbers are relative to start
+        fields - optional list of fields to decode, read through iter_records_mapped
+        read_ahead - blocks of source file to read ahead in a reader thread, see iter_records
+        position - optional quarantine.SourcePosition, updated to the line number and byte offset
+                   of each row as it is yielded, its line is the line number at start
+                   when start is not 0
+        '''
+        if fields is None:
+            records = self.iter_records(start, end, read_ahead, position)
+        else:
+            records = self.iter_records_mapped(fields, start, end, position)
+        fields = self.projected_fields()
+        for rownum, row in self.project(records):
+            yield str(rownum), row if isinstance(row, IncompleteRow) else dict(zip(fields,row))
+
+    def project(self, records):
+        '''
+        Records of (row number, row values) reduced to values of projected fields
+        Rows with more or fewer values than source fields are IncompleteRow, positions of
+        their values are unknown, and rejected as incomplete
+        '''
+        fields = self.projected_fields()
+        field_count = len(self.source_fields)
+        if fields == self.source_fields:
+            return ((rownum, row if len(row) == field_count
+                     else IncompleteRow(self.source_fields, row))
+                    for rownum, row in records)
+        positions = [self.source_fields.index(field) for field in fields]
+        return ((rownum, [row[i] for i in positions] if len(row) == field_count
+                 else IncompleteRow(self.source_fields, row))
+                for rownum, row in records)
+
+    def iter_records(self, start=0, end=None, read_ahead=0, position=None):
+        '''
+        Stream data rows from source file as lists of values
+        Yields (row number, row values), see iter_rows for start, end and position
+        read_ahead - number of blocks a reader thread reads ahead while rows are parsed,
+                     0 reads in the calling thread
+        Compressed source files are decompressed in a reader thread, start and end are offsets
+        of the decompressed data, see decompress.open_source
+        '''
+        if self.source_file_format.lower() != 'csv':
+            return
+        try:
+            lines_f = decompress.open_source(self.source_file, start, read_ahead)
+        except FileNotFoundError:
+            logging.error('Source file not found')
+            sys.exit(1)
+
+        with lines_f:
+            if position is not None:
+                position.seek(start, 1 if start == 0 else position.line)
+            reader = csv.reader(self.read_lines(lines_f, start, end, position))
+            if start == 0:
+                next(reader, None) # Skip header row
+                if position is not None:
+                    position.next_record()
+            rownum = 0
+            for rownum, row in enumerate(reader, start=1):
+                if position is not None:
+                    position.next_record()
+                yield rownum, row
+            logging.info('%s records extracted', rownum)
+            offset = lines_f.tell()
+            metrics.count(bytes_read=(offset if end is None else min(offset, end)) - start)
+
+    def iter_records_mapped(self, fields, start=0, end=None, position=None):
+        '''
+        Stream data rows of memory mapped source file as lists of values
+        Lines and values are split on the raw bytes, only values of fields are decoded
+        Values of other fields are None, unless blank so completeness checks still see them
+        Files with quoted values and compressed files are read through iter_records
+        Yields (row number, row values), see iter_rows for start, end and position
+        '''
+        if self.source_file_format.lower() != 'csv':
+            return
+        try:
+            compressed = decompress.compression(self.source_file) is not None
+            source_f = None if compressed else open( self.source_file, 'rb' ) # pylint: disable=consider-using-with
+        except FileNotFoundError:
+            logging.error('Source file not found')
+            sys.exit(1)
+        if compressed:
+            logging.info('Compressed source file cannot be memory mapped, decoding all fields')
+            yield from self.iter_records(start, end, position=position)
+            return
+
+        with source_f:
+            size = os.fstat(source_f.fileno()).st_size
+            end = size if end is None else min(end, size)
+            if start >= end:
+                logging.info('0 records extracted')
+                return
+            with mmap.mmap(source_f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if mapped.find(b'"', start, end) != -1:
+                    logging.info('Quoted values in source file, decoding all fields')
+                    yield from self.iter_records(start, end, position=position)
+                    return
+                wanted = [field in fields for field in self.source_fields]
+                if position is not None:
+                    position.seek(start, 1 if start == 0 else position.line)
+                if start == 0:
+                    start = mapped.find(b'\n', 0, end) + 1 or end # Skip header row
+                    if position is not None:
+                        position.read(start)
+                        position.next_record()
+                rownum = 0
+                for line in self.iter_mapped_lines(mapped, start, end, position):
+                    rownum = rownum + 1
+                    if position is not None:
+                        position.next_record()
+                    values = line.split(b',') if len(line) > 0 else []
+                    if len(values) != len(wanted):
+                        # incomplete row, kept as read
+                        yield rownum, [value.decode('utf-8') for value in values]
+                        continue
+                    yield rownum, [value.decode('utf-8')
+                                   if want or not value.isascii() or not value.strip() else None
+                                   for value, want in zip(values, wanted)]
+                logging.info('%s records extracted', rownum)
+                metrics.count(bytes_read=end - start)
+
+    @staticmethod
+    def iter_mapped_lines(mapped, start, end, position=None):
+        '''
+        Lines of memory mapped file from start until end offset without line endings
+        Split a block of MAPPED_BLOCK_SIZE bytes at a time
+        position - optional quarantine.SourcePosition lines read are added to
+        '''
+        while start < end:
+            block_end = min(start + MAPPED_BLOCK_SIZE, end)
+            if block_end < end:
+                block_end = mapped.rfind(b'\n', start, block_end) + 1 or \
+                            (mapped.find(b'\n', block_end, end) + 1 or end)
+            lines = mapped[start:block_end].split(b'\n')
+            if lines[-1] == b'':
+                lines.pop()
+            for line in lines:
+                if position is not None:
+                    position.read(len(line) + 1)
+                yield line[:-1] if line.endswith(b'\r') else line
+            start = block_end
+
+    @metrics.timed('extract_columns')
+    def extract_columns(self, categorical_fields=()):
+        '''
+        Extract data from source file into columnar store
+        categorical_fields - fields to dictionary encode
+        '''
+        store = ColumnStore(self.projected_fields(), categorical_fields)
+        for _, row in self.project(self.iter_records()):
+            store.append(row)
+        metrics.count(rows_out=store.row_count)
+        return store
+
+    @staticmethod
+    def read_lines(source_f, start, end, position=None):
+        '''
+        Decoded lines of binary source file from start until end offset
+        position - optional quarantine.SourcePosition lines read are added to
+        '''
+        offset = start
+        for line in source_f:
+            if end is not None and offset >= end:
+                return
+            offset = offset + len(line)
+            if position is not None:
+                position.read(len(line))
+            yield line.decode('utf-8')
 
 class Transform(Pipeline):
     '''
     Methods required to perform transformation
     of input source data
     '''
+    # pylint: disable=too-many-public-methods
     # pylint: disable=too-many-instance-attributes
     # 9 is reasonable in this case
     def __init__(self, pipeline, extract):
@@ -158,132 +428,54 @@ class Transform(Pipeline):
         self.config = pipeline.config
         self.source_fields = extract.source_fields
         self.source_data = extract.source_data
-        self.transformed_data = copy.deepcopy(extract.source_data)
-        # initialise all initial data as valid
-        # data will be individually validated in later stages of pipeline
-        for row in self.transformed_data.keys():
-            self.transformed_data[row]['col_count'] = len(self.source_data[row])
-            self.transformed_data[row]['is_valid'] = True
-            self.transformed_data[row]['err_msg'] = []
+        # copy-on-write views over source rows, converted and expanded values
+        # are kept in the views and source rows stay untouched
+        layout = {field: i for i, field in enumerate(self.projected_fields())}
+        self.transformed_data = {row: RowView(row_data, layout)
+                                 for row, row_data in extract.source_data.items()}
+        # err_msg of invalid rows, all other rows are valid
+        self.row_errors = {}
         self.rejected_data = {}
+        self.rejects = quarantine.RejectSink(self.transform_name,
+                                             self.config['output'].get('quarantine', {}),
+                                             self.projected_fields())
         self.lookup_to_expand_fields = {}
 
-    def check_missing_fields(self):
-        '''
-        Check data row is complete
-        '''
-        for row in self.source_data.keys():
-            if len(self.source_fields) != len(self.source_data[row]):
-                logging.debug('Record #%s has incomplete data.', row)
-                self.transformed_data[row]['is_valid'] = False
-                self.transformed_data[row]['err_msg'].append(ERR_INCOMPLETE_DATA_ROW)
-
-    def check_missing_data(self):
-        '''
-        Check no data row is empty
-        '''
-        # missing data in fields
-        for field in self.source_fields:
-            for row in self.source_data.keys():
-                if ERR_INCOMPLETE_DATA_ROW not in self.transformed_data[row]['err_msg']:
-                    err = []
-                    if self.source_data[row][field].strip() == '':
-                        err.append(INVALID_MSG.format(field,self.source_data[row][field]))
-                        logging.debug(MSG_INVALID_ROW, row, field, self.source_data[row][field])
-                    if len(err) > 0:
-                        self.transformed_data[row]['is_valid'] = False
-                        self.transformed_data[row]['err_msg'].append(err)
-
-    def check_data_completeness(self):
-        '''
-        Checks all fields have values
-        '''
-        self.check_missing_fields()
-        self.check_missing_data()
-
-    def check_data(self):
-        '''
-        Checks fields have expected values
-        '''
-        valid_data_map = self.config['checks']['data']
-        for field, valid_values in valid_data_map.items():
-            for row in self.source_data.keys():
-                if ERR_INCOMPLETE_DATA_ROW not in self.transformed_data[row]['err_msg']:
-                    err = []
-                    if not self.source_data[row][field] in valid_values:
-                        err.append(INVALID_MSG.format(field,self.source_data[row][field]))
-                        logging.debug(MSG_INVALID_ROW, row, field, self.source_data[row][field])
-                    if len(err) > 0:
-                        self.transformed_data[row]['is_valid'] = False
-                        self.transformed_data[row]['err_msg'].append(err)
-
-    def check_date_field(self):
-        '''
-        Checks date fields have valid values
-        '''
-        fields_to_check = self.config['checks']['date_field']
-        for field in fields_to_check:
-            for row in self.source_data.keys():
-                if ERR_INCOMPLETE_DATA_ROW not in self.transformed_data[row]['err_msg']:
-                    err = []
-                    if not utils.is_valid_date(self.source_data[row][field],date_format='%m/%d/%Y'):
-                        err.append(INVALID_MSG.format(field,self.source_data[row][field]))
-                        logging.debug(MSG_INVALID_ROW, row, field, self.source_data[row][field])
-                    if len(err) > 0:
-                        self.transformed_data[row]['is_valid'] = False
-                        self.transformed_data[row]['err_msg'].append(err)
-
-    def check_float_field(self):
-        '''
-        Checks float fields have valid values
-        '''
-        fields_to_check = self.config['checks']['float_field']
-        for field in fields_to_check:
-            for row in self.source_data.keys():
-                if ERR_INCOMPLETE_DATA_ROW not in self.transformed_data[row]['err_msg']:
-                    err = []
-                    if not utils.is_numeric(self.source_data[row][field]):
-                        err.append(INVALID_MSG.format(field,self.source_data[row][field]))
-                        logging.debug(MSG_INVALID_ROW, row, field, self.source_data[row][field])
-                    else:
-                        self.transformed_data[row][field] = float(self.transformed_data[row][field])
-                    if len(err) > 0:
-                        self.transformed_data[row]['is_valid'] = False
-                        self.transformed_data[row]['err_msg'].append(err)
-
-    def check_number_field(self):
-        '''
-        Checks numeric fields have valid values
-        '''
-        fields_to_check = self.config['checks']['number_field']
-        for field in fields_to_check:
-            for row in self.source_data.keys():
-                if ERR_INCOMPLETE_DATA_ROW not in self.transformed_data[row]['err_msg']:
-                    err = []
-                    if not self.source_data[row][field].isdigit():
-                        err.append(INVALID_MSG.format(field,self.source_data[row][field]))
-                        logging.debug(MSG_INVALID_ROW, row, field, self.source_data[row][field])
-                    else:
-                        self.transformed_data[row][field] = int(self.transformed_data[row][field])
-                    if len(err) > 0:
-                        self.transformed_data[row]['is_valid'] = False
-                        self.transformed_data[row]['err_msg'].append(err)
+    def get_validator(self):
+        '''
+        Compile preprocess/validation tasks into single pass row validator
+        '''
+        return RowValidator(self.source_fields, self.config.get('checks', {}),
+                            self.preprocess_checks, self.projected_fields())
 
+    @metrics.timed('run_preprocess')
     def run_preprocess(self):
         '''
         Executing preprocess/validation tasks of pipeline
+        All tasks are applied to each row in a single pass over source data
         '''
-        for task in self.preprocess_checks:
-            logging.info('Task: %s', task)
-            try:
-                getattr(Transform, 'check_'+task)(self)
-            except AttributeError:
-                logging.warning('Task \'%s\' undefined', task)
-                continue
+        validator = self.get_validator()
+        for row, row_data in self.source_data.items():
+            err_msg = validator.validate_row(row, row_data, self.transformed_data[row])
+            if len(err_msg) > 0:
+                self.row_errors[row] = err_msg
+        metrics.count(rows_in=len(self.source_data),
+                      rows_out=len(self.source_data) - len(self.row_errors))
+
+    @staticmethod
+    def check_row(row, row_data, validator):
+        '''
+        Validate single source row
+        Returns (transformed row, err_msg), err_msg is empty for a valid row
+        '''
+        transformed_row = dict(row_data)
+        err_msg = validator.validate_row(row, row_data, transformed_row)
+        return transformed_row, err_msg
 
     def get_db_connection(self):
         '''
         Get db connection to write transformation output to
+        Connections are pooled and shared by all writes to the same host/port
         '''
         db_host=''
         db_port=''
@@ -297,36 +489,151 @@ class Transform(Pipeline):
             print(err_text + ' Please check logs.')
             sys.exit(1)
 
+        connect = DB_CLIENTS.get((db_host, db_port))
+        if connect is not None:
+            return connect
         try:
-            connect = MongoClient(db_host, db_port)
+            connect = MongoClient(db_host, db_port,
+                                  maxPoolSize=self.config['output']['db'].get('pool_size',
+                                                                              DB_POOL_SIZE))
         except errors.ServerSelectionTimeoutError:
             logging.error('Could not connect to MongoDB')
             sys.exit(1)
         else:
+            DB_CLIENTS[(db_host, db_port)] = connect
             return connect
 
-    def write_rejected_rows_to_db(self):
+    def get_db_write_mode(self):
         '''
-        Write data from dictionary into database
+        Configured db write mode
+        document - whole output or all rejected rows as a single document
+        bulk - one document per output leaf or rejected row, written in batches
+        '''
+        write_mode = self.config['output']['db'].get('write_mode', DB_WRITE_MODES[0])
+        if write_mode not in DB_WRITE_MODES:
+            logging.error('DB write mode \'%s\' not supported', write_mode)
+            sys.exit(1)
+        return write_mode
+
+    def get_db_load_mode(self):
+        '''
+        Configured db load mode
+        replace - drop collection, then write documents into it
+        swap - write documents and indexes into a staging collection and rename it
+               over the collection, readers never see a partially loaded collection
+        '''
+        load_mode = self.config['output']['db'].get('load_mode', DB_LOAD_MODES[0])
+        if load_mode not in DB_LOAD_MODES:
+            logging.error('DB load mode \'%s\' not supported', load_mode)
+            sys.exit(1)
+        return load_mode
+
+    @staticmethod
+    def create_indexes(coll_name, indexes):
+        '''
+        Create ascending indexes on collection
+        indexes - list of field, list of fields or {fields: list of fields, unique: True/False}
+        '''
+        for index in indexes:
+            unique = False
+            if isinstance(index, dict):
+                unique = index.get('unique', False)
+                index = index.get('fields', [])
+            if isinstance(index, str):
+                index = [index]
+            if len(index) == 0:
+                logging.error('No fields specified for index of collection %s', coll_name.name)
+                sys.exit(1)
+            name = coll_name.create_index([(field, ASCENDING) for field in index], unique=unique)
+            logging.info('Index %s created on collection %s', name, coll_name.name)
+
+    def write_documents(self, collection, documents, indexes=()):
+        '''
+        Replace contents of collection with documents and create indexes, see get_db_load_mode
+        Documents are written unordered in batches of output.db.batch_size
+        A failed swap leaves the previous contents of collection in place
+        Returns number of documents written
         '''
-        data = copy.deepcopy(self.rejected_data)
-        # write to db
         db_con = self.get_db_connection()
         db_name = db_con[self.config['output']['db']['name']]
-        coll_name = db_name[self.transform_name.replace('-','_')+'_rejected']
-        if coll_name.estimated_document_count() > 0:
+        swap = self.get_db_load_mode() == 'swap'
+        if swap:
+            coll_name = db_name[collection + DB_STAGING_SUFFIX]
+            # left over from a failed run
             coll_name.drop()
-        coll_name.insert_one(data)
-        del data
+            db_name.create_collection(coll_name.name)
+        else:
+            coll_name = db_name[collection]
+            if coll_name.estimated_document_count() > 0:
+                coll_name.drop()
+        batch_size = self.config['output']['db'].get('batch_size', DB_BATCH_SIZE)
+        documents = iter(documents)
+        written = 0
+        try:
+            for batch in iter(lambda: list(islice(documents, batch_size)), []):
+                coll_name.insert_many(batch, ordered=False)
+                written = written + len(batch)
+            self.create_indexes(coll_name, indexes)
+            if swap:
+                coll_name.rename(collection, dropTarget=True)
+        except errors.BulkWriteError as err:
+            logging.error('Error writing to collection %s: %s', collection,
+                          err.details.get('writeErrors'))
+            sys.exit(1)
+        except errors.OperationFailure as err:
+            logging.error('Error loading collection %s: %s', collection, err)
+            sys.exit(1)
+        logging.info('%s document(s) written to collection %s', written, collection)
+        return written
 
+    def write_rejected_rows_to_db(self):
+        '''
+        Write data from dictionary into database
+        '''
+        collection = self.transform_name.replace('-','_')+'_rejected'
+        if self.get_db_write_mode() == 'bulk':
+            self.write_documents(collection, ({'row': row, **row_data}
+                                              for row, row_data in self.rejected_data.items()))
+            return
+        # insert adds _id to the document, rows are encoded as they are
+        self.write_documents(collection, [dict(self.rejected_data)])
+
+    def reject(self, row, row_data):
+        '''
+        Record rejected row, row_data includes col_count and err_msg, see quarantine.RejectSink
+        Quarantined rows are written as they are found, other rows are collected in
+        rejected_data and written to db by the db sink, see dispatch.write_db
+        '''
+        if not self.rejects.add(row, row_data):
+            self.rejected_data[row] = row_data
+
+    def source_position(self, line=None):
+        '''
+        Source position to track while streaming when rejected rows are quarantined, otherwise None
+        line - line number at the start offset of the rows, see Extract.iter_rows
+        '''
+        if self.rejects.path is None:
+            return None
+        return quarantine.SourcePosition(line)
+
+    @metrics.timed('transform_data_expansion')
     def transform_data_expansion(self):
         '''
         Replace data with expanded data if setup
         '''
-        for field, field_exp in self.config['output']['field_expansion'].items():
-            for row, data in self.transformed_data.items():
-                if self.transformed_data[row][field] in field_exp.keys():
-                    self.transformed_data[row][field] = field_exp[data[field]]
+        field_expansion = self.config['output']['field_expansion']
+        for data in self.transformed_data.values():
+            self.expand_row(data, field_expansion)
+        metrics.count(rows_in=len(self.transformed_data), rows_out=len(self.transformed_data))
+
+    @staticmethod
+    def expand_row(row_data, field_expansion):
+        '''
+        Replace data of single row with expanded data
+        '''
+        for field, field_exp in field_expansion.items():
+            if row_data[field] in field_exp:
+                row_data[field] = field_exp[row_data[field]]
 
     def transform(self):
         '''
@@ -339,95 +646,176 @@ class Transform(Pipeline):
         '''
         self.run_preprocess()
 
-        for row in [k for (k,v) in self.transformed_data.items() if v['is_valid'] is False]:
-            self.rejected_data[row] = self.source_data[row]
-            self.rejected_data[row]['col_count'] = self.transformed_data[row]['col_count']
-            self.rejected_data[row]['err_msg'] = self.transformed_data[row]['err_msg']
-            logging.warning("Row %s rejected: %s", row, self.source_data[row])
+        for row, err_msg in self.row_errors.items():
+            self.reject(row, dict(self.source_data[row], col_count=col_count(self.source_data[row]),
+                                  err_msg=err_msg))
             del self.transformed_data[row]
             logging.debug('Removed row %s', row)
 
-        logging.info('%s rows processed', len(self.transformed_data))
-
-        if len(self.rejected_data) > 0:
-            logging.warning( "%s row(s) rejected", len(self.rejected_data))
-            self.write_rejected_rows_to_db()
+        self.finish_stream(len(self.transformed_data))
 
         if 'field_expansion' in self.config['output'].keys():
             self.transform_data_expansion()
 
-    # pylint: disable=too-many-locals
-    # 9 is reasonable in this case
-    def gen_output(self):
+    @staticmethod
+    def rejected_row(row_data, err_msg, position=None):
+        '''
+        Add col_count, err_msg and the source position if tracked to row_data of a rejected row
+        '''
+        row_data['col_count'] = col_count(row_data)
+        row_data['err_msg'] = err_msg
+        if position is not None:
+            row_data['line'] = position.line
+            row_data['offset'] = position.offset
+        return row_data
+
+    def transform_stream(self, rows, partial=False, expand=True, position=None):
+        '''
+        Transform source rows one at a time
+        rows - iterable of (row number, row), e.g. Extract.iter_rows()
+        partial - rows are one part of the source, rejected rows are only collected
+                  in rejected_data and the caller passes them to reject with their final
+                  row numbers
+        expand - apply field expansion, otherwise rows are only validated and converted
+        position - source position passed to Extract.iter_rows, line and offset are added
+                   to rejected rows, see source_position
+        Yields valid rows after field expansion
+        Rejected rows are passed to reject as they are found
+        '''
+        validator = self.get_validator()
+        field_expansion = self.config['output'].get('field_expansion', {}) if expand else {}
+        processed = 0
+        for row, row_data in rows:
+            transformed_row, err_msg = self.check_row(row, row_data, validator)
+            if len(err_msg) > 0:
+                self.rejected_row(row_data, err_msg, position)
+                if partial:
+                    self.rejected_data[row] = row_data
+                else:
+                    self.reject(row, row_data)
+                continue
+            self.expand_row(transformed_row, field_expansion)
+            processed = processed + 1
+            yield transformed_row
+
+        if not partial:
+            self.finish_stream(processed)
+
+    @metrics.timed('transform_columns')
+    def transform_columns(self, store):
         '''
-        Generates output as per configuration
+        Transform columnar source data, see Extract.extract_columns()
+        Columns are validated and converted as a whole, rejected rows are passed to reject
         '''
-        intermediate_data = {}
-        result = {}
-        group_fields = self.config['output']['group_fields']
-        leaf_fields = self.config['output']['leaf_fields']
-        for row_data in self.transformed_data.values():
-            leaf_data = []
-            group_key=tuple(i for i in [row_data[field] for field in group_fields])
-            leaf_data = {v[0]: row_data[k] for k,v in leaf_fields.items()}
-
-            # Add the row if key not already present
-            if group_key not in intermediate_data.keys():
-                intermediate_data[group_key] = []
-                intermediate_data[group_key].append(leaf_data)
-                continue
+        store.validate(self.get_validator())
+        rejected = 0
+        for index, row_data in store.invalid_rows():
+            self.reject(str(index + 1), row_data)
+            rejected = rejected + 1
+        store.commit()
+        if 'field_expansion' in self.config['output'].keys():
+            store.expand(self.config['output']['field_expansion'])
+        self.finish_stream(store.row_count - rejected)
 
-            # If key exists, add row only if lower level of keys do not exists
-            # Else perform the aggregation and update the lower level of key rows
-            curr_data = []
-            curr_data = intermediate_data[group_key].copy()
-            new_data_non_calc = {}
-            new_data_non_calc = {v[0]: row_data[k] for k,v in leaf_fields.items() if v[1]==''}
-            i = 0
-            found_match=0
-            for curr in curr_data:
-                curr_data_non_calc = {}
-                curr_data_non_calc = {v[0]: curr[v[0]] for v in leaf_fields.values() if v[1]==''}
-                if curr_data_non_calc == new_data_non_calc:
-                    found_match = 1
-                    for leaf_field in leaf_fields.values():
-                        if leaf_field[1] == 'sum':
-                            curr[leaf_field[0]] += leaf_data[leaf_field[0]]
-                            curr[leaf_field[0]] = round(curr[leaf_field[0]],2)
-                        elif leaf_field[1] == 'avg':
-                            curr[leaf_field[0]] += leaf_data[leaf_field[0]]
-                            curr[leaf_field[0]] /= 2
-                            curr[leaf_field[0]] = round(curr[leaf_field[0]],2)
-                curr_data[i] = curr
-                i = i + 1
-            if found_match == 1:
-                intermediate_data[group_key] = curr_data
-            else:
-                intermediate_data[group_key].append(leaf_data)
-        for key, data in intermediate_data.items():
-            utils.merge_dicts(target=result, source=utils.get_data_by_group(list(key), data))
-        return result
+    @metrics.timed('gen_output_columns')
+    def gen_output_columns(self, store):
+        '''
+        Generates output as per configuration from columnar source data
+        Rows are grouped on dictionary codes and decoded once per group
+        '''
+        aggregator = self.aggregate([])
+        decoders = store.aggregate(aggregator)
+        return aggregator.result(decoders)
 
+    def finish_stream(self, processed):
+        '''
+        Report processed and rejected rows
+        Rejected rows not quarantined are written to db with the output, see dispatch.write_db
+        '''
+        logging.info('%s rows processed', processed)
+        self.rejects.close()
+
+    @metrics.timed('gen_output')
+    def gen_output(self, rows=None):
+        '''
+        Generates output as per configuration
+        rows - optional iterable of transformed rows, e.g. from transform_stream()
+               defaults to transformed_data
+        In stream mode rows are extracted and validated while they are aggregated,
+        the gen_output stage then covers all three
+        '''
+        data = self.aggregate(rows).result()
+        metrics.count(rows_out=utils.count_leaves(data, len(self.config['output']['group_fields'])))
+        return data
+
+    def aggregate(self, rows=None):
+        '''
+        Fold rows into group accumulators one at a time
+        Returns Aggregator holding partial state, see gen_output for rows
+        '''
+        try:
+            aggregator = Aggregator(self.config['output']['group_fields'],
+                                    self.config['output']['leaf_fields'])
+        except ValueError as err:
+            logging.error(err)
+            sys.exit(1)
+        if rows is None:
+            rows = self.transformed_data.values()
+        count = 0
+        for count, row_data in enumerate(rows, start=1):
+            aggregator.add(row_data)
+        metrics.count(rows_in=count)
+        return aggregator
+
+    @metrics.timed('write_json')
     def write_json(self, data):
         '''
         Write data from dictionary to json file
+        Options in output.json of config:
+            compact - no indentation or whitespace, groups unsorted (default False)
+            atomic - write to temporary file, renamed once complete (default True)
+        '''
+        json_config = self.config['output'].get('json', {})
+        try:
+            sinks.write_json(self.output_file, data, compact=json_config.get('compact', False),
+                             atomic=json_config.get('atomic', True))
+        except FileNotFoundError:
+            logging.error('Error writing to file - \'%s\'. Validate path.', self.output_file)
+        else:
+            logging.info('Data written to file - \'%s\'', self.output_file)
+
+    @metrics.timed('write_output')
+    def write_output(self, data):
         '''
+        Write data to output file in output.format of config (default json)
+        Options of the format are taken from output.<format>, see sinks
+        '''
+        output_format = self.config['output'].get('format', 'json')
+        if output_format not in sinks.OUTPUT_SINKS:
+            logging.error('Output format \'%s\' not supported', output_format)
+            sys.exit(1)
         try:
-            with open( self.output_file, 'w' ) as json_file:
-                json_file.write( json.dumps( data, indent=4, sort_keys=True ) )
+            sinks.OUTPUT_SINKS[output_format](self.output_file, data,
+                                              self.config['output'].get('group_fields', []),
+                                              self.config['output'].get(output_format, {}))
         except FileNotFoundError:
             logging.error('Error writing to file - \'%s\'. Validate path.', self.output_file)
+        except ValueError as err:
+            logging.error(err)
+            sys.exit(1)
         else:
             logging.info('Data written to file - \'%s\'', self.output_file)
 
+    @metrics.timed('write_to_db')
     def write_to_db(self, data):
         '''
         Write data from dictionary into database
         '''
-        # write to db
-        db_con = self.get_db_connection()
-        db_name = db_con[self.config['output']['db']['name']]
-        coll_name = db_name[self.config['output']['db']['collection']]
-        if coll_name.count() > 0:
-            coll_name.drop()
-        coll_name.insert_one(data)
+        collection = self.config['output']['db']['collection']
+        indexes = self.config['output']['db'].get('indexes', [])
+        if self.get_db_write_mode() == 'bulk':
+            records = utils.iter_leaf_records(data, self.config['output']['group_fields'])
+            metrics.count(rows_out=self.write_documents(collection, records, indexes))
+            return
+        # insert adds _id to the document, leave output data as it is
+        metrics.count(rows_out=self.write_documents(collection, [dict(data)], indexes))
@@ -0,0 +1,23 @@
+'''
+Pipelined execution of transformations
+The source file is read ahead in a reader thread through a bounded queue of blocks while
+rows are validated and aggregated, output sinks are written concurrently by dispatch
+'''
+import logging
+from pipeline import Extract, Transform
+import readahead
+
+def run(pipeline, read_ahead=readahead.QUEUE_BLOCKS):
+    '''
+    Stream source file through validation and aggregation while it is read in a reader thread
+    read_ahead - blocks of readahead.BLOCK_SIZE bytes the reader may get ahead of parsing
+    Memory mapped sources (source.reader mmap) are paged in by the OS instead
+    Returns (transform, output data)
+    '''
+    extract = Extract(pipeline)
+    transform = Transform(pipeline, extract)
+    position = transform.source_position()
+    rows = extract.iter_rows(fields=pipeline.decoded_fields(), read_ahead=read_ahead,
+                             position=position)
+    logging.info('Pipelined run, reading up to %s blocks ahead', read_ahead)
+    return transform, transform.gen_output(transform.transform_stream(rows, position=position))
@@ -0,0 +1,104 @@
+'''
+Profiling of pipeline runs
+Function level statistics of cProfile are written as .pstats file, stacks of all threads
+sampled at an interval as collapsed stacks (.collapsed), one "frame;frame;... count" line
+per stack as read by flamegraph.pl and speedscope
+'''
+import collections
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+
+SAMPLE_INTERVAL = 0.005
+
+def frame_name(frame):
+    '''
+    Function of frame as "function (file:first line)"
+    '''
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})' \
+        .replace(';', ':')
+
+class StackSampler(threading.Thread):
+    '''
+    Daemon thread counting the stacks of all other threads every interval seconds
+    '''
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        threading.Thread.__init__(self, name='stack-sampler', daemon=True)
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            # pylint: disable=protected-access
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        '''
+        Stop sampling and wait for the sampler thread to finish
+        '''
+        self.stopped.set()
+        self.join()
+
+    def write(self, path):
+        '''
+        Write sampled stacks in collapsed stack format
+        '''
+        with open(path, 'w', encoding='utf-8') as collapsed_f:
+            for stack, count in self.stacks.most_common():
+                collapsed_f.write(f'{stack} {count}\n')
+
+def input_size(source_files):
+    '''
+    Total size in bytes of existing source files
+    '''
+    size = 0
+    for source_file in set(source_files):
+        try:
+            size = size + os.path.getsize(source_file)
+        except OSError:
+            continue
+    return size
+
+def output_prefix(directory, transform_names, size):
+    '''
+    Path without extension of profile files, annotated with transformations and input size
+    '''
+    timestamp = time.strftime('%Y%m%dT%H%M%S')
+    return os.path.join(directory, f"profile-{'+'.join(transform_names)}-{size}b-{timestamp}")
+
+def profile(prefix, func, *args, **kwargs):
+    '''
+    Run func under cProfile and the stack sampler
+    Profile files prefix.pstats and prefix.collapsed are written even when func fails or exits
+    Returns result of func
+    '''
+    profiler = cProfile.Profile()
+    sampler = StackSampler()
+    sampler.start()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        sampler.stop()
+        try:
+            profiler.dump_stats(prefix + '.pstats')
+            sampler.write(prefix + '.collapsed')
+        except OSError as err:
+            logging.error('Error writing profile - %s', err)
+        else:
+            logging.info('Profile written - \'%s\'.pstats, \'%s\'.collapsed', prefix, prefix)
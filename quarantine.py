@@ -0,0 +1,144 @@
+'''
+Streaming sink for rejected rows
+Rejected rows are counted per reason and, with output.quarantine.file in transform config,
+written to a quarantine file as they are found instead of being held until the end of the run
+Only the first output.quarantine.log_limit rejected rows are logged
+'''
+import csv
+import json
+import logging
+import sys
+import metrics
+import sinks
+from validator import messages, reasons
+
+QUARANTINE_FORMATS = ['ndjson', 'csv']
+LOG_LIMIT = 20
+# keys added to rejected rows next to the source fields
+REJECT_FIELDS = ['col_count', 'err_msg', 'line', 'offset']
+
+class SourcePosition():
+    '''
+    Line number and byte offset in source file of the record read last
+    Updated by the source readers, see Extract.iter_rows
+    line is None where the lines before the start offset were not counted
+    '''
+    def __init__(self, line=None):
+        self.line = line
+        self.offset = 0
+        # start of the record being read and end of the lines read so far
+        self.start_line = line
+        self.start_offset = 0
+        self.end_line = line
+        self.end_offset = 0
+
+    def seek(self, offset, line):
+        '''
+        Reading starts at offset, the line number there is line
+        '''
+        self.line, self.offset = line, offset
+        self.start_line, self.start_offset = line, offset
+        self.end_line, self.end_offset = line, offset
+
+    def read(self, size):
+        '''
+        One line of size bytes was read
+        '''
+        self.end_offset = self.end_offset + size
+        if self.end_line is not None:
+            self.end_line = self.end_line + 1
+
+    def next_record(self):
+        '''
+        The lines read since the last call form the current record
+        '''
+        self.line, self.offset = self.start_line, self.start_offset
+        self.start_line, self.start_offset = self.end_line, self.end_offset
+
+class RejectSink():
+    '''
+    Rejected rows of one transformation, see module description
+    Options in output.quarantine of config:
+        file - quarantine file, rejected rows are not written to db (default none)
+        format - ndjson or csv (default from file extension, otherwise ndjson)
+        log_limit - number of rejected rows logged (default LOG_LIMIT)
+    '''
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, transform_name, config, fields):
+        self.transform_name = transform_name
+        self.path = config.get('file')
+        self.format = config.get('format', 'csv' if str(self.path).endswith('.csv') else 'ndjson')
+        if self.format not in QUARANTINE_FORMATS:
+            logging.error('Quarantine format \'%s\' not supported', self.format)
+            sys.exit(1)
+        self.log_limit = config.get('log_limit', LOG_LIMIT)
+        self.fields = fields
+        self.file = None
+        self.writer = None
+        self.rows = 0
+        self.counts = {}
+
+    def open(self):
+        '''
+        Open quarantine file, replacing the one of an earlier run
+        '''
+        try:
+            # closed by close, rows are written as they are rejected
+            self.file = open(self.path, 'w', encoding='utf-8', newline='', # pylint: disable=consider-using-with
+                             buffering=sinks.WRITE_BUFFER_SIZE)
+        except OSError as err:
+            logging.error('Error opening quarantine file - \'%s\': %s', self.path, err)
+            sys.exit(1)
+        if self.format == 'csv':
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(['row', 'line', 'offset', 'err_msg'] + self.fields)
+        else:
+            self.writer = json.JSONEncoder(separators=(',', ':'))
+
+    def add(self, row, row_data):
+        '''
+        Count and log rejected row, row_data includes col_count and err_msg, where the source
+        position was tracked also line and offset
+        Returns True if row was written to the quarantine file
+        '''
+        self.rows = self.rows + 1
+        for reason in reasons(row_data['err_msg']):
+            self.counts[reason] = self.counts.get(reason, 0) + 1
+        if self.rows <= self.log_limit:
+            logging.warning("Row %s rejected: %s", row, row_data)
+            if self.rows == self.log_limit:
+                logging.warning('Rejected row log limit of %s reached, further rows are counted',
+                                self.log_limit)
+        if self.path is None:
+            return False
+        if self.file is None:
+            self.open()
+        if self.format == 'csv':
+            self.writer.writerow([row, row_data.get('line'), row_data.get('offset'),
+                                  '; '.join(messages(row_data['err_msg']))] +
+                                 [row_data.get(field) for field in self.fields])
+        else:
+            self.file.write(self.writer.encode(
+                {'row': row, 'line': row_data.get('line'), 'offset': row_data.get('offset'),
+                 'err_msg': row_data['err_msg'],
+                 'data': {field: value for field, value in row_data.items()
+                          if field not in REJECT_FIELDS}}))
+            self.file.write('\n')
+        return True
+
+    def close(self):
+        '''
+        Close quarantine file, log and record counts per reason
+        An empty quarantine file is written when no row was rejected
+        '''
+        if self.path is not None:
+            if self.file is None:
+                self.open()
+            self.file.close()
+            logging.info('%s rejected row(s) written to quarantine file - \'%s\'', self.rows,
+                         self.path)
+        if self.rows > 0:
+            logging.warning('%s row(s) rejected - %s', self.rows,
+                            ', '.join(f'{reason}: {count}'
+                                      for reason, count in self.counts.items()))
+        metrics.rejects(self.transform_name, self.counts)
@@ -0,0 +1,98 @@
+'''
+Read ahead of binary files in a background thread
+A reader thread fills a bounded queue with blocks of the file while the consumer parses
+earlier ones, the read calls release the GIL and overlap with the consumer's CPU work
+'''
+import io
+import queue
+import threading
+
+BLOCK_SIZE = 1 << 20
+QUEUE_BLOCKS = 8
+# seconds a blocked reader waits before checking whether the consumer closed the file
+PUT_TIMEOUT = 0.1
+
+class ReadAheadRaw(io.RawIOBase):
+    '''
+    Raw binary stream over blocks of file read ahead by a reader thread
+    Starts at the current position of file, holds at most blocks blocks in memory
+    closefd - close file when the stream is closed
+    '''
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, file, blocks=QUEUE_BLOCKS, block_size=BLOCK_SIZE, closefd=False):
+        io.RawIOBase.__init__(self)
+        self.file = file
+        self.closefd = closefd
+        self.position = file.tell()
+        self.blocks = queue.Queue(maxsize=blocks)
+        self.pending = memoryview(b'')
+        self.eof = False
+        self.stopped = threading.Event()
+        self.reader = threading.Thread(target=self.read_ahead, args=(block_size,),
+                                       name='read-ahead', daemon=True)
+        self.reader.start()
+
+    def put(self, item):
+        '''
+        Queue item unless the stream was closed, returns False once closed
+        '''
+        while not self.stopped.is_set():
+            try:
+                self.blocks.put(item, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_ahead(self, block_size):
+        '''
+        Reader thread, queues blocks until end of file, errors are raised to the consumer
+        Errors of decompressing files are not all OSError, e.g. EOFError of truncated files
+        '''
+        try:
+            while True:
+                block = self.file.read(block_size)
+                if not self.put(block) or len(block) == 0:
+                    return
+        except Exception as err: # pylint: disable=broad-exception-caught
+            self.put(err)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if len(self.pending) == 0:
+            if self.eof:
+                return 0
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if len(block) == 0:
+                self.eof = True
+                return 0
+            self.pending = memoryview(block)
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        self.position = self.position + size
+        return size
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        if not self.closed:
+            self.stopped.set()
+            self.reader.join()
+            if self.closefd:
+                self.file.close()
+        io.RawIOBase.close(self)
+
+def open_read_ahead(file, blocks=QUEUE_BLOCKS, block_size=BLOCK_SIZE, closefd=False):
+    '''
+    Buffered binary file reading file from its current position through a reader thread
+    Closing it stops the reader thread, file itself is left open unless closefd is set
+    Sample usage: with open_read_ahead(source_f) as lines_f: for line in lines_f: ...
+    '''
+    return io.BufferedReader(ReadAheadRaw(file, blocks, block_size, closefd),
+                             buffer_size=block_size)
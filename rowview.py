@@ -0,0 +1,55 @@
+'''
+Copy-on-write views over extracted source rows
+'''
+from collections.abc import MutableMapping
+
+# marks a field whose value was not written to the view
+UNCHANGED = object()
+
+class RowView(MutableMapping):
+    '''
+    Row of form {field1: value1, field2: value2, ...so on} backed by a source row
+    Values written to the view are kept in a list aligned with layout,
+    allocated on first write, the source row itself is never modified
+    Only fields of layout can be written
+    '''
+    __slots__ = ('source', 'layout', 'changes')
+
+    def __init__(self, source, layout):
+        '''
+        inputs:
+        source - source row as dictionary
+        layout - dict of field: position, shared by all views of a data set
+        '''
+        self.source = source
+        self.layout = layout
+        self.changes = None
+
+    def __getitem__(self, field):
+        if self.changes is not None:
+            value = self.changes[self.layout[field]] if field in self.layout else UNCHANGED
+            if value is not UNCHANGED:
+                return value
+        return self.source[field]
+
+    def __setitem__(self, field, value):
+        if self.changes is None:
+            self.changes = [UNCHANGED] * len(self.layout)
+        self.changes[self.layout[field]] = value
+
+    def __delitem__(self, field):
+        '''
+        Restore the source value of field
+        '''
+        if self.changes is None or self.changes[self.layout[field]] is UNCHANGED:
+            raise KeyError(field)
+        self.changes[self.layout[field]] = UNCHANGED
+
+    def __iter__(self):
+        return iter(self.source)
+
+    def __len__(self):
+        return len(self.source)
+
+    def __repr__(self):
+        return repr(dict(self))
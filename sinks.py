@@ -0,0 +1,192 @@
+'''
+Output file writers, selected by output.format in transform config
+'''
+import contextlib
+import json
+import os
+import tempfile
+from itertools import islice
+import utils
+from colfile import ColumnarWriter
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+WRITE_BUFFER_SIZE = 1 << 20
+ROW_GROUP_SIZE = 65536
+COLUMNAR_ENGINES = ['auto', 'parquet', 'arrow', 'native']
+# files created through a temporary file get the permissions open() would give them
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+@contextlib.contextmanager
+def atomic_open(path, mode='w', **kwargs):
+    '''
+    Open temporary file next to path, renamed to path once writing completes
+    Readers of path see either the previous or the complete new file, never a partial one
+    On error the temporary file is removed and path is left as it was
+    '''
+    directory, filename = os.path.split(os.path.abspath(path))
+    file_desc, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + filename + '.',
+                                            suffix='.tmp')
+    try:
+        # text mode callers pass encoding in kwargs, binary modes take none
+        # pylint: disable-next=unspecified-encoding
+        with open(file_desc, mode, **kwargs) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, 0o666 & ~UMASK)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+def iter_json(data, compact=False):
+    '''
+    Encode data as json one top level group at a time, group values are streamed
+    through JSONEncoder.iterencode
+    Default output is identical to json.dumps(data, indent=4, sort_keys=True)
+    compact - no whitespace, groups in the order they were generated
+    '''
+    if compact:
+        encoder = json.JSONEncoder(separators=(',', ':'))
+        begin, separator, end, prefix = '{', ',', '}', ''
+    else:
+        encoder = json.JSONEncoder(indent=4, sort_keys=True)
+        begin, separator, end, prefix = '{\n', ',\n', '\n}', ' ' * 4
+    if not isinstance(data, dict) or len(data) == 0:
+        yield encoder.encode(data)
+        return
+    yield begin
+    for i, (key, value) in enumerate(data.items() if compact else sorted(data.items())):
+        # keys are converted to strings as json.dumps converts them
+        key = encoder.encode(key if isinstance(key, str) else json.dumps(key))
+        yield (prefix if i == 0 else separator + prefix) + key + encoder.key_separator
+        if compact:
+            yield from encoder.iterencode(value)
+            continue
+        # values are nested one level deeper than iterencode indents them
+        for chunk in encoder.iterencode(value):
+            yield chunk.replace('\n', '\n' + prefix)
+    yield end
+
+def write_json(path, data, compact=False, atomic=True):
+    '''
+    Write data to json file through a buffered writer, see iter_json
+    atomic - write to temporary file and rename it to path once complete
+    '''
+    opener = atomic_open if atomic else open
+    with opener(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as json_file:
+        for chunk in iter_json(data, compact):
+            json_file.write(chunk)
+
+def iter_batches(records, size):
+    '''
+    Split iterable of records into lists of up to size records
+    '''
+    records = iter(records)
+    return iter(lambda: list(islice(records, size)), [])
+
+def write_ndjson(path, records, atomic=True):
+    '''
+    Write records as json lines, one record per line
+    '''
+    encoder = json.JSONEncoder(separators=(',', ':'))
+    opener = atomic_open if atomic else open
+    with opener(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as ndjson_file:
+        for record in records:
+            ndjson_file.write(encoder.encode(record))
+            ndjson_file.write('\n')
+
+def write_columnar(path, records, engine='auto', row_group_size=ROW_GROUP_SIZE, **options):
+    '''
+    Write records to columnar file in row groups of row_group_size records
+    engine - parquet or arrow (Arrow IPC file), both need pyarrow
+             native - dependency free format, see colfile
+             auto - parquet if pyarrow is installed, native otherwise
+    options - atomic, see write_json, codec for native format, see colfile.ColumnarWriter
+    '''
+    if engine not in COLUMNAR_ENGINES:
+        raise ValueError(f'Columnar engine \'{engine}\' not supported')
+    if engine == 'auto':
+        engine = 'native' if pyarrow is None else 'parquet'
+    if engine != 'native' and pyarrow is None:
+        raise ValueError(f'Columnar engine \'{engine}\' needs pyarrow installed')
+    opener = atomic_open if options.get('atomic', True) else open
+    with opener(path, 'wb', buffering=WRITE_BUFFER_SIZE) as columnar_file:
+        batches = iter_batches(records, row_group_size)
+        if engine == 'native':
+            write_native(columnar_file, batches, options.get('codec', 'zlib'))
+        else:
+            write_arrow(columnar_file, batches, engine, row_group_size)
+
+def write_native(columnar_file, batches, codec):
+    '''
+    Write batches of records as row groups of native columnar format
+    Columns are taken from the first record
+    '''
+    writer = None
+    for batch in batches:
+        if writer is None:
+            writer = ColumnarWriter(columnar_file, batch[0].keys(), codec)
+        writer.write_row_group(batch)
+    if writer is None:
+        writer = ColumnarWriter(columnar_file, [], codec)
+    writer.close()
+
+def write_arrow(columnar_file, batches, engine, row_group_size):
+    '''
+    Write batches of records as row groups of parquet or Arrow IPC file
+    Schema is inferred from the first batch
+    '''
+    new_writer = pyarrow.parquet.ParquetWriter if engine == 'parquet' else pyarrow.ipc.new_file
+    writer = None
+    schema = None
+    for batch in batches:
+        table = pyarrow.Table.from_pylist(batch, schema=schema)
+        if writer is None:
+            schema = table.schema
+            writer = new_writer(columnar_file, schema)
+        writer.write_table(table, row_group_size)
+    if writer is None:
+        writer = new_writer(columnar_file, pyarrow.schema([]))
+    writer.close()
+
+def json_sink(path, data, group_fields, options):
+    '''
+    Nested output as json file, options compact and atomic, see write_json
+    '''
+    # pylint: disable=unused-argument
+    write_json(path, data, options.get('compact', False), options.get('atomic', True))
+
+def ndjson_sink(path, data, group_fields, options):
+    '''
+    One flattened record per output leaf as json lines, option atomic, see write_json
+    '''
+    write_ndjson(path, utils.iter_leaf_records(data, group_fields), options.get('atomic', True))
+
+def columnar_sink(path, data, group_fields, options):
+    '''
+    One flattened record per output leaf in columnar file, see write_columnar for options
+    '''
+    write_columnar(path, utils.iter_leaf_records(data, group_fields), **options)
+
+OUTPUT_SINKS = {
+    'json': json_sink,
+    'ndjson': ndjson_sink,
+    'columnar': columnar_sink,
+    }
+
+def register_sink(name, sink):
+    '''
+    Make output sink available to output.format in transform config
+    sink is called as sink(output file, output data, group fields, options)
+    where options are taken from output.<name> in transform config
+    Sample call: register_sink( 'csv', csv_sink )
+    '''
+    OUTPUT_SINKS[name] = sink
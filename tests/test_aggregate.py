@@ -0,0 +1,110 @@
+import pytest
+from aggregate import Aggregator
+
+GROUP_FIELDS = ['Region']
+LEAF_FIELDS = {
+    'Country': ['Country', ''],
+    'Total Profit': ['CountryProfit', 'sum'],
+    'Unit Price': ['AvgPrice', 'avg'],
+    }
+ROWS = [
+    {'Region': 'Asia', 'Country': 'Japan', 'Total Profit': 10.0, 'Unit Price': 2.0},
+    {'Region': 'Europe', 'Country': 'France', 'Total Profit': 5.5, 'Unit Price': 3.0},
+    {'Region': 'Asia', 'Country': 'India', 'Total Profit': 1.25, 'Unit Price': 1.0},
+    {'Region': 'Asia', 'Country': 'Japan', 'Total Profit': 0.333, 'Unit Price': 4.0},
+    ]
+
+def test_aggregator_groups_and_sums():
+    aggregator = Aggregator(GROUP_FIELDS, LEAF_FIELDS)
+    for row in ROWS:
+        aggregator.add(row)
+    assert aggregator.result() == {
+        'Asia': [
+            {'Country': 'Japan', 'CountryProfit': 10.33, 'AvgPrice': 3.0},
+            {'Country': 'India', 'CountryProfit': 1.25, 'AvgPrice': 1.0},
+            ],
+        'Europe': [
+            {'Country': 'France', 'CountryProfit': 5.5, 'AvgPrice': 3.0},
+            ],
+        }
+
+def test_aggregator_keeps_first_seen_order():
+    aggregator = Aggregator(GROUP_FIELDS, LEAF_FIELDS)
+    for row in ROWS:
+        aggregator.add(row)
+    result = aggregator.result()
+    assert list(result.keys()) == ['Asia', 'Europe']
+    assert [leaf['Country'] for leaf in result['Asia']] == ['Japan', 'India']
+    assert list(result['Asia'][0].keys()) == ['Country', 'CountryProfit', 'AvgPrice']
+
+def test_aggregator_without_non_calc_leaf_fields():
+    aggregator = Aggregator(['Region', 'Country'], {'Total Profit': ['Profit', 'sum']})
+    for row in ROWS:
+        aggregator.add(row)
+    assert aggregator.result() == {
+        'Asia': {'Japan': [{'Profit': 10.33}], 'India': [{'Profit': 1.25}]},
+        'Europe': {'France': [{'Profit': 5.5}]},
+        }
+
+def test_avg_is_mean_independent_of_row_order():
+    leaf_fields = {'Unit Price': ['AvgPrice', 'avg']}
+    values = [1.0, 2.0, 6.0]
+    results = []
+    for ordered in (values, list(reversed(values))):
+        aggregator = Aggregator(GROUP_FIELDS, leaf_fields)
+        for value in ordered:
+            aggregator.add({'Region': 'Asia', 'Unit Price': value})
+        results.append(aggregator.result())
+    assert results[0] == results[1] == {'Asia': [{'AvgPrice': 3.0}]}
+
+def test_min_max_count_aggregates():
+    leaf_fields = {
+        'Unit Price': ['MinPrice', 'min'],
+        'Unit Cost': ['MaxCost', 'max'],
+        'Order ID': ['Orders', 'count'],
+        }
+    aggregator = Aggregator(GROUP_FIELDS, leaf_fields)
+    for price, cost in [(3.5, 1), (1.25, 7), (2.0, 4)]:
+        aggregator.add({'Region': 'Asia', 'Unit Price': price, 'Unit Cost': cost, 'Order ID': '1'})
+    assert aggregator.result() == {'Asia': [{'MinPrice': 1.25, 'MaxCost': 7, 'Orders': 3}]}
+
+def test_rounding_happens_once_at_finalisation():
+    aggregator = Aggregator(GROUP_FIELDS, {'Total Profit': ['Profit', 'sum', 3]})
+    for _ in range(10):
+        aggregator.add({'Region': 'Asia', 'Total Profit': 0.0004})
+    assert aggregator.result() == {'Asia': [{'Profit': 0.004}]}
+
+def test_merged_partials_match_single_pass():
+    leaf_fields = {
+        'Country': ['Country', ''],
+        'Total Profit': ['Profit', 'sum'],
+        'Unit Price': ['AvgPrice', 'avg'],
+        'Order ID': ['Orders', 'count_distinct'],
+        }
+    rows = [{'Region': 'Asia', 'Country': 'Japan', 'Total Profit': 0.1 * i,
+             'Unit Price': 1.0 / (i + 1), 'Order ID': str(i % 7000)} for i in range(20000)]
+    single = Aggregator(GROUP_FIELDS, leaf_fields)
+    for row in rows:
+        single.add(row)
+    merged = Aggregator(GROUP_FIELDS, leaf_fields)
+    for start in range(0, len(rows), 3000):
+        chunk = Aggregator(GROUP_FIELDS, leaf_fields)
+        for row in rows[start:start + 3000]:
+            chunk.add(row)
+        merged.merge(chunk)
+    assert merged.result() == single.result()
+
+def test_count_distinct_exact_when_small_and_approximate_when_large():
+    leaf_fields = {'Order ID': ['Orders', 'count_distinct']}
+    aggregator = Aggregator(GROUP_FIELDS, leaf_fields)
+    for i in range(500):
+        aggregator.add({'Region': 'Asia', 'Order ID': str(i % 250)})
+    assert aggregator.result() == {'Asia': [{'Orders': 250}]}
+    for i in range(50000):
+        aggregator.add({'Region': 'Asia', 'Order ID': str(i)})
+    estimate = aggregator.result()['Asia'][0]['Orders']
+    assert abs(estimate - 50000) < 50000 * 0.05
+
+def test_unknown_aggregate_function():
+    with pytest.raises(ValueError):
+        Aggregator(GROUP_FIELDS, {'Total Profit': ['Profit', 'median']})
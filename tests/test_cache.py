@@ -0,0 +1,58 @@
+import os
+import unittest.mock as mock
+import cache
+import etl
+import pipeline
+from tests.test_pipeline import setup_valid_pipeline, setup_source_file, SOURCE_DATA_VALID, \
+    EXPECTED_OUTPUT
+
+def test_cache_key_changes_with_source_and_config(tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_VALID)
+    result_cache = cache.ResultCache(str(tmp_path / 'cache'))
+    key = result_cache.key(p)
+    assert result_cache.key(p) == key
+    p.config['output']['leaf_fields']['Units Sold'][1] = 'max'
+    assert result_cache.key(p) != key
+    p.config['output']['leaf_fields']['Units Sold'][1] = 'sum'
+    with open(p.source_file, 'a', encoding='utf-8') as source_f:
+        source_f.write('\n')
+    assert result_cache.key(p) != key
+
+def test_cache_key_content_hash_ignores_mtime(tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_VALID)
+    result_cache = cache.ResultCache(str(tmp_path / 'cache'), content_hash=True)
+    key = result_cache.key(p)
+    os.utime(p.source_file, ns=(0, 0))
+    assert result_cache.key(p) == key
+
+def test_cache_get_put(tmp_path):
+    result_cache = cache.ResultCache(str(tmp_path / 'cache'))
+    assert result_cache.get('abc') is None
+    result_cache.put('abc', EXPECTED_OUTPUT)
+    assert result_cache.get('abc') == EXPECTED_OUTPUT
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    result_cache = cache.ResultCache(str(tmp_path / 'cache'))
+    for i, key in enumerate(['a', 'b']):
+        result_cache.put(key, EXPECTED_OUTPUT)
+        os.utime(result_cache.entry_file(key), ns=(i * 10**9, i * 10**9))
+    assert result_cache.get('a') == EXPECTED_OUTPUT
+    entry_size = os.path.getsize(result_cache.entry_file('a'))
+    result_cache.max_size = entry_size * 2
+    result_cache.put('c', EXPECTED_OUTPUT)
+    assert sorted(os.listdir(tmp_path / 'cache')) == ['a.pickle', 'c.pickle']
+
+@mock.patch.object(pipeline.Transform, 'write_to_db')
+@mock.patch.object(pipeline.Transform, 'write_output')
+def test_main_reuses_cached_output(mock_output, mock_db, tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_VALID)
+    app_config = {'cache': {'dir': str(tmp_path / 'cache')}}
+    with mock.patch.object(etl, 'Pipeline', return_value=p), \
+         mock.patch.object(p, 'get_config'), \
+         mock.patch.object(etl, 'run_transform', wraps=etl.run_transform) as spy:
+        etl.main('sales-summary', stream=True, app_config=app_config)
+        etl.main('sales-summary', stream=True, app_config=app_config)
+        assert spy.call_count == 1
+        etl.main('sales-summary', stream=True, app_config=app_config, use_cache=False)
+        assert spy.call_count == 2
+    assert mock_output.call_args_list[0] == mock_output.call_args_list[1]
@@ -0,0 +1,41 @@
+import io
+import pytest
+import colfile
+
+RECORDS = [
+    {'name': 'a', 'count': 1, 'value': 1.5, 'extra': None},
+    {'name': 'bé', 'count': -2, 'value': 2.25, 'extra': True},
+    {'name': '', 'count': 3, 'value': 0.0, 'extra': [1, 'x']},
+    ]
+
+def write_file(path, records, row_group_size, codec='zlib'):
+    with open(path, 'wb') as file:
+        writer = colfile.ColumnarWriter(file, records[0].keys(), codec)
+        for start in range(0, len(records), row_group_size):
+            writer.write_row_group(records[start:start + row_group_size])
+        writer.close()
+        return writer
+
+@pytest.mark.parametrize('codec', ['zlib', 'none'])
+def test_columnar_round_trip(tmp_path, codec):
+    path = str(tmp_path / 'data.etlc')
+    writer = write_file(path, RECORDS, 2, codec)
+    assert [rg['rows'] for rg in writer.row_groups] == [2, 1]
+    assert [chunk[0] for chunk in writer.row_groups[0]['chunks']] == ['s', 'q', 'd', 'j']
+    assert list(colfile.read_columnar(path)) == RECORDS
+
+def test_columnar_read_selected_columns(tmp_path):
+    path = str(tmp_path / 'data.etlc')
+    write_file(path, RECORDS, 2)
+    assert list(colfile.read_columnar(path, ['value', 'name'])) == \
+        [{'value': r['value'], 'name': r['name']} for r in RECORDS]
+
+def test_columnar_big_ints_kept_as_json():
+    assert colfile.encode_column([1, 1 << 70])[0] == 'j'
+    assert colfile.encode_column([1, 2.5])[0] == 'j'
+
+def test_columnar_invalid_file(tmp_path):
+    path = tmp_path / 'data.etlc'
+    path.write_bytes(b'{"not": "columnar"}')
+    with pytest.raises(ValueError):
+        list(colfile.read_columnar(str(path)))
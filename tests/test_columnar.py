@@ -0,0 +1,82 @@
+import unittest.mock as mock
+from array import array
+from deepdiff import DeepDiff
+import pipeline
+import validator
+from columnar import ColumnStore, DictColumn
+from tests.test_pipeline import setup_valid_pipeline, EXPECTED_OUTPUT, SOURCE_DATA_VALID, \
+    SOURCE_DATA_MISSING_FIELD, SOURCE_DATA_INVALID_UNIT_PRICE
+
+def run_columnar(tmp_path, source_data):
+    source_file = tmp_path / 'sales-records.csv'
+    source_file.write_text(source_data + '\n', encoding='utf-8')
+    p = setup_valid_pipeline()
+    p.source_file = str(source_file)
+    e = pipeline.Extract(p)
+    store = e.extract_columns(p.categorical_fields())
+    t = pipeline.Transform(p,e)
+    t.transform_columns(store)
+    return t, store
+
+def test_dict_column_recode_merges_equal_values():
+    column = DictColumn()
+    for value in ['H', 'High', 'M', 'H']:
+        column.append(value)
+    column.recode(['High', 'High', 'Medium'])
+    assert column.values == ['High', 'Medium']
+    assert list(column.codes) == [0, 0, 1, 0]
+    assert list(column) == ['High', 'High', 'Medium', 'High']
+
+def test_validity_bitmap():
+    store = ColumnStore(['Region'])
+    for i in range(10):
+        store.append([str(i)])
+    store.invalidate(3, 'err')
+    store.invalidate(9, 'err')
+    assert len(store.validity) == 2
+    assert [store.is_valid(i) for i in range(10)] == list(store.valid_flags())[:10]
+    assert not store.is_valid(3) and not store.is_valid(9) and store.is_valid(8)
+
+def test_rows_with_extra_values_are_incomplete():
+    store = ColumnStore(['Region', 'Country'])
+    store.append(['Asia', 'Japan'])
+    store.append(['Asia', 'Japan', 'extra'])
+    store.append(['Asia'])
+    assert [store.is_valid(i) for i in range(3)] == [True, False, False]
+    assert list(store.columns['Country']) == ['Japan', '', '']
+    assert [row_data['col_count'] for _, row_data in store.invalid_rows()] == [3, 1]
+
+def test_numeric_columns_are_typed_arrays():
+    store = ColumnStore(['Units Sold', 'Unit Price'])
+    store.append(['10', '2.5'])
+    store.append(['x', '1'])
+    v = validator.RowValidator(['Units Sold', 'Unit Price'],
+                               {'float_field': ['Unit Price'], 'number_field': ['Units Sold']},
+                               ['float_field', 'number_field'])
+    store.validate(v)
+    store.commit()
+    assert store.columns['Unit Price'] == array('d', [2.5, 1.0])
+    assert store.columns['Units Sold'].typecode == 'q'
+    assert store.err_msg == {1: [['Invalid (Units Sold):x']]}
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_gen_output_columns(mock_write, tmp_path):
+    t, store = run_columnar(tmp_path, SOURCE_DATA_VALID)
+    assert isinstance(store.columns['Region'], DictColumn)
+    differences = DeepDiff(t.gen_output_columns(store), EXPECTED_OUTPUT)
+    assert differences == {}
+    mock_write.assert_not_called()
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_transform_columns_rejects_rows(mock_write, tmp_path):
+    t, _ = run_columnar(tmp_path, SOURCE_DATA_INVALID_UNIT_PRICE)
+    assert sorted(t.rejected_data.keys()) == ['1', '3']
+    assert t.rejected_data['1']['Unit Price'] == "'one'"
+    assert t.rejected_data['1']['Units Sold'] == '8446'
+    mock_write.assert_not_called()
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_transform_columns_missing_field(mock_write, tmp_path):
+    t, _ = run_columnar(tmp_path, SOURCE_DATA_MISSING_FIELD)
+    assert t.rejected_data['3']['err_msg'] == [pipeline.ERR_INCOMPLETE_DATA_ROW]
+    assert t.rejected_data['3']['col_count'] == 13
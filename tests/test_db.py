@@ -0,0 +1,98 @@
+import unittest.mock as mock
+import mongomock
+from pymongo import errors
+import pytest
+import pipeline
+from tests.test_pipeline import setup_valid_pipeline, setup_source_file, EXPECTED_OUTPUT, \
+    SOURCE_DATA_INVALID_PRIORITY
+
+@pytest.fixture(autouse=True)
+def mongo_client():
+    pipeline.close_db_connections()
+    with mock.patch.object(pipeline, 'MongoClient', mongomock.MongoClient):
+        yield
+    pipeline.close_db_connections()
+
+def setup_transform(**db_config):
+    p = setup_valid_pipeline()
+    p.config['output']['db'].update(db_config)
+    return pipeline.Transform(p, pipeline.Extract(p))
+
+def get_collection(t, collection):
+    return t.get_db_connection()[t.config['output']['db']['name']][collection]
+
+def test_db_connection_is_shared():
+    t = setup_transform()
+    connect = t.get_db_connection()
+    assert setup_transform().get_db_connection() is connect
+    pipeline.close_db_connections()
+    assert t.get_db_connection() is not connect
+
+def test_write_to_db_document_mode():
+    t = setup_transform()
+    t.write_to_db(EXPECTED_OUTPUT)
+    t.write_to_db(EXPECTED_OUTPUT)
+    coll = get_collection(t, 'sales_summary')
+    assert coll.count_documents({}) == 1
+    assert coll.find_one({}, {'_id': 0}) == EXPECTED_OUTPUT
+
+def test_write_to_db_bulk_mode():
+    t = setup_transform(write_mode='bulk', batch_size=2)
+    with mock.patch.object(mongomock.Collection, 'insert_many',
+                           autospec=True, side_effect=mongomock.Collection.insert_many) as spy:
+        t.write_to_db(EXPECTED_OUTPUT)
+    coll = get_collection(t, 'sales_summary')
+    leaves = [leaf for channels in EXPECTED_OUTPUT.values()
+              for leaves in channels.values() for leaf in leaves]
+    assert coll.count_documents({}) == len(leaves)
+    assert all(len(call.args[1]) <= 2 for call in spy.call_args_list)
+    assert all(call.kwargs['ordered'] is False for call in spy.call_args_list)
+    region, channels = next(iter(EXPECTED_OUTPUT.items()))
+    channel, leaves = next(iter(channels.items()))
+    expected = {'Region': region, 'Sales Channel': channel, **leaves[0]}
+    assert coll.find_one({}, {'_id': 0}) == expected
+
+def test_write_rejected_rows_bulk_mode(tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_INVALID_PRIORITY)
+    p.config['output']['db']['write_mode'] = 'bulk'
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p, e)
+    list(t.transform_stream(e.iter_rows()))
+    t.write_rejected_rows_to_db()
+    coll = get_collection(t, t.transform_name.replace('-','_') + '_rejected')
+    assert sorted(doc['row'] for doc in coll.find()) == sorted(t.rejected_data.keys())
+    assert coll.find_one({'row': '2'})['err_msg'] == t.rejected_data['2']['err_msg']
+
+def test_write_to_db_unknown_write_mode():
+    t = setup_transform(write_mode='upsert')
+    with pytest.raises(SystemExit):
+        t.write_to_db(EXPECTED_OUTPUT)
+
+def test_write_to_db_swap_mode():
+    t = setup_transform(write_mode='bulk', load_mode='swap',
+                        indexes=['Country', {'fields': ['Region', 'OrderId'], 'unique': True}])
+    coll = get_collection(t, 'sales_summary')
+    coll.insert_one({'previous': True})
+    t.write_to_db(EXPECTED_OUTPUT)
+    assert coll.count_documents({'previous': True}) == 0
+    assert coll.count_documents({}) == 3
+    db_name = t.get_db_connection()['sales']
+    assert 'sales_summary' + pipeline.DB_STAGING_SUFFIX not in db_name.list_collection_names()
+    index_info = coll.index_information()
+    assert index_info['Country_1']['key'] == [('Country', 1)]
+    assert index_info['Region_1_OrderId_1']['unique'] is True
+
+def test_write_to_db_failed_swap_keeps_previous_data():
+    t = setup_transform(write_mode='bulk', load_mode='swap')
+    coll = get_collection(t, 'sales_summary')
+    coll.insert_one({'previous': True})
+    with mock.patch.object(mongomock.Collection, 'insert_many',
+                           side_effect=errors.BulkWriteError({'writeErrors': []})):
+        with pytest.raises(SystemExit):
+            t.write_to_db(EXPECTED_OUTPUT)
+    assert list(coll.find({}, {'_id': 0})) == [{'previous': True}]
+
+def test_write_to_db_unknown_load_mode():
+    t = setup_transform(load_mode='merge')
+    with pytest.raises(SystemExit):
+        t.write_to_db(EXPECTED_OUTPUT)
@@ -0,0 +1,94 @@
+import bz2
+import gzip
+import json
+import lzma
+import unittest.mock as mock
+import pytest
+import decompress
+import incremental
+import parallel
+import pipeline
+from tests.test_pipeline import setup_valid_pipeline
+from tests.test_parallel import write_source
+
+COMPRESSORS = {'gzip': (gzip.compress, '.gz'), 'bz2': (bz2.compress, '.bz2'),
+               'xz': (lzma.compress, '.xz')}
+
+def compress_source(source_file, kind, suffix=None):
+    compress, extension = COMPRESSORS[kind]
+    with open(source_file, 'rb') as source_f:
+        content = source_f.read()
+    compressed_file = source_file + (extension if suffix is None else suffix)
+    with open(compressed_file, 'wb') as compressed_f:
+        compressed_f.write(compress(content))
+    return compressed_file
+
+def rows_of(p, **kwargs):
+    e = pipeline.Extract(p)
+    return list(e.iter_rows(**kwargs))
+
+def as_json(data):
+    return json.dumps(data, indent=4, sort_keys=True)
+
+@pytest.mark.parametrize('kind', sorted(COMPRESSORS))
+def test_compressed_rows_match_uncompressed(kind, tmp_path):
+    p = setup_valid_pipeline()
+    p.source_file = write_source(tmp_path)
+    expected = rows_of(p)
+    p.source_file = compress_source(p.source_file, kind)
+    assert decompress.compression(p.source_file) == kind
+    assert rows_of(p) == expected
+    assert rows_of(p, read_ahead=2) == expected
+    assert rows_of(p, fields=p.required_fields()) == rows_of(p)
+    e = pipeline.Extract(p)
+    e.extract()
+    assert list(e.source_data.items()) == expected
+
+@pytest.mark.parametrize('kind', sorted(COMPRESSORS))
+def test_compression_from_magic_bytes(kind, tmp_path):
+    source_file = write_source(tmp_path)
+    assert decompress.compression(source_file) is None
+    assert decompress.compression(compress_source(source_file, kind, '.data')) == kind
+
+def test_open_source_from_offset(tmp_path):
+    source_file = write_source(tmp_path)
+    with open(source_file, 'rb') as source_f:
+        content = source_f.read()
+    with decompress.open_source(compress_source(source_file, 'gzip'), 100) as source_f:
+        assert source_f.read() == content[100:]
+        assert source_f.tell() == len(content)
+
+def test_truncated_file_error_is_raised(tmp_path):
+    source_file = compress_source(write_source(tmp_path), 'gzip')
+    with open(source_file, 'rb') as source_f:
+        content = source_f.read()
+    with open(source_file, 'wb') as source_f:
+        source_f.write(content[:len(content) // 2])
+    with decompress.open_source(source_file) as source_f:
+        with pytest.raises(EOFError):
+            source_f.read()
+
+def test_zstd_needs_zstandard(tmp_path):
+    source_file = tmp_path / 'sales-records.csv.zst'
+    source_file.write_bytes(b'\x28\xb5\x2f\xfd')
+    with mock.patch.object(decompress, 'zstandard', None):
+        with pytest.raises(SystemExit):
+            decompress.open_source(str(source_file))
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_parallel_and_incremental_runs_of_compressed_file(mock_write, tmp_path):
+    p = setup_valid_pipeline()
+    p.source_file = write_source(tmp_path)
+    p.output_file = str(tmp_path / 'output.json')
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p,e)
+    expected = t.gen_output(t.transform_stream(e.iter_rows()))
+    p.source_file = compress_source(p.source_file, 'bz2')
+    assert parallel.split_source(p.source_file, 3) == [(0, None)]
+    transform, data = parallel.run(p, 3)
+    assert as_json(data) == as_json(expected)
+    assert transform.rejected_data == t.rejected_data
+    for _ in range(2):
+        transform, data = incremental.run(p)
+        assert as_json(data) == as_json(expected)
+        assert transform.rejected_data == t.rejected_data
@@ -0,0 +1,74 @@
+import threading
+import time
+import unittest.mock as mock
+import pytest
+import dispatch
+import metrics
+
+def setup_transform(output=None):
+    transform = mock.Mock()
+    transform.transform_name = 'sales-aggregate'
+    transform.config = {'output': output or {}}
+    transform.rejected_data = {}
+    return transform
+
+def test_sinks_write_concurrently():
+    run = metrics.reset()
+    transform = setup_transform()
+    db_started = threading.Event()
+    transform.write_to_db.side_effect = lambda data: db_started.set()
+    # file sink only completes once db sink is writing too
+    transform.write_output.side_effect = lambda data: db_started.wait(5)
+    assert dispatch.dispatch(transform, {'a': 1}) == {'file': 'ok', 'db': 'ok'}
+    transform.write_output.assert_called_once_with({'a': 1})
+    transform.write_to_db.assert_called_once_with({'a': 1})
+    assert [(s['sink'], s['status']) for s in run.sinks] == [('file', 'ok'), ('db', 'ok')]
+    assert all(s['latency_seconds'] >= 0 for s in run.record()['sinks'])
+    assert 'etl_sink_latency_seconds{transform="sales-aggregate",sink="db",status="ok"}' \
+        in run.prometheus()
+
+def test_failed_sink_does_not_stop_others():
+    metrics.reset()
+    transform = setup_transform()
+    transform.write_to_db.side_effect = SystemExit(1)
+    assert dispatch.dispatch(transform, {}) == {'file': 'ok', 'db': 'failed'}
+    transform.write_output.side_effect = ValueError('bad data')
+    transform.write_to_db.side_effect = None
+    assert dispatch.dispatch(transform, {}) == {'file': 'failed', 'db': 'ok'}
+
+def test_sink_timeout(caplog):
+    run = metrics.reset()
+    transform = setup_transform({'sink_timeouts': {'db': 0.1}})
+    transform.get_db_load_mode.return_value = 'replace'
+    release = threading.Event()
+    transform.write_to_db.side_effect = lambda data: release.wait(5)
+    started = time.perf_counter()
+    assert dispatch.dispatch(transform, {}) == {'file': 'ok', 'db': 'timeout'}
+    assert time.perf_counter() - started < 2
+    assert run.sinks[1]['latency_seconds'] >= 0.1
+    assert 'use load_mode swap' in caplog.text
+    assert [thread.sink for thread in dispatch.running_sinks()] == ['db']
+    release.set()
+    for thread in dispatch.TIMED_OUT:
+        thread.join()
+    assert dispatch.running_sinks() == []
+
+def test_rejected_rows_are_written_by_db_sink():
+    transform = setup_transform()
+    assert dispatch.dispatch(transform, {}) == {'file': 'ok', 'db': 'ok'}
+    transform.write_rejected_rows_to_db.assert_not_called()
+    transform.rejected_data = {'2': {'err_msg': ['Some fields missing data']}}
+    transform.write_rejected_rows_to_db.side_effect = SystemExit(1)
+    assert dispatch.dispatch(transform, {}) == {'file': 'ok', 'db': 'failed'}
+    transform.write_rejected_rows_to_db.assert_called_once()
+    transform = setup_transform({'sinks': ['file']})
+    transform.rejected_data = {'2': {'err_msg': ['Some fields missing data']}}
+    assert dispatch.dispatch(transform, {}) == {'file': 'ok'}
+    transform.write_rejected_rows_to_db.assert_not_called()
+
+def test_configured_sinks():
+    transform = setup_transform({'sinks': ['file']})
+    assert dispatch.dispatch(transform, {}) == {'file': 'ok'}
+    transform.write_to_db.assert_not_called()
+    with pytest.raises(SystemExit):
+        dispatch.dispatch(setup_transform({'sinks': ['kafka']}), {})
@@ -0,0 +1,31 @@
+import logging
+import unittest.mock as mock
+import pytest
+import etl
+import fanout
+import incremental
+from tests.test_pipeline import setup_source_file, SOURCE_DATA_VALID
+
+def test_mode_flags_are_mutually_exclusive(capsys):
+    args = etl.parse_args(['-n', 'sales-summary', '-c', 'app.yaml', '--stream'])
+    assert args.stream and args.workers == 1
+    with pytest.raises(SystemExit):
+        etl.parse_args(['-n', 'sales-summary', '-c', 'app.yaml', '--stream', '--workers', '4'])
+    assert 'not allowed with argument' in capsys.readouterr().err
+
+def test_run_transform_warns_on_unused_modes(tmp_path, caplog):
+    p = setup_source_file(tmp_path, SOURCE_DATA_VALID)
+    with mock.patch.object(incremental, 'run', return_value=(None, {})) as mock_run, \
+         caplog.at_level(logging.WARNING):
+        etl.run_transform(p, stream=True, incremental=True)
+    mock_run.assert_called_once_with(p)
+    assert 'Modes incremental, stream requested, only incremental is used' in caplog.text
+
+def test_shared_scan_warns_on_unused_modes(tmp_path, caplog):
+    p = setup_source_file(tmp_path, SOURCE_DATA_VALID)
+    with mock.patch.object(fanout, 'run', return_value={p.transform_name: (None, {})}) as mock_run, \
+         mock.patch.object(etl.dispatch, 'dispatch', return_value={'file': 'ok'}), \
+         caplog.at_level(logging.WARNING):
+        assert etl.run_pipelines([p, p], columnar=True) == []
+    mock_run.assert_called_once_with([p, p])
+    assert 'Modes columnar apply to a single transformation' in caplog.text
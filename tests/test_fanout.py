@@ -0,0 +1,86 @@
+import json
+import os
+import unittest.mock as mock
+import metrics
+import pipeline
+import fanout
+from tests.test_pipeline import setup_source_file, SOURCE_DATA_INVALID_PRIORITY, \
+    SOURCE_DATA_MISSING_DATA, SOURCE_DATA_MISSING_FIELD
+
+# blank Item Type in row 1, only projected by sales-summary, row 4 is incomplete,
+# row 5 has an invalid Order Priority
+SOURCE_DATA_MIXED = '\n'.join(SOURCE_DATA_MISSING_DATA.splitlines()
+                              + SOURCE_DATA_MISSING_FIELD.splitlines()[3:]
+                              + SOURCE_DATA_INVALID_PRIORITY.splitlines()[2:3])
+
+def setup_pipelines(tmp_path, source_data=SOURCE_DATA_INVALID_PRIORITY):
+    summary = setup_source_file(tmp_path, source_data)
+    aggregate = setup_source_file(tmp_path, source_data)
+    aggregate.transform_name = 'sales-aggregate'
+    del aggregate.config['output']['field_expansion']
+    aggregate.config['output']['group_fields'] = ['Region']
+    aggregate.config['output']['leaf_fields'] = {
+        'Country': ['Country', ''],
+        'Order Priority': ['OrderPriority', ''],
+        'Total Profit': ['CountryProfit', 'sum'],
+        }
+    return summary, aggregate
+
+def single_run(p):
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p, e)
+    return t.gen_output(t.transform_stream(e.iter_rows())), t.rejected_data
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_fanout_matches_single_runs(mock_write, tmp_path):
+    pipelines = setup_pipelines(tmp_path)
+    expected = {p.transform_name: single_run(p) for p in pipelines}
+    mock_write.reset_mock()
+    with mock.patch.object(pipeline.Extract, 'iter_rows', autospec=True,
+                           side_effect=pipeline.Extract.iter_rows) as spy:
+        results = fanout.run(pipelines)
+    assert spy.call_count == 1
+    for name, (transform, data) in results.items():
+        assert json.dumps(data, sort_keys=True) == json.dumps(expected[name][0], sort_keys=True)
+        assert transform.rejected_data == expected[name][1]
+    mock_write.assert_not_called()
+
+def test_fanout_rejects_per_pipeline(tmp_path):
+    pipelines = setup_pipelines(tmp_path, SOURCE_DATA_MIXED)
+    expected = {p.transform_name: single_run(p) for p in pipelines}
+    results = fanout.run(pipelines)
+    for name, (transform, data) in results.items():
+        assert json.dumps(data, sort_keys=True) == json.dumps(expected[name][0], sort_keys=True)
+        assert transform.rejected_data == expected[name][1]
+    assert list(results['sales-summary'][0].rejected_data) == ['1', '4', '5']
+    assert list(results['sales-aggregate'][0].rejected_data) == ['4', '5']
+
+def test_group_pipelines_by_source_and_checks(tmp_path):
+    summary, aggregate = setup_pipelines(tmp_path)
+    assert summary.projected_fields() != aggregate.projected_fields()
+    assert fanout.group_pipelines([summary, aggregate]) == [[summary, aggregate]]
+    assert fanout.scan_fields([aggregate, summary]) == summary.source_fields
+    aggregate.config['checks']['number_field'] = []
+    assert fanout.group_pipelines([summary, aggregate]) == [[summary], [aggregate]]
+
+def test_shipped_transforms_share_scan():
+    pipelines = []
+    for name in ['sales-summary', 'sales-aggregate']:
+        with open(os.path.join('transforms', name + '.yaml'), encoding='utf-8') as config_f:
+            config = config_f.read()
+        with mock.patch('builtins.open', mock.mock_open(read_data=config)):
+            p = pipeline.Pipeline(name)
+            p.get_config()
+        p.configure_preprocess_checks()
+        pipelines.append(p)
+    assert fanout.group_pipelines(pipelines) == [pipelines]
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_fanout_records_stage(mock_write, tmp_path):
+    pipelines = setup_pipelines(tmp_path)
+    run = metrics.reset()
+    fanout.run(pipelines)
+    stage = next(s for s in run.stages if s.name == 'shared_scan')
+    assert stage.transform == 'sales-summary,sales-aggregate'
+    assert (stage.rows_in, stage.rows_out) == (3, 1)
+    assert stage.bytes_read == os.path.getsize(pipelines[0].source_file)
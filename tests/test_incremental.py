@@ -0,0 +1,92 @@
+import json
+import unittest.mock as mock
+import metrics
+import pipeline
+import incremental
+from tests.test_pipeline import setup_valid_pipeline, SOURCE_DATA_VALID, \
+    SOURCE_DATA_INVALID_PRIORITY
+
+HEADER, *VALID_ROWS = SOURCE_DATA_VALID.splitlines()
+INVALID_ROWS = SOURCE_DATA_INVALID_PRIORITY.splitlines()[1:]
+
+def setup_pipeline(tmp_path, rows):
+    source_file = tmp_path / 'sales-records.csv'
+    source_file.write_text('\n'.join([HEADER] + rows) + '\n', encoding='utf-8')
+    p = setup_valid_pipeline()
+    p.source_file = str(source_file)
+    p.output_file = str(tmp_path / 'output.json')
+    return p
+
+def append_rows(p, rows):
+    with open(p.source_file, 'a', encoding='utf-8') as source_f:
+        source_f.write('\n'.join(rows) + '\n')
+
+def full_run(p):
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p, e)
+    return t.gen_output(t.transform_stream(e.iter_rows())), t.rejected_data
+
+def as_json(data):
+    return json.dumps(data, indent=4, sort_keys=True)
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_incremental_run_processes_appended_rows(mock_write, tmp_path):
+    p = setup_pipeline(tmp_path, VALID_ROWS[:2])
+    _, data = incremental.run(p)
+    assert as_json(data) == as_json(full_run(p)[0])
+    append_rows(p, VALID_ROWS[2:] + INVALID_ROWS)
+    with mock.patch.object(pipeline.Extract, 'iter_rows', autospec=True,
+                           side_effect=pipeline.Extract.iter_rows) as spy:
+        t, data = incremental.run(p)
+    assert spy.call_args.args[1] > 0
+    expected, rejected_data = full_run(p)
+    assert as_json(data) == as_json(expected)
+    assert t.rejected_data == rejected_data
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_incremental_run_rebuilds_rewritten_file(mock_write, tmp_path):
+    p = setup_pipeline(tmp_path, VALID_ROWS)
+    incremental.run(p)
+    p = setup_pipeline(tmp_path, list(reversed(VALID_ROWS)) + VALID_ROWS[:1])
+    assert incremental.load_checkpoint(incremental.get_checkpoint_file(p), p) is None
+    _, data = incremental.run(p)
+    assert as_json(data) == as_json(full_run(p)[0])
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_incremental_run_rebuilds_on_config_change(mock_write, tmp_path):
+    p = setup_pipeline(tmp_path, VALID_ROWS)
+    incremental.run(p)
+    checkpoint_file = incremental.get_checkpoint_file(p)
+    assert incremental.load_checkpoint(checkpoint_file, p) is not None
+    p.config['output']['leaf_fields']['Units Sold'][1] = 'max'
+    assert incremental.load_checkpoint(checkpoint_file, p) is None
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_incremental_run_leaves_partial_last_line(mock_write, tmp_path):
+    (tmp_path / 'full').mkdir()
+    expected, _ = full_run(setup_pipeline(tmp_path / 'full', VALID_ROWS[:3]))
+    p = setup_pipeline(tmp_path, VALID_ROWS[:2])
+    with open(p.source_file, 'a', encoding='utf-8') as source_f:
+        source_f.write(VALID_ROWS[2][:-4])
+    t, data = incremental.run(p)
+    assert t.rejected_data == {}
+    assert as_json(data) == as_json(full_run(setup_pipeline(tmp_path / 'full', VALID_ROWS[:2]))[0])
+    # writer completes the row
+    with open(p.source_file, 'a', encoding='utf-8') as source_f:
+        source_f.write(VALID_ROWS[2][-4:] + '\n')
+    t, data = incremental.run(p)
+    assert t.rejected_data == {}
+    assert as_json(data) == as_json(expected)
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_incremental_run_records_stage(mock_write, tmp_path):
+    p = setup_pipeline(tmp_path, VALID_ROWS[:2])
+    incremental.run(p)
+    append_rows(p, VALID_ROWS[2:] + INVALID_ROWS)
+    appended = '\n'.join(VALID_ROWS[2:] + INVALID_ROWS) + '\n'
+    run = metrics.reset()
+    t, _ = incremental.run(p)
+    stage = next(s for s in run.stages if s.name == 'process_appended')
+    assert stage.rows_in == len(VALID_ROWS[2:] + INVALID_ROWS)
+    assert stage.rows_out == stage.rows_in - len(t.rejected_data)
+    assert stage.bytes_read == len(appended.encode('utf-8'))
@@ -0,0 +1,77 @@
+import logging
+import unittest.mock as mock
+import pytest
+import logqueue
+import parallel
+import pipeline
+from tests.test_parallel import write_source
+from tests.test_pipeline import setup_valid_pipeline
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    logqueue.stop()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+def make_record(msg, created, level=logging.DEBUG):
+    record = logging.LogRecord('root', level, __file__, 1, msg, ('1',), None)
+    record.created = created
+    return record
+
+def test_rate_limit_filter():
+    rate_limit = logqueue.RateLimitFilter(2, interval=10)
+    passed = [rate_limit.filter(make_record('Row %s invalid', 100 + i)) for i in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert rate_limit.filter(make_record('Row %s rejected', 104))
+    assert rate_limit.filter(make_record('Row %s invalid', 104, logging.WARNING))
+    assert rate_limit.filter(make_record('Row %s invalid', 110))
+    assert rate_limit.summary() == [(logging.DEBUG, 'Row %s invalid', 3)]
+    assert rate_limit.summary() == []
+
+def test_setup_writes_in_listener_thread(tmp_path, root_logger):
+    log_file = tmp_path / 'etl.log'
+    logqueue.setup({'log_file': str(log_file), 'log_level': 'DEBUG', 'rate_limit': 3})
+    assert logqueue.LISTENER is not None
+    row = ['a']
+    for i in range(10):
+        logging.debug('Row %s --> Invalid %s', i, row)
+    logging.info('Done')
+    logqueue.stop()
+    logging.info('After stop')
+    lines = log_file.read_text(encoding='utf-8').splitlines()
+    assert [line.split(' INFO     ')[-1].split(' DEBUG    ')[-1] for line in lines] == [
+        "Row 0 --> Invalid ['a']", "Row 1 --> Invalid ['a']", "Row 2 --> Invalid ['a']",
+        'Done', '7 record(s) dropped by rate limit: Row %s --> Invalid %s', 'After stop']
+
+def test_setup_without_background(tmp_path, root_logger):
+    log_file = tmp_path / 'etl.log'
+    logqueue.setup({'log_file': str(log_file), 'log_level': 'INFO'}, background=False)
+    assert logqueue.LISTENER is None
+    logging.debug('Not written')
+    logging.info('Written')
+    assert log_file.read_text(encoding='utf-8').endswith('Written\n')
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_worker_drop_counts_are_logged_by_parent(mock_write, tmp_path, root_logger):
+    log_file = tmp_path / 'etl.log'
+    logging_config = {'log_file': str(log_file), 'log_level': 'DEBUG', 'rate_limit': 1}
+    logqueue.setup(logging_config, background=False)
+    p = setup_valid_pipeline()
+    p.source_file = write_source(tmp_path)
+    transform, _ = parallel.run(p, 2, initializer=logqueue.setup,
+                                initargs=(logging_config, False))
+    logqueue.stop()
+    lines = log_file.read_text(encoding='utf-8').splitlines()
+    counts = [int(line.split(' record(s) dropped')[0].rsplit(' ', 1)[1]) for line in lines
+              if line.endswith('dropped by rate limit: Row %s --> Invalid %s : %s')]
+    # one record passed per worker process, the parent logs the counts of both
+    assert len(counts) == 1
+    assert counts[0] >= len(transform.rejected_data) - 2
+
@@ -0,0 +1,67 @@
+import json
+import threading
+import time
+import metrics
+
+class Job():
+    transform_name = 'sales-aggregate'
+
+    @metrics.timed('work')
+    def work(self, rows):
+        metrics.count(rows_in=rows, rows_out=rows - 1, bytes_read=100)
+        with metrics.stage('inner', self.transform_name):
+            metrics.count(rows_in=5)
+        return rows
+
+def test_stages_are_recorded():
+    run = metrics.reset()
+    assert Job().work(10) == 10
+    Job().work(4)
+    assert [(s.name, s.rows_in) for s in run.stages] == [('inner', 5), ('work', 10),
+                                                          ('inner', 5), ('work', 4)]
+    record = json.loads(json.dumps(run.record()))
+    work = record['stages'][1]
+    assert work['transform'] == 'sales-aggregate'
+    assert work['rows_out'] == 9
+    assert work['bytes_read'] == 100
+    assert work['wall_seconds'] >= record['stages'][0]['wall_seconds']
+    assert work['peak_rss_bytes'] is None or work['peak_rss_bytes'] > 0
+
+def test_thread_stage_excludes_cpu_of_other_threads():
+    run = metrics.reset()
+    started = threading.Event()
+    def sink():
+        with metrics.stage('sink', 'sales-aggregate'):
+            started.set()
+            time.sleep(0.3)
+    thread = threading.Thread(target=sink)
+    thread.start()
+    started.wait()
+    # busy main thread while the sink stage waits
+    deadline = time.perf_counter() + 0.2
+    while time.perf_counter() < deadline:
+        pass
+    thread.join()
+    assert run.stages[0].wall_seconds >= 0.3
+    assert run.stages[0].cpu_seconds < 0.1
+
+def test_count_outside_stage_is_ignored():
+    run = metrics.reset()
+    metrics.count(rows_in=1)
+    assert run.stages == []
+
+def test_write_metrics(tmp_path):
+    run = metrics.reset()
+    Job().work(10)
+    Job().work(4)
+    config = {'file': str(tmp_path / 'metrics.jsonl'), 'prometheus_file': str(tmp_path / 'etl.prom')}
+    metrics.write(config)
+    metrics.write(config)
+    lines = (tmp_path / 'metrics.jsonl').read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 2
+    assert len(json.loads(lines[0])['stages']) == 4
+    prom = (tmp_path / 'etl.prom').read_text(encoding='utf-8')
+    assert '# TYPE etl_stage_wall_seconds gauge' in prom
+    assert 'etl_stage_rows_in{transform="sales-aggregate",stage="work"} 14' in prom
+    assert 'etl_stage_rows_in{transform="sales-aggregate",stage="inner"} 10' in prom
+    assert 'etl_stage_bytes_read{transform="sales-aggregate",stage="inner"}' not in prom
@@ -0,0 +1,59 @@
+import json
+import unittest.mock as mock
+import metrics
+import pipeline
+import parallel
+from tests.test_pipeline import setup_valid_pipeline, SOURCE_DATA_VALID, SOURCE_DATA_INVALID_PRIORITY
+
+def write_source(tmp_path):
+    header, *valid_rows = SOURCE_DATA_VALID.splitlines()
+    invalid_rows = SOURCE_DATA_INVALID_PRIORITY.splitlines()[1:]
+    lines = [header] + (valid_rows + invalid_rows) * 50
+    source_file = tmp_path / 'sales-records.csv'
+    source_file.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(source_file)
+
+def test_split_source_covers_data_rows(tmp_path):
+    source_file = write_source(tmp_path)
+    with open(source_file, 'rb') as source_f:
+        content = source_f.read()
+    ranges = parallel.split_source(source_file, 4)
+    assert len(ranges) == 4
+    assert ranges[0][0] == content.index(b'\n') + 1
+    assert ranges[-1][1] == len(content)
+    for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+        assert end == start
+        assert content[start - 1:start] == b'\n'
+
+def test_split_source_more_chunks_than_rows(tmp_path):
+    source_file = tmp_path / 'sales-records.csv'
+    source_file.write_text(SOURCE_DATA_VALID, encoding='utf-8')
+    ranges = parallel.split_source(str(source_file), 50)
+    assert len(ranges) <= 4
+    assert ranges[-1][1] == len(SOURCE_DATA_VALID)
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_run_matches_single_process(mock_write, tmp_path):
+    p = setup_valid_pipeline()
+    p.source_file = write_source(tmp_path)
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p,e)
+    expected = t.gen_output(t.transform_stream(e.iter_rows()))
+    transform, data = parallel.run(p, 3)
+    assert json.dumps(data, indent=4, sort_keys=True) == \
+        json.dumps(expected, indent=4, sort_keys=True)
+    assert transform.rejected_data == t.rejected_data
+    mock_write.assert_not_called()
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_run_records_stage(mock_write, tmp_path):
+    run = metrics.reset()
+    p = setup_valid_pipeline()
+    p.source_file = write_source(tmp_path)
+    transform, _ = parallel.run(p, 3)
+    stage = next(s for s in run.stages if s.name == 'process_chunks')
+    with open(p.source_file, 'rb') as source_f:
+        content = source_f.read()
+    assert stage.rows_in == content.count(b'\n') - 1
+    assert stage.rows_out == stage.rows_in - len(transform.rejected_data)
+    assert stage.bytes_read == len(content) - content.index(b'\n') - 1
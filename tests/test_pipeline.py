@@ -3,6 +3,7 @@ import pytest
 import unittest.mock as mock
 from unittest.mock import mock_open
 import yaml
+import metrics
 import pipeline
 from deepdiff import DeepDiff
 
@@ -535,7 +536,7 @@ def test_transform_initialisation(mock_open):
     p.configure_preprocess_checks()
     e = pipeline.Extract(p)
     t = pipeline.Transform(p,e)
-    assert len(t.__dict__.keys()) == 13
+    assert len(t.__dict__.keys()) == 15
 
 @mock.patch('builtins.open', new_callable=mock_open, create=True, read_data=SOURCE_DATA_VALID)
 def test_run_data_completeness_check_with_valid_data(mock_open):
@@ -647,3 +648,215 @@ def test_gen_output(mock_open):
   data = t.gen_output()
   differences = DeepDiff(data, EXPECTED_OUTPUT)
   assert differences == {}
+
+def setup_source_file(tmp_path, source_data):
+    source_file = tmp_path / SOURCE_FILENAME
+    source_file.write_text(source_data + '\n', encoding='utf-8')
+    p = setup_valid_pipeline()
+    p.source_file = str(source_file)
+    return p
+
+def test_iter_rows_matches_extract(tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_VALID)
+    e = pipeline.Extract(p)
+    streamed = dict(e.iter_rows())
+    e.extract()
+    assert streamed == e.source_data
+
+def test_gen_output_streaming(tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_VALID)
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p,e)
+    data = t.gen_output(t.transform_stream(e.iter_rows()))
+    differences = DeepDiff(data, EXPECTED_OUTPUT)
+    assert differences == {}
+    assert len(t.transformed_data) == 0
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_transform_stream_with_invalid_priority(mock_write, tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_INVALID_PRIORITY)
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p,e)
+    rows = list(t.transform_stream(e.iter_rows()))
+    assert len(rows) == 1
+    assert sorted(t.rejected_data.keys()) == ['2', '3']
+    assert t.rejected_data['2']['err_msg'] == [['Invalid (Order Priority):A']]
+    mock_write.assert_not_called()
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_transform_stream_with_missing_field(mock_write, tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_MISSING_FIELD)
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p,e)
+    rows = list(t.transform_stream(e.iter_rows()))
+    assert len(rows) == 2
+    assert t.rejected_data['3']['err_msg'] == [pipeline.ERR_INCOMPLETE_DATA_ROW]
+    assert t.rejected_data['3']['col_count'] == 13
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_transform_leaves_source_data_untouched(mock_write, tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_INVALID_PRIORITY)
+    e = pipeline.Extract(p)
+    e.extract()
+    source_data = {row: dict(row_data) for row, row_data in e.source_data.items()}
+    t = pipeline.Transform(p,e)
+    t.transform()
+    assert e.source_data == source_data
+    assert t.rejected_data['2']['err_msg'] == [['Invalid (Order Priority):A']]
+    assert 'err_msg' not in e.source_data['2']
+    row = next(iter(t.transformed_data))
+    assert isinstance(t.transformed_data[row]['Units Sold'], int)
+    assert isinstance(e.source_data[row]['Units Sold'], str)
+    mock_write.assert_not_called()
+
+def test_required_fields():
+    p = setup_valid_pipeline()
+    assert p.required_fields() == p.source_fields
+    del p.config['output']['leaf_fields']['Item Type']
+    del p.config['output']['leaf_fields']['Order ID']
+    assert p.required_fields() == [field for field in p.source_fields
+                                   if field not in ('Item Type', 'Order ID')]
+    assert p.decoded_fields() is None
+    p.config['source']['reader'] = 'mmap'
+    assert p.decoded_fields() == p.required_fields()
+
+@pytest.mark.parametrize('source_data', [SOURCE_DATA_VALID, SOURCE_DATA_MISSING_FIELD,
+                                         SOURCE_DATA_MISSING_DATA, SOURCE_NO_DATA_2])
+def test_iter_rows_mapped_matches_iter_rows(tmp_path, source_data):
+    p = setup_source_file(tmp_path, source_data)
+    e = pipeline.Extract(p)
+    assert list(e.iter_rows(fields=p.source_fields)) == list(e.iter_rows())
+    (tmp_path / SOURCE_FILENAME).write_bytes(source_data.replace('\n', '\r\n').encode('utf-8'))
+    assert list(e.iter_rows(fields=p.source_fields)) == list(e.iter_rows())
+
+def test_iter_rows_mapped_decodes_only_fields(tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_MISSING_DATA)
+    e = pipeline.Extract(p)
+    rows = dict(e.iter_rows(fields=['Region']))
+    assert rows['1']['Region'] == 'Middle East and North Africa'
+    assert rows['1']['Country'] is None
+    # blank values are kept for the data completeness check
+    assert rows['1']['Item Type'] == ''
+    t = pipeline.Transform(p,e)
+    valid = list(t.transform_stream(e.iter_rows(fields=p.source_fields), partial=True))
+    assert len(valid) == 2
+    assert sorted(t.rejected_data.keys()) == ['1']
+
+def test_iter_rows_mapped_with_quoted_values(tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_VALID.replace('Libya', '"Libya, State of"', 1))
+    e = pipeline.Extract(p)
+    rows = dict(e.iter_rows(fields=['Region']))
+    assert rows['1']['Country'] == 'Libya, State of'
+    assert rows == dict(e.iter_rows())
+
+def setup_projected_pipeline(tmp_path, source_data):
+    p = setup_source_file(tmp_path, source_data)
+    del p.config['output']['field_expansion']
+    p.config['output']['group_fields'] = ['Region']
+    p.config['output']['leaf_fields'] = {
+        'Country': ['Country', ''],
+        'Total Profit': ['CountryProfit', 'sum'],
+        }
+    return p
+
+def test_projected_fields(tmp_path):
+    p = setup_projected_pipeline(tmp_path, SOURCE_DATA_VALID)
+    assert p.projected_fields() == [field for field in p.source_fields
+                                    if field not in ('Item Type', 'Order ID')]
+    p.config['checks']['strict'] = True
+    assert p.projected_fields() == p.source_fields
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_projection_keeps_checks_of_unused_fields(mock_write, tmp_path):
+    p = setup_projected_pipeline(tmp_path, SOURCE_DATA_INVALID_UNIT_PRICE)
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p,e)
+    rows = list(t.transform_stream(e.iter_rows()))
+    assert len(rows) == 1
+    assert list(rows[0].keys()) == p.projected_fields()
+    assert isinstance(rows[0]['Total Profit'], float)
+    assert sorted(t.rejected_data.keys()) == ['1', '3']
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_projection_skips_blank_unused_fields(mock_write, tmp_path):
+    p = setup_projected_pipeline(tmp_path, SOURCE_DATA_MISSING_DATA)
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p,e)
+    rows = list(t.transform_stream(e.iter_rows()))
+    assert len(rows) == 3
+    assert t.rejected_data == {}
+    p.config['checks']['strict'] = True
+    t = pipeline.Transform(p,e)
+    rows = list(t.transform_stream(e.iter_rows()))
+    assert len(rows) == 2
+    assert sorted(t.rejected_data.keys()) == ['1']
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_projection_rejects_rows_with_missing_or_extra_field(mock_write, tmp_path):
+    lines = SOURCE_DATA_VALID.splitlines()
+    lines[1] = lines[1].replace('686800706,', '', 1)
+    lines[2] = lines[2] + ',1'
+    p = setup_projected_pipeline(tmp_path, '\n'.join(lines))
+    p.config['checks'] = {}
+    p.preprocess_checks = ['data_completeness']
+    p.config['output']['leaf_fields'] = {'Total Revenue': ['Rev', 'sum']}
+    assert p.projected_fields() == ['Region', 'Total Revenue']
+    e = pipeline.Extract(p)
+    def assert_rejected(rejected_data):
+        assert sorted(rejected_data.keys()) == ['1', '2']
+        assert rejected_data['1']['err_msg'] == [pipeline.ERR_INCOMPLETE_DATA_ROW]
+        # values are kept as read
+        assert rejected_data['1']['col_count'] == 13
+        assert rejected_data['1']['Order ID'] == '10/31/2014'
+        assert rejected_data['1']['Total Cost'] == '1468506.02'
+        assert rejected_data['2']['col_count'] == 15
+        assert rejected_data['2']['Total Profit'] == '145419.62'
+    for fields in (None, p.required_fields()):
+        t = pipeline.Transform(p,e)
+        rows = list(t.transform_stream(e.iter_rows(fields=fields)))
+        assert len(rows) == 2
+        assert_rejected(t.rejected_data)
+    e.extract()
+    t = pipeline.Transform(p,e)
+    t.transform()
+    assert_rejected(t.rejected_data)
+    store = e.extract_columns()
+    t = pipeline.Transform(p,e)
+    t.transform_columns(store)
+    assert_rejected(t.rejected_data)
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_projection_in_all_modes(mock_write, tmp_path):
+    p = setup_projected_pipeline(tmp_path, SOURCE_DATA_MISSING_FIELD)
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p,e)
+    streamed = t.gen_output(t.transform_stream(e.iter_rows()))
+    assert t.rejected_data['3']['err_msg'] == [pipeline.ERR_INCOMPLETE_DATA_ROW]
+    mapped = t.gen_output(t.transform_stream(e.iter_rows(fields=p.required_fields())))
+    e.extract()
+    assert list(e.source_data['1'].keys()) == p.projected_fields()
+    t = pipeline.Transform(p,e)
+    t.transform()
+    assert t.gen_output() == streamed == mapped
+    store = e.extract_columns(p.categorical_fields())
+    t = pipeline.Transform(p,e)
+    t.transform_columns(store)
+    assert t.gen_output_columns(store) == streamed
+    assert list(t.rejected_data.keys()) == ['3']
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_pipeline_stages_are_recorded(mock_write, tmp_path):
+    run = metrics.reset()
+    p = setup_source_file(tmp_path, SOURCE_DATA_INVALID_PRIORITY)
+    e = pipeline.Extract(p)
+    e.extract()
+    t = pipeline.Transform(p,e)
+    t.transform()
+    t.gen_output()
+    stages = {s.name: s for s in run.stages}
+    assert list(stages) == ['get_config', 'extract', 'run_preprocess',
+                            'transform_data_expansion', 'gen_output']
+    assert stages['extract'].rows_out == 3
+    assert stages['extract'].bytes_read == len(SOURCE_DATA_INVALID_PRIORITY) + 1
+    assert (stages['run_preprocess'].rows_in, stages['run_preprocess'].rows_out) == (3, 1)
+    assert (stages['gen_output'].rows_in, stages['gen_output'].rows_out) == (1, 1)
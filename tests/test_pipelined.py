@@ -0,0 +1,16 @@
+import unittest.mock as mock
+import pipeline
+import pipelined
+from tests.test_pipeline import setup_source_file, SOURCE_DATA_INVALID_PRIORITY
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_pipelined_matches_stream(mock_write, tmp_path):
+    p = setup_source_file(tmp_path, SOURCE_DATA_INVALID_PRIORITY)
+    e = pipeline.Extract(p)
+    t = pipeline.Transform(p,e)
+    streamed = t.gen_output(t.transform_stream(e.iter_rows()))
+    for reader in pipeline.SOURCE_READERS:
+        p.config['source']['reader'] = reader
+        transform, data = pipelined.run(p, read_ahead=1)
+        assert data == streamed
+        assert transform.rejected_data == t.rejected_data
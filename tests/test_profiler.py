@@ -0,0 +1,37 @@
+import pstats
+import time
+import pytest
+import profiler
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return 'done'
+
+def test_profile_writes_pstats_and_collapsed_stacks(tmp_path):
+    prefix = profiler.output_prefix(str(tmp_path), ['sales-aggregate', 'sales-summary'], 2048)
+    assert '/profile-sales-aggregate+sales-summary-2048b-' in prefix.replace('\\', '/')
+    assert profiler.profile(prefix, busy, 0.2) == 'done'
+    stats = pstats.Stats(prefix + '.pstats')
+    assert any(func[2] == 'busy' for func in stats.stats)
+    lines = open(prefix + '.collapsed', encoding='utf-8').read().splitlines()
+    assert len(lines) > 0
+    assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in lines)
+    # other threads, e.g. pymongo background threads of earlier tests, may be sampled as well
+    assert any(line.startswith('MainThread;') for line in lines)
+    assert any('busy (test_profiler.py:' in line for line in lines)
+
+def test_profile_is_written_on_exit(tmp_path):
+    prefix = str(tmp_path / 'profile')
+    def fail():
+        raise SystemExit(1)
+    with pytest.raises(SystemExit):
+        profiler.profile(prefix, fail)
+    assert (tmp_path / 'profile.pstats').exists()
+    assert (tmp_path / 'profile.collapsed').exists()
+
+def test_input_size(tmp_path):
+    source = tmp_path / 'sales.csv'
+    source.write_bytes(b'x' * 10)
+    assert profiler.input_size([str(source), str(source), str(tmp_path / 'missing.csv')]) == 10
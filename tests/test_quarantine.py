@@ -0,0 +1,85 @@
+import csv
+import json
+import logging
+import unittest.mock as mock
+import metrics
+import parallel
+import pipeline
+import quarantine
+from tests.test_pipeline import setup_source_file, SOURCE_DATA_INVALID_PRIORITY
+
+def setup_quarantined_pipeline(tmp_path, quarantine_file, **options):
+    header, *rows = SOURCE_DATA_INVALID_PRIORITY.splitlines()
+    # short row and windows line endings
+    source_data = '\r\n'.join([header] + rows * 20 + [rows[0][:40]])
+    p = setup_source_file(tmp_path, source_data)
+    p.config['output']['quarantine'] = dict(file=str(tmp_path / quarantine_file), **options)
+    return p
+
+def read_ndjson(path):
+    with open(path, encoding='utf-8') as ndjson_file:
+        return [json.loads(line) for line in ndjson_file]
+
+def assert_positions(p, records):
+    with open(p.source_file, 'rb') as source_f:
+        content = source_f.read()
+    lines = content.split(b'\n')
+    for record in records:
+        offset = int(record['offset'])
+        assert content[:offset].count(b'\n') == int(record['line']) - 1
+        assert lines[int(record['line']) - 1].startswith(b'North America') or \
+            lines[int(record['line']) - 1].startswith(b'Middle East')
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_rejects_streamed_to_quarantine(mock_write, tmp_path):
+    run = metrics.reset()
+    p = setup_quarantined_pipeline(tmp_path, 'rejects.ndjson')
+    for reader in pipeline.SOURCE_READERS:
+        p.config['source']['reader'] = reader
+        e = pipeline.Extract(p)
+        t = pipeline.Transform(p,e)
+        position = t.source_position()
+        rows = e.iter_rows(fields=p.decoded_fields(), position=position)
+        t.gen_output(t.transform_stream(rows, position=position))
+        records = read_ndjson(tmp_path / 'rejects.ndjson')
+        assert [record['row'] for record in records] == \
+            [str(i) for i in range(1, 61) if i % 3 != 1] + ['61']
+        assert records[0]['line'] == 3
+        assert records[0]['data']['Order Priority'] == 'A'
+        assert records[-1]['err_msg'] == [pipeline.ERR_INCOMPLETE_DATA_ROW]
+        assert_positions(p, records)
+        assert t.rejected_data == {}
+        mock_write.assert_not_called()
+    assert run.rejected['sales-summary'] == {'Invalid (Order Priority)': 80,
+                                             'Some fields missing data': 2}
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_quarantine_csv_and_workers(mock_write, tmp_path):
+    p = setup_quarantined_pipeline(tmp_path, 'rejects.csv')
+    parallel.run(p, 3)
+    with open(tmp_path / 'rejects.csv', encoding='utf-8', newline='') as csv_file:
+        records = list(csv.DictReader(csv_file))
+    assert [record['row'] for record in records] == [str(i) for i in range(1, 61) if i % 3 != 1] + ['61']
+    assert records[0]['err_msg'] == 'Invalid (Order Priority):A'
+    assert records[0]['Country'] == 'Canada'
+    assert_positions(p, records)
+
+@mock.patch.object(pipeline.Transform, 'write_rejected_rows_to_db')
+def test_rejected_row_log_limit(mock_write, tmp_path, caplog):
+    p = setup_quarantined_pipeline(tmp_path, 'rejects.ndjson', log_limit=5)
+    e = pipeline.Extract(p)
+    e.extract()
+    t = pipeline.Transform(p,e)
+    with caplog.at_level(logging.WARNING):
+        t.transform()
+    assert len([r for r in caplog.records if 'rejected:' in r.getMessage()]) == 5
+    assert '41 row(s) rejected - Invalid (Order Priority): 40, Some fields missing data: 1' \
+        in caplog.text
+    records = read_ndjson(tmp_path / 'rejects.ndjson')
+    assert len(records) == 41
+    assert records[0]['line'] is None
+
+def test_empty_quarantine_file_written(tmp_path):
+    sink = quarantine.RejectSink('sales-summary', {'file': str(tmp_path / 'rejects.ndjson')}, [])
+    sink.close()
+    assert (tmp_path / 'rejects.ndjson').read_text(encoding='utf-8') == ''
@@ -0,0 +1,32 @@
+import io
+import pytest
+import readahead
+
+def test_read_ahead_matches_file(tmp_path):
+    source_file = tmp_path / 'source.csv'
+    content = b''.join(b'%d,row %d\n' % (i, i) for i in range(5000))
+    source_file.write_bytes(content)
+    with open(source_file, 'rb') as source_f:
+        source_f.seek(7)
+        with readahead.open_read_ahead(source_f, blocks=2, block_size=1000) as lines_f:
+            lines = list(lines_f)
+            assert lines_f.tell() == len(content)
+    assert b''.join(lines) == content[7:]
+
+def test_close_stops_reader(tmp_path):
+    source_file = tmp_path / 'source.csv'
+    source_file.write_bytes(b'x\n' * 100000)
+    with open(source_file, 'rb') as source_f:
+        raw = readahead.ReadAheadRaw(source_f, blocks=1, block_size=10)
+        lines_f = io.BufferedReader(raw)
+        assert lines_f.readline() == b'x\n'
+        lines_f.close()
+        assert not raw.reader.is_alive()
+
+def test_read_error_is_raised(tmp_path):
+    class Failing(io.BytesIO):
+        def read(self, size=-1):
+            raise OSError('disk gone')
+    with readahead.open_read_ahead(Failing()) as lines_f:
+        with pytest.raises(OSError, match='disk gone'):
+            lines_f.read()
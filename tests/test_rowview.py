@@ -0,0 +1,28 @@
+import pytest
+from rowview import RowView
+
+LAYOUT = {'Region': 0, 'Units Sold': 1}
+
+def test_row_view_reads_source_row():
+    source = {'Region': 'Asia', 'Units Sold': '10'}
+    row = RowView(source, LAYOUT)
+    assert row['Units Sold'] == '10'
+    assert dict(row) == source
+    assert row.changes is None
+
+def test_row_view_write_leaves_source_untouched():
+    source = {'Region': 'Asia', 'Units Sold': '10'}
+    row = RowView(source, LAYOUT)
+    row['Units Sold'] = 10
+    assert row['Units Sold'] == 10
+    assert dict(row) == {'Region': 'Asia', 'Units Sold': 10}
+    assert source['Units Sold'] == '10'
+    del row['Units Sold']
+    assert row['Units Sold'] == '10'
+
+def test_row_view_rejects_unknown_field():
+    row = RowView({'Region': 'Asia', 'Units Sold': '10'}, LAYOUT)
+    with pytest.raises(KeyError):
+        row['Country'] = 'Japan'
+    with pytest.raises(KeyError):
+        _ = row['Country']
@@ -0,0 +1,107 @@
+import json
+import os
+import pytest
+import pipeline
+import sinks
+import utils
+import colfile
+from tests.test_pipeline import setup_valid_pipeline, EXPECTED_OUTPUT
+
+def test_iter_json_matches_json_dumps():
+    assert ''.join(sinks.iter_json(EXPECTED_OUTPUT)) == \
+        json.dumps(EXPECTED_OUTPUT, indent=4, sort_keys=True)
+    assert ''.join(sinks.iter_json({})) == json.dumps({}, indent=4, sort_keys=True)
+    mixed = {'b': [1, {'y': 'line\nbreak', 'x': []}], 'a': 1.5, 2: None, 'c': {}}
+    mixed_json = {str(key): value for key, value in mixed.items()}
+    assert ''.join(sinks.iter_json(mixed_json)) == json.dumps(mixed_json, indent=4, sort_keys=True)
+    assert ''.join(sinks.iter_json(mixed, compact=True)) == \
+        json.dumps(mixed, separators=(',', ':'))
+
+def test_iter_json_streams_group_values():
+    chunks = list(sinks.iter_json({'Asia': {'Japan': {'Total Profit': 1.0}}}))
+    # begin, key, value chunks, end
+    assert len(chunks) > 4
+
+def test_iter_json_compact():
+    compact = ''.join(sinks.iter_json(EXPECTED_OUTPUT, compact=True))
+    assert compact == json.dumps(EXPECTED_OUTPUT, separators=(',', ':'))
+    assert json.loads(compact) == EXPECTED_OUTPUT
+
+def test_write_json_atomic(tmp_path):
+    output_file = tmp_path / 'output.json'
+    sinks.write_json(str(output_file), EXPECTED_OUTPUT)
+    assert json.loads(output_file.read_text(encoding='utf-8')) == EXPECTED_OUTPUT
+    assert os.listdir(tmp_path) == ['output.json']
+
+def test_write_json_failure_keeps_previous_file(tmp_path):
+    output_file = tmp_path / 'output.json'
+    output_file.write_text('previous', encoding='utf-8')
+    with pytest.raises(TypeError):
+        sinks.write_json(str(output_file), {'a': [1], 'b': object()})
+    assert output_file.read_text(encoding='utf-8') == 'previous'
+    assert os.listdir(tmp_path) == ['output.json']
+
+def test_transform_write_json_compact(tmp_path):
+    p = setup_valid_pipeline()
+    p.config['output']['json'] = {'compact': True, 'atomic': False}
+    t = pipeline.Transform(p, pipeline.Extract(p))
+    t.output_file = str(tmp_path / 'output.json')
+    t.write_json(EXPECTED_OUTPUT)
+    content = (tmp_path / 'output.json').read_text(encoding='utf-8')
+    assert '\n' not in content
+    assert json.loads(content) == EXPECTED_OUTPUT
+
+GROUP_FIELDS = ['Region', 'Sales Channel']
+
+def expected_records():
+    return list(utils.iter_leaf_records(EXPECTED_OUTPUT, GROUP_FIELDS))
+
+def test_ndjson_sink(tmp_path):
+    output_file = tmp_path / 'output.ndjson'
+    sinks.ndjson_sink(str(output_file), EXPECTED_OUTPUT, GROUP_FIELDS, {})
+    lines = output_file.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == expected_records()
+    assert lines[0].startswith('{"Region":"Middle East and North Africa","Sales Channel":"Offline",')
+
+def test_columnar_sink_native(tmp_path):
+    output_file = tmp_path / 'output.etlc'
+    sinks.columnar_sink(str(output_file), EXPECTED_OUTPUT, GROUP_FIELDS,
+                        {'engine': 'native', 'row_group_size': 2})
+    assert list(colfile.read_columnar(str(output_file))) == expected_records()
+    assert list(colfile.read_columnar(str(output_file), ['Country', 'UnitsSold'])) == \
+        [{'Country': r['Country'], 'UnitsSold': r['UnitsSold']} for r in expected_records()]
+
+@pytest.mark.parametrize('engine', ['parquet', 'arrow'])
+def test_columnar_sink_pyarrow(tmp_path, engine):
+    pyarrow = pytest.importorskip('pyarrow')
+    output_file = tmp_path / 'output.bin'
+    sinks.columnar_sink(str(output_file), EXPECTED_OUTPUT, GROUP_FIELDS,
+                        {'engine': engine, 'row_group_size': 2})
+    if engine == 'parquet':
+        parquet_file = pytest.importorskip('pyarrow.parquet').ParquetFile(str(output_file))
+        assert parquet_file.metadata.num_row_groups == 2
+        table = parquet_file.read()
+    else:
+        table = pyarrow.ipc.open_file(str(output_file)).read_all()
+    assert table.to_pylist() == expected_records()
+
+def test_write_columnar_unknown_engine(tmp_path):
+    with pytest.raises(ValueError):
+        sinks.write_columnar(str(tmp_path / 'output.bin'), [], engine='orc')
+
+def test_transform_write_output_ndjson(tmp_path):
+    p = setup_valid_pipeline()
+    p.config['output']['format'] = 'ndjson'
+    t = pipeline.Transform(p, pipeline.Extract(p))
+    t.output_file = str(tmp_path / 'output.ndjson')
+    t.write_output(EXPECTED_OUTPUT)
+    lines = (tmp_path / 'output.ndjson').read_text(encoding='utf-8').splitlines()
+    assert len(lines) == len(expected_records())
+
+def test_transform_write_output_unknown_format(tmp_path):
+    p = setup_valid_pipeline()
+    p.config['output']['format'] = 'xml'
+    t = pipeline.Transform(p, pipeline.Extract(p))
+    t.output_file = str(tmp_path / 'output.xml')
+    with pytest.raises(SystemExit):
+        t.write_output(EXPECTED_OUTPUT)
@@ -1,3 +1,4 @@
+import datetime
 import utils
 
 def test_date_format_with_correct_date():
@@ -42,3 +43,24 @@ def test_get_data_by_group():
     detail_data = [{'Country':'Japan', 'ItemType':'Baby Food', 'Units Sold': 10}]
     output = utils.get_data_by_group(high_level_data, detail_data)
     assert output == {'Asia': {'Offline': [{'Country':'Japan', 'ItemType':'Baby Food', 'Units Sold': 10}]}}
+
+def test_parse_date_returns_date():
+    assert utils.parse_date("11/14/2021", "%m/%d/%Y") == datetime.date(2021, 11, 14)
+    assert utils.parse_date("2021-11-14", "%Y-%m-%d") == datetime.date(2021, 11, 14)
+
+def test_parse_date_with_invalid_date():
+    assert utils.parse_date("2/30/2021", "%m/%d/%Y") is None
+    assert utils.parse_date("14/11/2021", "%m/%d/%Y") is None
+    assert utils.parse_date("11/14/21", "%m/%d/%Y") is None
+
+def test_parse_date_matches_strptime():
+    values = ["1/2/2020", "01/02/2020", " 1/2/2020", "1/2/2020 ", "0/1/2020", "1/1/0000", "2/29/2020"]
+    for value in values:
+        try:
+            expected = datetime.datetime.strptime(value, "%m/%d/%Y").date()
+        except ValueError:
+            expected = None
+        assert utils.parse_date(value, "%m/%d/%Y") == expected
+
+def test_parse_date_other_format():
+    assert utils.parse_date("14.11.2021", "%d.%m.%Y") == datetime.date(2021, 11, 14)
@@ -0,0 +1,51 @@
+import validator
+
+SOURCE_FIELDS = ['Region', 'Order Date', 'Units Sold', 'Unit Price']
+CHECKS = {
+    'data': {'Region': ['Asia', 'Europe']},
+    'date_field': ['Order Date'],
+    'float_field': ['Unit Price'],
+    'number_field': ['Units Sold'],
+    }
+PREPROCESS_CHECKS = ['data_completeness', 'data', 'date_field', 'float_field', 'number_field']
+
+def test_valid_row_is_converted():
+    v = validator.RowValidator(SOURCE_FIELDS, CHECKS, PREPROCESS_CHECKS)
+    target = {}
+    err_msg = v.validate('1', ('Asia', '11/14/2021', '10', '2.5'), target)
+    assert err_msg == []
+    assert target == {'Units Sold': 10, 'Unit Price': 2.5}
+
+def test_errors_follow_task_order():
+    v = validator.RowValidator(SOURCE_FIELDS, CHECKS, PREPROCESS_CHECKS)
+    err_msg = v.validate('1', ('Africa', '14/11/2021', '', 'x'), {})
+    assert err_msg == [
+        ['Invalid (Units Sold):'],
+        ['Invalid (Region):Africa'],
+        ['Invalid (Order Date):14/11/2021'],
+        ['Invalid (Unit Price):x'],
+        ['Invalid (Units Sold):'],
+        ]
+
+def test_incomplete_row_skips_other_checks():
+    v = validator.RowValidator(SOURCE_FIELDS, CHECKS, PREPROCESS_CHECKS)
+    err_msg = v.validate('1', ('Africa', '14/11/2021', ''), {})
+    assert err_msg == [validator.ERR_INCOMPLETE_DATA_ROW]
+
+def test_number_field_rejects_non_ascii_digits():
+    v = validator.RowValidator(SOURCE_FIELDS, CHECKS, ['data_completeness', 'number_field'])
+    assert v.validate('1', ('Asia', '11/14/2021', '²', '2.5'), {}) == [['Invalid (Units Sold):²']]
+
+def test_unconfigured_tasks_are_skipped():
+    v = validator.RowValidator(SOURCE_FIELDS, CHECKS, ['data_completeness', 'unknown'])
+    assert v.validate('1', ('Africa', 'x', 'y', 'z'), {}) == []
+
+def test_checks_of_fields_without_values_are_skipped():
+    v = validator.RowValidator(SOURCE_FIELDS, CHECKS, PREPROCESS_CHECKS,
+                               ['Region', 'Unit Price'])
+    target = {}
+    assert v.validate('1', ('Asia', '2.5'), target) == []
+    assert target == {'Unit Price': 2.5}
+    assert v.validate('1', ('Africa', ''), {}) == [
+        ['Invalid (Unit Price):'], ['Invalid (Region):Africa'], ['Invalid (Unit Price):']]
+    assert v.validate('1', ('Asia',), {}) == [validator.ERR_INCOMPLETE_DATA_ROW]
@@ -3,6 +3,7 @@
 Reusable utilities
 '''
 import datetime
+import functools
 
 def is_numeric( input_value ):
     '''
@@ -20,11 +21,38 @@ def is_valid_date( date_value, date_format ):
     Check if input date_value is in required date_format
     Sample call: is_valid_date( "05/18/2021", "%m/%d/%Y" )
     '''
+    return parse_date( date_value, date_format ) is not None
+
+# date formats with fast path: separator and position of year, month, day
+FAST_DATE_FORMATS = {
+    '%m/%d/%Y': ('/', 2, 0, 1),
+    '%Y-%m-%d': ('-', 0, 1, 2),
+    }
+DATE_CACHE_SIZE = 4096
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date( date_value, date_format ):
+    '''
+    Parse input date_value in date_format
+    Returns datetime.date, None if date_value is not a valid date
+    Plain digit dates in FAST_DATE_FORMATS are built directly,
+    anything else falls back to strptime for exact semantics
+    Sample call: parse_date( "05/18/2021", "%m/%d/%Y" )
+    '''
+    if date_format in FAST_DATE_FORMATS:
+        separator, year, month, day = FAST_DATE_FORMATS[date_format]
+        parts = date_value.split(separator)
+        if len(parts) == 3 and len(parts[year]) == 4 \
+            and 0 < len(parts[month]) < 3 and 0 < len(parts[day]) < 3 \
+            and all(part.isascii() and part.isdigit() for part in parts):
+            try:
+                return datetime.date( int(parts[year]), int(parts[month]), int(parts[day]) )
+            except ValueError:
+                return None
     try:
-        datetime.datetime.strptime( date_value, date_format )
-        return True
+        return datetime.datetime.strptime( date_value, date_format ).date()
     except ValueError:
-        return False
+        return None
 
 def merge_dicts(target, source):
     '''
@@ -49,3 +77,24 @@ def get_data_by_group(group_fields, leaf_fields):
     for field in reversed(group_fields):
         data = {field: data}
     return data
+
+def iter_leaf_records(data, group_fields, group_values=()):
+    '''
+    Flatten output generated by get_data_by_group/merge_dicts
+    Yields one record per leaf of form
+    {group field1: value1, ...so on, leaf field1: value1, ...so on}
+    '''
+    if len(group_values) == len(group_fields):
+        for leaf_data in data:
+            yield {**dict(zip(group_fields, group_values)), **leaf_data}
+        return
+    for group_value, group_data in data.items():
+        yield from iter_leaf_records(group_data, group_fields, group_values + (group_value,))
+
+def count_leaves(data, depth):
+    '''
+    Number of leaves of output nested depth groups deep, see iter_leaf_records
+    '''
+    if depth == 0:
+        return len(data)
+    return sum(count_leaves(group_data, depth - 1) for group_data in data.values())
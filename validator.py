@@ -0,0 +1,149 @@
+'''
+Row validation compiled from checks section of transform config
+'''
+import logging
+import functools
+import utils
+
+ERR_INCOMPLETE_DATA_ROW = "Some fields missing data"
+INVALID_MSG="Invalid ({}):{}"
+MSG_INVALID_ROW = 'Row %s --> Invalid %s : %s'
+DATE_FORMAT = '%m/%d/%Y'
+
+def messages(err_msg):
+    '''
+    Messages of err_msg of a row as flat list of strings
+    '''
+    return [message[0] if isinstance(message, list) else message for message in err_msg]
+
+def reasons(err_msg):
+    '''
+    Reasons a row was rejected for, messages of err_msg without the invalid values
+    '''
+    return [message.split(':', 1)[0] for message in messages(err_msg)]
+
+def is_not_blank(value):
+    '''
+    Check value is not empty
+    None is a value the source reader did not decode, see Extract.iter_records_mapped
+    '''
+    return value is None or value.strip() != ''
+
+class IncompleteRow(dict):
+    '''
+    Source row with more or fewer values than source fields, see Extract.project
+    Values are kept as they are, keyed by the source fields in order, the row is
+    rejected as incomplete without checking them
+    col_count - number of values of the row
+    '''
+    def __init__(self, source_fields, values):
+        dict.__init__(self, zip(source_fields, values))
+        self.col_count = len(values)
+
+def col_count(row_data):
+    '''
+    Number of values of source row, see IncompleteRow
+    '''
+    return row_data.col_count if isinstance(row_data, IncompleteRow) else len(row_data)
+
+def to_int(value):
+    '''
+    Convert string of digits to int, raise ValueError otherwise
+    '''
+    if not value.isdigit():
+        raise ValueError(value)
+    return int(value)
+
+# pylint: disable=too-few-public-methods
+class RowValidator():
+    '''
+    Validates source rows in a single pass
+    Checks are compiled once into a list of
+    (field index, field, validator, converter) in the order the tasks are configured
+    Either validator returns False or converter raises ValueError for invalid values
+    '''
+    def __init__(self, source_fields, checks, preprocess_checks, fields=None):
+        '''
+        inputs:
+        source_fields - list of source fields
+        checks - checks section of transform config
+        preprocess_checks - list of configured preprocess tasks
+        fields - optional subset of source fields rows hold values of, in source field order
+                 checks of other fields are skipped, defaults to source_fields
+        '''
+        if fields is None:
+            fields = source_fields
+        self.field_count = len(fields)
+        # fields of the errors of the last rejected row in err_msg order, None if incomplete
+        self.failed_fields = None
+        index = {field: i for i, field in enumerate(source_fields)}
+        self.checks = []
+        for task in preprocess_checks:
+            logging.info('Task: %s', task)
+            if task == 'data_completeness':
+                self.checks.extend((index[field], field, is_not_blank, None)
+                                   for field in source_fields)
+            elif task == 'data':
+                for field, valid_values in checks['data'].items():
+                    self.checks.append((index[field], field,
+                                        frozenset(valid_values).__contains__, None))
+            elif task == 'date_field':
+                # parse_date returns the parsed date, None for invalid values
+                date_check = functools.partial(utils.parse_date,
+                                               date_format=checks.get('date_format', DATE_FORMAT))
+                self.checks.extend((index[field], field, date_check, None)
+                                   for field in checks['date_field'])
+            elif task == 'float_field':
+                self.checks.extend((index[field], field, None, float)
+                                   for field in checks['float_field'])
+            elif task == 'number_field':
+                self.checks.extend((index[field], field, None, to_int)
+                                   for field in checks['number_field'])
+            else:
+                logging.warning('Task \'%s\' undefined', task)
+        if fields is not source_fields:
+            position = {field: i for i, field in enumerate(fields)}
+            self.checks = [(position[field], field, validator, converter)
+                           for _, field, validator, converter in self.checks
+                           if field in position]
+
+    def validate_row(self, row, row_data, target):
+        '''
+        Validate single row of form {field1: value1, field2: value2, ...so on}, see validate
+        '''
+        if isinstance(row_data, IncompleteRow):
+            logging.debug('Record #%s has incomplete data.', row)
+            self.failed_fields = None
+            return [ERR_INCOMPLETE_DATA_ROW]
+        return self.validate(row, tuple(row_data.values()), target)
+
+    def validate(self, row, values, target):
+        '''
+        Validate single row
+        row - row number, used for logging
+        values - row values in source field order
+        target - dict converted values are written to, keyed by field
+        Returns err_msg, empty for a valid row, failed_fields holds the fields of the errors
+        '''
+        if len(values) != self.field_count:
+            logging.debug('Record #%s has incomplete data.', row)
+            self.failed_fields = None
+            return [ERR_INCOMPLETE_DATA_ROW]
+        err_msg = []
+        for index, field, validator, converter in self.checks:
+            value = values[index]
+            if converter is None:
+                if validator(value):
+                    continue
+            else:
+                try:
+                    target[field] = converter(value)
+                    continue
+                except ValueError:
+                    pass
+            if len(err_msg) == 0:
+                self.failed_fields = []
+            self.failed_fields.append(field)
+            err_msg.append([INVALID_MSG.format(field,value)])
+            logging.debug(MSG_INVALID_ROW, row, field, value)
+        return err_msg